@@ -0,0 +1,179 @@
+# bazaarvoice.py
+"""
+Bazaarvoice Conversations API client (the JSON endpoint behind the review
+widget on Myer product pages).
+
+Reviews come back 100 per request, and after the first page (which reports
+TotalResults) the remaining pages are fetched concurrently over one pooled
+HTTP session, so a product's full review history takes a few requests
+instead of a page reload per 10 reviews.
+
+    client = BazaarvoiceClient(passkey)
+    reviews = client.reviews("1234567")            # every review, newest first
+
+For offline runs, `record_dir` saves every response and bv_stub_server.py
+replays them; point `api` at the stub:
+
+    python bv_stub_server.py recordings/ --port 8765
+    BazaarvoiceClient(passkey, api="http://127.0.0.1:8765/data/reviews.json")
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BV_API = "https://api.bazaarvoice.com/data/reviews.json"
+API_VERSION = "5.4"
+PAGE_SIZE = 100            # API maximum per request
+PAGE_WORKERS = 8
+TIMEOUT = 20
+
+
+def recording_name(params: Dict[str, Any]) -> str:
+    """File name for a recorded response: the query without the passkey, hashed."""
+    query = sorted((k, str(v)) for k, v in params.items() if k.lower() != "passkey")
+    return hashlib.sha1(json.dumps(query).encode("utf-8")).hexdigest() + ".json"
+
+
+def review_from_bv(result: Dict[str, Any]) -> Dict[str, Any]:
+    """API review → the scraper's {title, body, rating, source} record."""
+    rating = result.get("Rating")
+    return {
+        "title": result.get("Title"),
+        "body": result.get("ReviewText"),
+        "rating": float(rating) if rating is not None else None,
+        "source": "api",
+    }
+
+
+class BazaarvoiceClient:
+    def __init__(self, passkey: Optional[str] = None, api: str = BV_API, workers: int = PAGE_WORKERS,
+                 timeout: float = TIMEOUT, record_dir: Optional[str] = None):
+        self.passkey = passkey
+        self.api = api
+        self.workers = workers
+        self.timeout = timeout
+        self.record_dir = record_dir
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+
+        # one keep-alive pool shared by all page fetches; transient errors and 429s are retried with backoff
+        self.session = requests.Session()
+        retry = Retry(total=4, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # ----- context manager -----
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    # ----- requests -----
+    def _params(self, product_id: str, offset: int, limit: int) -> Dict[str, Any]:
+        return {
+            "apiversion": API_VERSION,
+            "passkey": self.passkey,
+            "Filter": f"ProductId:{product_id}",
+            "Sort": "SubmissionTime:desc",
+            "Limit": limit,
+            "Offset": offset,
+        }
+
+    def page(self, product_id: str, offset: int = 0, limit: int = PAGE_SIZE) -> Dict[str, Any]:
+        params = self._params(product_id, offset, limit)
+        resp = self.session.get(self.api, params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("HasErrors"):
+            raise RuntimeError(f"Bazaarvoice error for {product_id}: {data.get('Errors')}")
+        if self.record_dir:
+            with open(os.path.join(self.record_dir, recording_name(params)), "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        return data
+
+    def reviews(self, product_id: str, max_reviews: Optional[int] = None,
+                until: Optional[Callable[[List[Dict[str, Any]]], bool]] = None) -> List[Dict[str, Any]]:
+        """
+        All reviews for a product (or the newest `max_reviews`), in API order.
+        With `until`, pages are fetched one at a time instead and fetching
+        stops after the first page for which until(page_reviews) is true
+        (incremental refreshes that only need the newest reviews).
+        """
+        if until is not None:
+            return self._reviews_until(product_id, max_reviews, until)
+
+        first_limit = PAGE_SIZE if max_reviews is None else min(PAGE_SIZE, max_reviews)
+        first = self.page(product_id, 0, first_limit)
+        results = list(first.get("Results") or [])
+        total = first.get("TotalResults") or 0
+        wanted = total if max_reviews is None else min(total, max_reviews)
+
+        offsets = list(range(len(results), wanted, PAGE_SIZE))
+        if offsets:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(offsets))) as pool:
+                pages = pool.map(lambda off: self.page(product_id, off, min(PAGE_SIZE, wanted - off)), offsets)
+                for data in pages:          # map keeps offset order
+                    results.extend(data.get("Results") or [])
+        return [review_from_bv(r) for r in results[:wanted]]
+
+    def _reviews_until(self, product_id, max_reviews, until) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        while max_reviews is None or len(out) < max_reviews:
+            data = self.page(product_id, len(out), PAGE_SIZE)
+            page = [review_from_bv(r) for r in data.get("Results") or []]
+            out.extend(page)
+            if not page or until(page) or len(out) >= (data.get("TotalResults") or 0):
+                break
+        return out if max_reviews is None else out[:max_reviews]
+
+
+# ---------- discovering the widget's settings from a loaded page ----------
+_PRODUCT_ID_ATTRS = ("data-bv-product-id", "data-bv-productid", "data-product-id")
+
+
+def discover_bv_config(driver) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (passkey, product_id) used by the review widget on the current page,
+    read from the API requests the widget already made (Resource Timing) and
+    from the widget's host attributes.
+    """
+    passkey = product_id = None
+    try:
+        urls = driver.execute_script(
+            "return performance.getEntriesByType('resource').map(e => e.name)"
+            ".filter(u => u.includes('bazaarvoice.com'));") or []
+    except Exception:
+        urls = []
+    for url in urls:
+        qs = parse_qs(urlparse(url).query)
+        passkey = passkey or (qs.get("passkey") or qs.get("Passkey") or [None])[0]
+        for flt in qs.get("Filter", []) + qs.get("filter", []):
+            m = re.match(r"(?i)productid:(?:eq:)?([^,&]+)", flt)
+            if m and not product_id:
+                product_id = m.group(1)
+
+    if not product_id:
+        try:
+            product_id = driver.execute_script(
+                "for (const a of arguments[0]) {"
+                "  const el = document.querySelector('[' + a + ']');"
+                "  if (el) return el.getAttribute(a);"
+                "} return null;", list(_PRODUCT_ID_ATTRS))
+        except Exception:
+            pass
+    return passkey, product_id
@@ -0,0 +1,250 @@
+# bench_page_load.py
+"""
+Page-load benchmark for the scrapers' browser: normal Chrome ("full") vs
+lean mode (scrape_browser.make_lean), on recorded product pages.
+
+    python bench_page_load.py record page_fixtures/ URL [URL ...]     # online, once
+    python bench_page_load.py run page_fixtures/ --repeat 3 --ready-css "main"
+
+`record` loads each page in a full browser and saves every response it
+fetched (HTML, scripts, CSS, images, fonts, trackers). `run` replays them
+from a local server, absolute URLs rewritten to point at it, so both modes
+load the same bytes offline. For each page and mode it reports the time
+until driver.get returns, until the page is usable (`--ready-css` present),
+bytes transferred (DevTools encodedDataLength) and request count.
+"""
+from __future__ import annotations
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from selenium.webdriver.common.by import By
+
+from scrape_browser import make_chrome
+from scrape_waits import network_idle, wait_for
+
+MANIFEST = "manifest.json"
+TEXT_TYPES = ("text/", "javascript", "json", "xml", "svg")
+_ABS_URL = re.compile(r"https?://([A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+)")
+_ABS_URL_ESCAPED = re.compile(r"https?:\\/\\/([A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+)")
+
+
+def resource_key(url: str) -> str:
+    """host/path?query (scheme dropped: the replay is plain http)."""
+    u = urlparse(url)
+    return u.netloc + (u.path or "/") + (f"?{u.query}" if u.query else "")
+
+
+def _is_text(mime: Optional[str]) -> bool:
+    return any(t in (mime or "") for t in TEXT_TYPES)
+
+
+def _network_events(driver) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    for entry in driver.get_log("performance"):
+        msg = json.loads(entry["message"])["message"]
+        yield msg["method"], msg.get("params", {})
+
+
+def load_manifest(fixture_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(fixture_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"pages": [], "resources": {}}
+
+
+# ---------- recording ----------
+def record(fixture_dir: str, urls: List[str], headless: bool = True):
+    os.makedirs(fixture_dir, exist_ok=True)
+    manifest = load_manifest(fixture_dir)
+    driver = make_chrome(None, headless, lean=False, log_network=True)
+    try:
+        for url in urls:
+            driver.get(url)
+            network_idle(driver, idle=1.0, timeout=30)
+            responses = {p["requestId"]: p["response"]
+                         for method, p in _network_events(driver) if method == "Network.responseReceived"}
+            saved = 0
+            for request_id, resp in responses.items():
+                try:
+                    body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+                except Exception:
+                    continue        # redirects, evicted or streamed bodies
+                data = (base64.b64decode(body["body"]) if body.get("base64Encoded")
+                        else body["body"].encode("utf-8"))
+                key = resource_key(resp["url"])
+                name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+                with open(os.path.join(fixture_dir, name), "wb") as f:
+                    f.write(data)
+                manifest["resources"][key] = {"file": name, "mime": resp.get("mimeType")}
+                saved += 1
+            page = resource_key(driver.current_url)
+            if page not in manifest["pages"]:
+                manifest["pages"].append(page)
+            print(f"[record] {url}: {saved} responses")
+    finally:
+        driver.quit()
+    with open(os.path.join(fixture_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+# ---------- replay ----------
+def make_handler(fixture_dir: str, manifest: Dict[str, Any], origin_box: List[str]):
+    resources = manifest["resources"]
+    by_path = {k.split("?", 1)[0]: v for k, v in resources.items()}   # query-insensitive fallback
+    default_host = manifest["pages"][0].split("/", 1)[0] if manifest["pages"] else ""
+
+    def rewrite(text: str) -> str:
+        origin = origin_box[0]
+        text = _ABS_URL.sub(lambda m: f"{origin}/r/{m.group(1)}", text)
+        return _ABS_URL_ESCAPED.sub(lambda m: f"{origin}/r/{m.group(1)}".replace("/", "\\/"), text)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path.startswith("/r/"):
+                key = self.path[3:]
+            else:
+                # root-relative URL: resolve against the page (Referer) that asked for it
+                ref = re.search(r"/r/([^/]+)", self.headers.get("Referer") or "")
+                key = (ref.group(1) if ref else default_host) + self.path
+            entry = resources.get(key) or by_path.get(key.split("?", 1)[0])
+            if entry is None:
+                self.send_error(404, "not recorded")
+                return
+            with open(os.path.join(fixture_dir, entry["file"]), "rb") as f:
+                body = f.read()
+            mime = entry.get("mime") or "application/octet-stream"
+            self.send_response(200)
+            if _is_text(mime):
+                body = rewrite(body.decode("utf-8", "replace")).encode("utf-8")
+                mime += "; charset=utf-8"
+                if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                    body = gzip.compress(body, 6)      # sites serve text compressed
+                    self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Type", mime)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(fixture_dir: str, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Replay server in a background thread → (server, origin)."""
+    origin_box = [""]
+    server = ThreadingHTTPServer((host, port), make_handler(fixture_dir, load_manifest(fixture_dir), origin_box))
+    origin_box[0] = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, origin_box[0]
+
+
+# ---------- measuring ----------
+def measure_page(driver, url: str, ready_css: str, timeout: float) -> Dict[str, Any]:
+    list(_network_events(driver))            # drop events from earlier pages
+    started = time.perf_counter()
+    driver.get(url)
+    loaded = time.perf_counter() - started
+    wait_for(driver, lambda d: d.find_elements(By.CSS_SELECTOR, ready_css), timeout)
+    ready = time.perf_counter() - started
+    network_idle(driver, idle=1.0, timeout=timeout)   # count late requests too (not timed)
+
+    transferred = requests = blocked = 0
+    for method, p in _network_events(driver):
+        if method == "Network.requestWillBeSent":
+            requests += 1
+        elif method == "Network.loadingFinished":
+            transferred += int(p.get("encodedDataLength") or 0)
+        elif method == "Network.loadingFailed" and p.get("blockedReason"):
+            blocked += 1
+    return {"url": url, "get_s": round(loaded, 3), "ready_s": round(ready, 3),
+            "bytes": transferred, "requests": requests, "blocked": blocked}
+
+
+def run_mode(lean: bool, urls: List[str], repeat: int, ready_css: str, timeout: float,
+             headless: bool) -> List[Dict[str, Any]]:
+    driver = make_chrome(None, headless, lean=lean, log_network=True)
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})   # every load is cold
+        return [measure_page(driver, url, ready_css, timeout) for _ in range(repeat) for url in urls]
+    finally:
+        driver.quit()
+
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, float]:
+    return {
+        "pages": len(rows),
+        "get_s_median": round(statistics.median(r["get_s"] for r in rows), 3),
+        "ready_s_median": round(statistics.median(r["ready_s"] for r in rows), 3),
+        "kb_mean": round(statistics.mean(r["bytes"] for r in rows) / 1024, 1),
+        "requests_mean": round(statistics.mean(r["requests"] for r in rows), 1),
+        "blocked_mean": round(statistics.mean(r["blocked"] for r in rows), 1),
+    }
+
+
+def run(fixture_dir: str, repeat: int = 3, ready_css: str = "body", timeout: float = 30,
+        headless: bool = True) -> Dict[str, Any]:
+    server, origin = serve(fixture_dir)
+    try:
+        urls = [f"{origin}/r/{page}" for page in load_manifest(fixture_dir)["pages"]]
+        if not urls:
+            raise SystemExit(f"no recorded pages in {fixture_dir}")
+        rows = {mode: run_mode(mode == "lean", urls, repeat, ready_css, timeout, headless)
+                for mode in ("full", "lean")}
+    finally:
+        server.shutdown()
+    summary = {mode: summarize(r) for mode, r in rows.items()}
+    return {"summary": summary, "pages": rows}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Full vs lean page loads on recorded product pages.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record", help="save product pages and everything they load")
+    rec.add_argument("fixture_dir")
+    rec.add_argument("urls", nargs="+")
+    rec.add_argument("--show-browser", action="store_true")
+    rn = sub.add_parser("run", help="benchmark both modes on the recorded pages")
+    rn.add_argument("fixture_dir")
+    rn.add_argument("--repeat", type=int, default=3)
+    rn.add_argument("--ready-css", default="body", help="selector that means the page is usable")
+    rn.add_argument("--timeout", type=float, default=30)
+    rn.add_argument("--json", help="write per-page results here")
+    rn.add_argument("--show-browser", action="store_true")
+    args = ap.parse_args()
+
+    if args.cmd == "record":
+        record(args.fixture_dir, args.urls, headless=not args.show_browser)
+        return
+
+    result = run(args.fixture_dir, args.repeat, args.ready_css, args.timeout, headless=not args.show_browser)
+    full, lean = result["summary"]["full"], result["summary"]["lean"]
+    print(f"{'':16}{'full':>10}{'lean':>10}")
+    for key in ("get_s_median", "ready_s_median", "kb_mean", "requests_mean", "blocked_mean"):
+        print(f"{key:16}{full[key]:>10}{lean[key]:>10}")
+    if lean["ready_s_median"] and lean["kb_mean"]:
+        print(f"lean: {full['ready_s_median'] / lean['ready_s_median']:.1f}x faster to usable, "
+              f"{full['kb_mean'] / lean['kb_mean']:.1f}x fewer bytes")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved → {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+# bench_pipeline.py
+"""
+Reproducible benchmark for the review pipeline, on synthetic corpora:
+ingest (JSON parsing) → VADER scoring → summary groupby → the dashboard's
+load_data → the CW charts.
+
+    python bench_pipeline.py run --sizes 10k 100k 1m --out bench_results.json
+    python bench_pipeline.py compare bench_before.json bench_results.json
+    python bench_pipeline.py generate corpus/ --size 100k      # just write a corpus
+
+For each size, a corpus with that many reviews per retailer is generated
+(seeded, so every run sees the same texts) in each retailer's own layout:
+Chemist Warehouse "Reviewer Details", Myer/Mecca products[].reviews[] and
+the Amazon review list. Files get the names the scripts expect, and every
+stage runs with that directory as the working directory, so the code being
+timed is exactly what runs on the real files. Stages per retailer:
+
+  parse           stream the raw file product by product (review_stream)
+  score           vader_engine.score_products over the parsed products (no cache)
+  summarize       vader_engine.summarize over the scored reviews
+  run_site        the whole vader_engine.run_site (parse + score + write JSON/CSV)
+  dashboard_load  dashboard_data.load_site (what dashboard_cw.load_data caches)
+  dashboard_index dashboard_data.build_index
+  visuals         cw_vader_visuals charts (Chemist Warehouse only, needs matplotlib)
+
+Results are one JSON file: run metadata plus a row per (size, site, stage)
+with wall and CPU seconds (CPU of this process only; scoring workers are
+child processes), item count and µs per item.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+import vader_engine as ve
+from review_normalize import review_text
+from review_stream import JsonArrayReader, JsonArrayWriter
+
+REVIEWS_PER_PRODUCT = 25
+AMAZON_INPUT = "amazon_reviews.json"
+STAGES = ["parse", "score", "summarize", "run_site", "dashboard_load", "dashboard_index", "visuals"]
+CATEGORIES = ["cleanser", "toner", "serum", "moisturizer", "sunscreen"]
+
+# ---------- synthetic corpus ----------
+_BRANDS = ["Cerave", "La Roche-Posay", "Avene", "The Ordinary", "Neutrogena", "Bioderma", "Clinique",
+           "Kiehl's", "Tatcha", "Drunk Elephant", "Sukin", "QV", "Cetaphil", "Aveeno", "Paula's Choice"]
+_FORMS = {"cleanser": ["Hydrating Cleanser", "Foaming Cleanse Gel", "Cleansing Milk"],
+          "toner": ["Balancing Toner", "Exfoliating Toner", "Rose Toner"],
+          "serum": ["Vitamin C Serum", "Niacinamide Serum", "Hyaluronic Serum"],
+          "moisturizer": ["Daily Moisturizer", "Night Cream", "Body Lotion"],
+          "sunscreen": ["Sunscreen SPF 50+", "Invisible Fluid SPF 50", "Tinted Sunscreen"]}
+_OPENERS = ["I have been using this for", "Bought this after", "My skin", "This product", "Honestly",
+            "I really", "After two weeks", "The texture", "For the price", "Compared to my old one"]
+_MIDDLES = ["a month now and", "reading the reviews and", "feels", "is", "works", "does not", "never",
+            "really", "not so", "kind of", "at least", "barely", "extremely", "so"]
+_POSITIVE = ["love it", "great", "amazing", "gentle", "soft and hydrated", "perfect", "happy with it",
+             "worth it", "the best", "nice", "fresh", "calm", "a lifesaver", "LOVE"]
+_NEGATIVE = ["broke me out", "terrible", "sticky", "irritated my skin", "disappointed", "awful smell",
+             "too greasy", "a waste of money", "bad", "stings", "dry and tight", "WORST"]
+_NEUTRAL = ["the bottle", "the pump", "my routine", "in the morning", "every night", "on my face",
+            "with a moisturiser", "after the shower", "under makeup", "the scent"]
+_CLOSERS = ["", "", "!", "!!", ".", "?", " but it is pricey.", " but I would buy again!",
+            " would recommend.", " not sure yet."]
+_STOCK = ["Love it!", "Great product", "Not for me", "Does the job", "Amazing!!", "Meh"]
+
+
+def synthetic_review(rng: random.Random) -> str:
+    if rng.random() < 0.05:
+        return rng.choice(_STOCK)        # stock phrases repeat across products, like the real data
+    parts = []
+    for _ in range(rng.choice((1, 1, 2, 2, 3, 4))):
+        mood = _POSITIVE if rng.random() < 0.7 else _NEGATIVE
+        parts.append(" ".join([rng.choice(_OPENERS), rng.choice(_MIDDLES), rng.choice(mood),
+                               rng.choice(_NEUTRAL)]) + rng.choice(_CLOSERS))
+    return " ".join(parts)
+
+
+def _products(n_reviews: int, rng: random.Random) -> Iterator[Tuple[str, str, List[Tuple[str, str, int]]]]:
+    """(name, category, [(title, text, stars)]) until n_reviews reviews have been made."""
+    made, i = 0, 0
+    while made < n_reviews:
+        category = CATEGORIES[i % len(CATEGORIES)]
+        name = f"{rng.choice(_BRANDS)} {rng.choice(_FORMS[category])} {rng.choice((50, 100, 200, 236, 400))}ml #{i}"
+        k = min(n_reviews - made, rng.randint(1, 2 * REVIEWS_PER_PRODUCT))
+        reviews = [(rng.choice(_POSITIVE).capitalize(), synthetic_review(rng), rng.choice((1, 2, 3, 4, 5, 5, 5, 4)))
+                   for _ in range(k)]
+        made += k
+        i += 1
+        yield name, category, reviews
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def write_corpus(out_dir: str, n_reviews: int, seed: int = 0) -> Dict[str, int]:
+    """Write every retailer's raw file (n_reviews reviews each) into out_dir → {file: bytes}."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+
+    path = os.path.join(out_dir, ve.SITES["cw"].input_file)
+    with JsonArrayWriter(path) as w:
+        for name, category, reviews in _products(n_reviews, random.Random(f"cw-{seed}")):
+            w.write({
+                "retailer": "Chemist Warehouse", "title": name, "category": category,
+                "link": f"https://www.chemistwarehouse.com.au/buy/{_slug(name)}",
+                "Reviewer Details": {
+                    f"customer_review_{j + 1:03d}": {"reviewer_name": f"user{j}", "review_stars": f"{stars}.0 out of 5 stars",
+                                                     "review_title": title, "review_date": "2 months ago", "review": text}
+                    for j, (title, text, stars) in enumerate(reviews)
+                },
+            })
+    written[path] = os.path.getsize(path)
+
+    for site in ("myer", "mecca"):
+        cfg = ve.SITES[site]
+        path = os.path.join(out_dir, cfg.input_file)
+        with JsonArrayWriter(path, cfg.array_key, header={"search": {"categories": CATEGORIES}}) as w:
+            for name, category, reviews in _products(n_reviews, random.Random(f"{site}-{seed}")):
+                w.write({"product_url": f"https://www.{site}.com.au/p/{_slug(name)}",
+                         "product_type": category, "product_name": name, "price": "$39.95",
+                         "reviews_collected": len(reviews),
+                         "reviews": [{"title": t, "body": text, "rating": stars} for t, text, stars in reviews]})
+        written[path] = os.path.getsize(path)
+
+    path = os.path.join(out_dir, AMAZON_INPUT)
+    with JsonArrayWriter(path) as w:
+        for name, _, reviews in _products(n_reviews, random.Random(f"amazon-{seed}")):
+            for _, text, _ in reviews:
+                w.write({"product": name, "review": text})
+    written[path] = os.path.getsize(path)
+    return written
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+# ---------- stages ----------
+def iter_review_list(item) -> Iterator[ve.ReviewRow]:
+    """Amazon layout: one review per list item."""
+    yield item, review_text(item), {"product": item.get("product")}
+
+
+# Amazon has no scraper/engine entry (its scores came from the notebook); benchmark it like the others
+AMAZON = ve.SiteConfig(name="Amazon", array_key=None, iter_reviews=iter_review_list, group_keys=["product"],
+                       include_total=True, input_file=AMAZON_INPUT, output_json="vader_sentiment_output.json",
+                       output_csv="product_vader_scores.csv")
+SITES: Dict[str, ve.SiteConfig] = dict(ve.SITES, amazon=AMAZON)
+
+
+def timed(stage: str, fn: Callable[[], Any], count: Callable[[Any], int]) -> Tuple[Dict[str, Any], Any]:
+    cpu, wall = time.process_time(), time.perf_counter()
+    result = fn()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    n = count(result)
+    return {"stage": stage, "items": n, "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+            "us_per_item": round(wall / n * 1e6, 2) if n else None}, result
+
+
+def bench_site(key: str, stages: List[str], workers: Optional[int]) -> List[Dict[str, Any]]:
+    from dashboard_data import build_index, load_site
+    cfg = SITES[key]
+    rows = []
+
+    def parse():
+        with JsonArrayReader(cfg.input_file, cfg.array_key) as reader:
+            products = list(reader)
+        return products, sum(1 for p in products for _ in cfg.iter_reviews(p))
+
+    def score():
+        flat = []
+        for _, scored in ve.score_products(products, cfg.iter_reviews, workers=workers):
+            for (rev, _, record), s in scored:
+                sentiment = ve.label_for(s["compound"])
+                rev.update(vader_sentiment=sentiment, **s)
+                record.update(vader_sentiment=sentiment, **s)
+                flat.append(record)
+        return flat
+
+    row, (products, _) = timed("parse", parse, lambda r: r[1])
+    rows.append(row)
+    row, flat = timed("score", score, len)
+    rows.append(row)
+    row, summary = timed("summarize", lambda: ve.summarize(pd.DataFrame(flat), cfg.group_keys, cfg.include_total),
+                         lambda _: len(flat))
+    rows.append(row)
+
+    if key in ve.SITES and "run_site" in stages:
+        with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+            row, _ = timed("run_site", lambda: ve.run_site(key, cache_path=None, workers=workers),
+                           lambda _: len(flat))
+        rows.append(row)
+    else:
+        # the scored files the dashboard reads
+        with JsonArrayWriter(cfg.output_json) as w:
+            for p in products:
+                w.write(p)
+        summary.to_csv(cfg.output_csv, index=False)
+
+    if "dashboard_load" in stages or "dashboard_index" in stages:
+        row, loaded = timed("dashboard_load", lambda: load_site(cfg.name), lambda r: len(r[0]))
+        rows.append(row)
+        row, _ = timed("dashboard_index", lambda: build_index(cfg.name, *loaded), lambda _: len(loaded[0]))
+        rows.append(row)
+
+    if key == "cw" and "visuals" in stages:
+        try:
+            import matplotlib
+            matplotlib.use("Agg")
+            import cw_vader_visuals
+        except ImportError as e:
+            print(f"[bench] visuals skipped: {e}")
+        else:
+            row, _ = timed("visuals", lambda: cw_vader_visuals.make_charts(cw_vader_visuals.load_summary()),
+                           lambda _: len(summary))
+            rows.append(row)
+    return [dict(row, site=cfg.name) for row in rows if row["stage"] in stages]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: List[int], sites: List[str], stages: List[str], workers: Optional[int] = None,
+        seed: int = 0, work_dir: Optional[str] = None) -> Dict[str, Any]:
+    import nltk
+    nltk.download("vader_lexicon", quiet=True)
+    results = {
+        "meta": {"started": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": _git_commit(),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "workers": workers, "seed": seed, "sizes": sizes, "sites": sites},
+        "runs": [],
+    }
+    home = os.getcwd()
+    for size in sizes:
+        corpus = work_dir and os.path.join(work_dir, str(size)) or tempfile.mkdtemp(prefix=f"bench-{size}-")
+        started = time.perf_counter()
+        written = write_corpus(corpus, size, seed)
+        print(f"[bench] {size:,} reviews per retailer: corpus {sum(written.values()) / 2**20:.1f} MB "
+              f"in {time.perf_counter() - started:.1f}s")
+        os.chdir(corpus)
+        try:
+            for key in sites:
+                for row in bench_site(key, stages, workers):
+                    results["runs"].append(dict(row, size=size))
+                    print(f"  {row['site']:18} {row['stage']:16} {row['wall_s']:9.3f}s "
+                          f"{row['us_per_item'] or 0:9.1f} µs/item")
+        finally:
+            os.chdir(home)
+            if not work_dir:
+                shutil.rmtree(corpus, ignore_errors=True)
+    return results
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]):
+    """Print wall-time ratios for every (size, site, stage) in both result files."""
+    key = lambda r: (r["size"], r["site"], r["stage"])
+    old = {key(r): r for r in before["runs"]}
+    print(f"{'size':>9} {'site':18} {'stage':16} {'before':>9} {'after':>9} {'ratio':>7}")
+    for r in after["runs"]:
+        b = old.get(key(r))
+        if b is None:
+            continue
+        ratio = r["wall_s"] / b["wall_s"] if b["wall_s"] else float("nan")
+        flag = "  slower" if ratio > 1.1 else ""
+        print(f"{r['size']:>9,} {r['site']:18} {r['stage']:16} {b['wall_s']:9.3f} {r['wall_s']:9.3f} "
+              f"{ratio:6.2f}x{flag}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the review pipeline on synthetic corpora.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rn = sub.add_parser("run", help="generate corpora and time every stage")
+    rn.add_argument("--sizes", nargs="+", default=["10k", "100k", "1m"], help="reviews per retailer")
+    rn.add_argument("--sites", nargs="+", choices=sorted(SITES), default=sorted(SITES))
+    rn.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    rn.add_argument("--workers", type=int, default=None, help="scoring processes (default: all cores)")
+    rn.add_argument("--seed", type=int, default=0)
+    rn.add_argument("--keep", help="write corpora here (kept) instead of a temp dir")
+    rn.add_argument("--out", default="bench_results.json")
+    cmp = sub.add_parser("compare", help="wall-time ratios between two result files")
+    cmp.add_argument("before")
+    cmp.add_argument("after")
+    gen = sub.add_parser("generate", help="only write a synthetic corpus")
+    gen.add_argument("out_dir")
+    gen.add_argument("--size", default="10k")
+    gen.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    if args.cmd == "generate":
+        for path, size in write_corpus(args.out_dir, parse_size(args.size), args.seed).items():
+            print(f"{path}: {size / 2**20:.1f} MB")
+        return
+    if args.cmd == "compare":
+        with open(args.before, encoding="utf-8") as f, open(args.after, encoding="utf-8") as g:
+            compare(json.load(f), json.load(g))
+        return
+
+    out = os.path.abspath(args.out)
+    results = run([parse_size(s) for s in args.sizes], args.sites, args.stages, args.workers, args.seed,
+                  os.path.abspath(args.keep) if args.keep else None)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved → {out}")
+
+
+if __name__ == "__main__":
+    main()
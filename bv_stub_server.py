@@ -0,0 +1,66 @@
+# bv_stub_server.py
+"""
+Local stand-in for the Bazaarvoice API, serving responses recorded with
+BazaarvoiceClient(record_dir=...), so the Myer review fetch can be run and
+timed without network access:
+
+    python myer_skin_care_reviews.py --record-bv bv_recordings   # online, once
+    python bv_stub_server.py bv_recordings --port 8765
+    python myer_skin_care_reviews.py --bv-api http://127.0.0.1:8765/data/reviews.json
+
+Requests with no recording get a 404.
+"""
+from __future__ import annotations
+import argparse
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+from bazaarvoice import recording_name
+
+
+def make_handler(record_dir: str):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"     # keep-alive, like the real API
+
+        def do_GET(self):
+            params = dict(parse_qsl(urlparse(self.path).query))
+            path = os.path.join(record_dir, recording_name(params))
+            if not os.path.exists(path):
+                self.send_error(404, "no recording for this request")
+                return
+            with open(path, "rb") as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(record_dir: str, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub in a background thread; the bound port is server.server_address[1]."""
+    server = ThreadingHTTPServer((host, port), make_handler(record_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve recorded Bazaarvoice responses.")
+    ap.add_argument("record_dir")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.record_dir))
+    print(f"[bv-stub] serving {args.record_dir} on http://{args.host}:{args.port}/data/reviews.json")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,49 @@
 # chemist_warehouse_reviews.py
-import json
-import re
-import time
+import argparse
+import queue
+import threading
 from datetime import datetime
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import JavascriptException
+
+from scrape_browser import consent_recorded, make_chrome, record_consent
+from scrape_checkpoint import Checkpoint
+from seen_reviews import CW_FIELDS, SeenReviews, split_new
+from scrape_waits import AdaptiveDelay, polite_get, wait_for, wait_for_change
+from stage_metrics import span
 
 HOME = "https://www.chemistwarehouse.com.au/"
+PRODUCT_TYPES = ["cleanser", "toner", "serum", "moisturizer", "sunscreen"]
+PRODUCTS_PER_CATEGORY = 20
+MAX_REVIEWS = 20
+CHECKPOINT = "chemist_warehouse_reviews.checkpoint.jsonl"
+RETAILER = "Chemist Warehouse"
+
+WORKERS = 4
+MAX_ATTEMPTS = 3        # per job, across workers
+MAX_RESTARTS = 5        # browser restarts per worker before it gives up
+
+# one politeness gap for the whole pool (every worker hits the same site)
+DELAY = AdaptiveDelay()
 
 # ───────────────────────── Driver ─────────────────────────
-def create_driver():
-    opts = Options()
-    opts.add_argument("--start-maximized")
-    opts.add_experimental_option("excludeSwitches", ["enable-automation"])
-    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=opts)
+def create_driver(headless: bool = False, profile: str = None, lean: bool = True):
+    # persistent `profile` keeps the cookie consent between runs; `lean`: see scrape_browser
+    args = ["--window-size=1920,1080"] if headless else ["--start-maximized"]
+    return make_chrome(profile, headless, args, experimental={"excludeSwitches": ["enable-automation"]},
+                       lean=lean)
 
 def js_click(driver, el):
     driver.execute_script("arguments[0].click();", el)
 
 # ───────────────────────── Cookies ─────────────────────────
-def close_cookies_if_present(driver):
+def close_cookies_if_present(driver, profile: str = None):
+    if consent_recorded(profile):
+        return
     wait = WebDriverWait(driver, 8)
     selectors = [
         (By.ID, "onetrust-accept-btn-handler"),
@@ -37,12 +54,13 @@ def close_cookies_if_present(driver):
         try:
             btn = wait.until(EC.element_to_be_clickable((by, sel)))
             js_click(driver, btn)
-            time.sleep(0.2)
+            wait_for(driver, EC.invisibility_of_element(btn), 2)
             print("[OK] Cookie popup closed")
+            record_consent(profile)
             return
         except Exception:
             pass
-    print("[INFO] No cookie popup found")
+    print("[INFO] No cookie popup found")   # not recorded: the banner may render late, check again next time
 
 # ───────────────────────── Search ─────────────────────────
 def get_visible_search_input(driver):
@@ -88,272 +106,187 @@ def nth_non_sponsored_anchor(driver, n: int):
             continue
     return clean[n-1] if len(clean) >= n else None
 
-def click_nth_product(driver, n: int):
-    wait = WebDriverWait(driver, 20)
-    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "ul li")))
-    time.sleep(1.0)
-    a = nth_non_sponsored_anchor(driver, n)
-    if not a:
-        raise RuntimeError(f"Could not find product #{n}")
-    driver.execute_script("arguments[0].scrollIntoView({block:'center'});", a)
-    time.sleep(0.4)
-    js_click(driver, a)
-    wait.until(EC.url_contains("/buy/"))
-    print(f"[OK] Opened product #{n}: {driver.current_url}")
-
 # ───────────────────────── Reviews accordion ─────────────────────────
 def click_reviews_dropdown(driver):
     wait = WebDriverWait(driver, 20)
     driver.execute_script("window.scrollBy(0, 1000);")
-    time.sleep(0.8)
     try:
         btn = wait.until(EC.element_to_be_clickable(
             (By.XPATH, "//button[.//text()[contains(.,'Reviews')]] | //h3[normalize-space()='Reviews']/parent::div/preceding-sibling::button")
         ))
         driver.execute_script("arguments[0].scrollIntoView({block:'center'});", btn)
-        time.sleep(0.2)
         js_click(driver, btn)
-        time.sleep(1.0)
+        wait_for(driver, review_cards, 5)
         print("[OK] Reviews section toggled/opened")
     except Exception:
         print("[INFO] Reviews section may already be open")
 
-# ───────────────────────── Robust star text ─────────────────────────
-def extract_stars_text(container) -> str:
-    """
-    Extracts 'X out of 5 stars' for an individual review card.
-    """
-    # 1) aria-label / title based
-    for xp in [
-        ".//*[contains(@aria-label,'out of 5')]",
-        ".//*[contains(@title,'out of 5')]",
-        ".//span[contains(normalize-space(.), 'out of 5')]",
-    ]:
-        try:
-            el = container.find_element(By.XPATH, xp)
-            raw = (el.get_attribute("aria-label") or el.get_attribute("title") or el.text or "").strip()
-            m = re.search(r'(\d+(?:\.\d+)?)\s*out\s*of\s*5', raw, re.I)
-            if m:
-                return f"{m.group(1)} out of 5 stars"
-        except Exception:
-            pass
+# ───────────────────────── In-page extraction ─────────────────────────
+# Everything on a reviews page is read by one execute_script call: the same
+# XPaths as before, evaluated in the browser with document.evaluate, so a
+# page costs one WebDriver round-trip instead of 5–10 per review card.
+CARD_XPATH = "//h6[contains(@class,'headline') and contains(@class,'title')]/ancestor::div[contains(@class,'flex') and contains(@class,'flex-col')][1]"
+
+REVIEW_PAGE_JS = r"""
+const withSummary = arguments[0];
+const xpAll = (expr, ctx) => {
+  try {
+    const r = document.evaluate(expr, ctx || document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const out = [];
+    for (let i = 0; i < r.snapshotLength; i++) out.push(r.snapshotItem(i));
+    return out;
+  } catch (e) { return []; }
+};
+const xp = (expr, ctx) => xpAll(expr, ctx)[0] || null;
+const text = (el) => el ? ((el.innerText !== undefined ? el.innerText : el.textContent) || "").trim() : "";
+
+// 'X out of 5 stars' for a review card: aria-label/title, then filled SVGs, then unicode stars
+const stars = (card) => {
+  for (const e of [".//*[contains(@aria-label,'out of 5')]",
+                   ".//*[contains(@title,'out of 5')]",
+                   ".//span[contains(normalize-space(.), 'out of 5')]"]) {
+    const el = xp(e, card);
+    if (!el) continue;
+    const raw = (el.getAttribute("aria-label") || el.getAttribute("title") || text(el)).trim();
+    const m = raw.match(/(\d+(?:\.\d+)?)\s*out\s*of\s*5/i);
+    if (m) return m[1] + " out of 5 stars";
+  }
+  const wrappers = xpAll(".//div[contains(@class,'flex') and contains(@class,'items-center')][.//*[local-name()='svg']]", card);
+  for (const root of (wrappers.length ? wrappers : [card])) {
+    const filled = xpAll(
+      ".//*[local-name()='svg' and not(contains(@class,'opacity-20')) and (" +
+      " contains(@class,'text-amber') or contains(@class,'fill-amber') or" +
+      " contains(@class,'text-yellow') or contains(@class,'text-cw-yellow') or" +
+      " contains(@class,'text-cw-amber') or @fill='currentColor')]", root);
+    if (filled.length) return Math.min(5, filled.length).toFixed(1) + " out of 5 stars";
+  }
+  const t = text(card);
+  const count = (t.split("★").length - 1) || (t.split("⭐").length - 1);
+  if (count > 0 && count <= 5) return count.toFixed(1) + " out of 5 stars";
+  return "";
+};
+
+const reviews = xpAll("%CARD_XPATH%").map(card => {
+  const name = xp(".//span[contains(@class,'text-colour-body-grey')]", card);
+  return {
+    reviewer_name: name ? text(name) : "Anonymous",
+    review_stars: stars(card),
+    review_title: text(xp(".//h6[contains(@class,'headline') and contains(@class,'title')]", card)),
+    review_date: text(xp(".//span[contains(@class,'text-cw-grey-200')]", card)),
+    review: text(xp(".//p[contains(@class,'text-colour-body-grey') and contains(@class,'body')]", card)),
+  };
+});
+
+let summary = null;
+if (withSummary) {
+  summary = {"Average reviews": "", "Total Ratings": "", "reviews_per_star": {}};
+  let m = text(xp("(//span[contains(@class,'text') and normalize-space()[string(.)!='']][contains(.,'.')])[1]")).match(/\d+(?:\.\d+)?/);
+  if (m) summary["Average reviews"] = m[0] + " out of 5";
+  m = text(xp("//span[contains(.,'Reviews') and contains(.,'review')] | //span[contains(.,'Reviews')]")).match(/\d[\d,]*/);
+  if (m) summary["Total Ratings"] = m[0].replace(/,/g, "") + " Reviews";
+
+  const container = xp("//span[normalize-space()='Ratings snapshot']/ancestor::div[contains(@class,'flex-col')][1]")
+    || xp("//span[contains(.,'Ratings snapshot')]/ancestor::div[contains(@class,'flex-col')][1]")
+    || xp("//div[.//span[contains(.,'Ratings snapshot')]][contains(@class,'flex-col')]");
+  if (container) {
+    for (const row of xpAll(".//button[.//span[contains(.,'star') or contains(.,'stars')]]", container)) {
+      const label = text(xp(".//span[contains(.,'star')]", row)).toLowerCase();
+      let count = "";
+      for (const c of xpAll(".//span[contains(@class,'text-right') or contains(@class,'text-black')]", row).reverse()) {
+        const cm = text(c).match(/\d[\d,]*/);
+        if (cm) { count = cm[0].replace(/,/g, ""); break; }
+      }
+      if (!count) {
+        const cm = text(row).match(/\d[\d,]*/);
+        if (cm) count = cm[0].replace(/,/g, "");
+      }
+      for (const n of ["5", "4", "3", "2", "1"]) {
+        if (label.includes(n + " star")) { summary.reviews_per_star[n + " star"] = count; break; }
+      }
+    }
+  }
+}
+return {reviews: reviews, summary: summary};
+""".replace("%CARD_XPATH%", CARD_XPATH)
 
-    # 2) count filled SVGs
+def scrape_review_page(driver, with_summary=False):
+    """Review cards on the current page (and the product's review summary) in one call."""
     try:
-        star_wrappers = container.find_elements(
-            By.XPATH,
-            ".//div[contains(@class,'flex') and contains(@class,'items-center')][.//*[local-name()='svg']]"
-        )
-        search_roots = star_wrappers if star_wrappers else [container]
-
-        for root in search_roots:
-            filled_svgs = root.find_elements(
-                By.XPATH,
-                ".//*[local-name()='svg' and not(contains(@class,'opacity-20')) and "
-                "("
-                " contains(@class,'text-amber') or contains(@class,'fill-amber') or "
-                " contains(@class,'text-yellow') or contains(@class,'text-cw-yellow') or "
-                " contains(@class,'text-cw-amber') or "
-                " @fill='currentColor'"
-                ")]"
-            )
-            if filled_svgs:
-                n = min(5, max(0, len(filled_svgs)))
-                return f"{float(n):.1f} out of 5 stars"
-    except Exception:
-        pass
-
-    # 3) unicode stars fallback
-    try:
-        txt = container.text
-        if txt:
-            count = txt.count("★") or txt.count("⭐")
-            if 0 < count <= 5:
-                return f"{float(count):.1f} out of 5 stars"
-    except Exception:
-        pass
-
-    return ""
+        return driver.execute_script(REVIEW_PAGE_JS, with_summary) or {"reviews": [], "summary": None}
+    except JavascriptException:
+        return {"reviews": [], "summary": None}
 
 # ───────────────────────── Review Summary (avg + total + snapshot) ─────────────────────────
-def _find_ratings_snapshot_container(driver):
-    xpaths = [
-        "//span[normalize-space()='Ratings snapshot']/ancestor::div[contains(@class,'flex-col')][1]",
-        "//span[contains(.,'Ratings snapshot')]/ancestor::div[contains(@class,'flex-col')][1]",
-        "//div[.//span[contains(.,'Ratings snapshot')]][contains(@class,'flex-col')]",
-    ]
-    for xp in xpaths:
-        els = driver.find_elements(By.XPATH, xp)
-        if els:
-            return els[0]
-    return None
-
-def _extract_ratings_snapshot(container):
-    dist = {}
-    if not container:
-        return dist
-
-    rows = container.find_elements(
-        By.XPATH,
-        ".//button[.//span[contains(.,'star') or contains(.,'stars')]]"
-    )
-    for row in rows:
-        try:
-            label_el = row.find_element(By.XPATH, ".//span[contains(.,'star')]")
-            label_txt = label_el.text.strip().lower()
-
-            count_txt = ""
-            candidates = row.find_elements(By.XPATH, ".//span[contains(@class,'text-right') or contains(@class,'text-black')]")
-            for c in candidates[::-1]:
-                m = re.search(r'\d[\d,]*', c.text)
-                if m:
-                    count_txt = m.group(0).replace(",", "")
-                    break
-            if not count_txt:
-                m = re.search(r'\d[\d,]*', row.text)
-                if m:
-                    count_txt = m.group(0).replace(",", "")
-
-            if '5 star' in label_txt:
-                dist['5 star'] = count_txt
-            elif '4 star' in label_txt:
-                dist['4 star'] = count_txt
-            elif '3 star' in label_txt:
-                dist['3 star'] = count_txt
-            elif '2 star' in label_txt:
-                dist['2 star'] = count_txt
-            elif '1 star' in label_txt:
-                dist['1 star'] = count_txt
-        except Exception:
-            continue
-    return dist
-
 def extract_product_review_summary(driver):
-    summary = {"Average reviews": "", "Total Ratings": "", "reviews_per_star": {}}
-
-    try:
-        avg = driver.find_element(
-            By.XPATH,
-            "(//span[contains(@class,'text') and normalize-space()[string(.)!='']][contains(.,'.')])[1]"
-        )
-        m = re.search(r'\d+(?:\.\d+)?', avg.text)
-        if m:
-            summary["Average reviews"] = f"{m.group(0)} out of 5"
-    except Exception:
-        pass
-
-    try:
-        total = driver.find_element(By.XPATH, "//span[contains(.,'Reviews') and contains(.,'review')] | //span[contains(.,'Reviews')]")
-        m = re.search(r'\d[\d,]*', total.text)
-        if m:
-            summary["Total Ratings"] = f"{m.group(0).replace(',', '')} Reviews"
-    except Exception:
-        pass
-
-    container = _find_ratings_snapshot_container(driver)
-    summary["reviews_per_star"] = _extract_ratings_snapshot(container)
-
-    return summary
+    return (scrape_review_page(driver, with_summary=True)["summary"]
+            or {"Average reviews": "", "Total Ratings": "", "reviews_per_star": {}})
 
 # ───────────────────────── Review cards ─────────────────────────
 def review_cards(driver):
-    return driver.find_elements(
-        By.XPATH,
-        "//h6[contains(@class,'headline') and contains(@class,'title')]/ancestor::div[contains(@class,'flex') and contains(@class,'flex-col')][1]"
-    )
-
-def parse_review_card(card):
-    def safe_text(el):
-        try: return el.text.strip()
-        except: return ""
-
-    try:
-        title = card.find_element(By.XPATH, ".//h6[contains(@class,'headline') and contains(@class,'title')]").text.strip()
-    except Exception:
-        title = ""
-
-    try:
-        name = card.find_element(By.XPATH, ".//span[contains(@class,'text-colour-body-grey')]").text.strip()
-    except Exception:
-        name = "Anonymous"
-
-    try:
-        date = card.find_element(By.XPATH, ".//span[contains(@class,'text-cw-grey-200')]").text.strip()
-    except Exception:
-        date = ""
-
-    try:
-        body = card.find_element(By.XPATH, ".//p[contains(@class,'text-colour-body-grey') and contains(@class,'body')]").text.strip()
-    except Exception:
-        body = ""
-
-    stars = extract_stars_text(card)
-
-    return {
-        "reviewer_name": name,
-        "review_stars": stars,
-        "review_title": title,
-        "review_date": date,
-        "review": body,
-    }
+    return driver.find_elements(By.XPATH, CARD_XPATH)
 
 NEXT_BTN_XPATH = "/html/body/div[1]/div/div/main/div[2]/div/div[2]/section/div/div[2]/div/div/div/div[4]/div/div/button[2]"
 
+def _first_card_text(driver):
+    return driver.execute_script(
+        "const c = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null)"
+        ".singleNodeValue; return c ? c.innerText : null;", CARD_XPATH)
+
 def click_next_reviews_page(driver):
     try:
         next_btn = driver.find_element(By.XPATH, NEXT_BTN_XPATH)
         if next_btn.get_attribute("aria-disabled") == "true":
             return False
+        before = _first_card_text(driver)
         js_click(driver, next_btn)
-        time.sleep(2)  # wait after click
-        return True
+        # the next page has rendered once the first card is a different review
+        return wait_for_change(driver, _first_card_text, before, 10)
     except Exception:
         return False
 
-def collect_reviews(driver, max_reviews=20):
-    time.sleep(1.0)
+def collect_reviews(driver, max_reviews=20, state=None):
+    """
+    Up to `max_reviews` reviews, newest first. With `state` (a
+    seen_reviews.ProductState) only reviews not stored before are returned,
+    and pagination stops at the first page that reaches stored ones.
+    """
+    wait_for(driver, review_cards, 5)
     got, seen = [], set()
     while len(got) < max_reviews:
-        for c in review_cards(driver):
-            try:
-                r = parse_review_card(c)
-                key = (r["reviewer_name"], r["review_date"], r["review_title"], r["review"])
-                if key not in seen and any(r.values()):
-                    seen.add(key)
-                    got.append(r)
-                    if len(got) >= max_reviews:
-                        return got
-            except Exception:
-                continue
+        page, reached_old = split_new(scrape_review_page(driver)["reviews"], state, CW_FIELDS)
+        for r in page:
+            key = (r["reviewer_name"], r["review_date"], r["review_title"], r["review"])
+            if key not in seen and any(r.values()):
+                seen.add(key)
+                got.append(r)
+                if len(got) >= max_reviews:
+                    return got
+        if reached_old:
+            break
         if not click_next_reviews_page(driver):  # ✅ click next button
             break
     return got
 
 
 # ───────────────────────── Save JSON ─────────────────────────
-def save_reviews_to_json(records, filename_prefix="chemist_warehouse_reviews"):
+def save_reviews_to_json(checkpoint, order=None, filename_prefix="chemist_warehouse_reviews"):
+    """Stream the checkpointed records (in `order` of keys) into a timestamped JSON file."""
     name = f"{filename_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(name, "w", encoding="utf-8") as f:
-        json.dump(records, f, indent=2, ensure_ascii=False)
-    print(f"[SAVED] {name}")
+    count = checkpoint.write_json(name, indent=2, order=order)
+    print(f"[SAVED] {name}  products={count}")
     return name
 
 # ───────────────────────── Main flow ─────────────────────────
-def process_nth_product(driver, n: int, results_url: str, max_reviews=5):
-    if driver.current_url != results_url:
-        driver.get(results_url)
-        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "ul li")))
-        time.sleep(0.6)
+def _product_record(driver, max_reviews, state=None):
+    with span("scrape.reviews", site="cw") as s:
+        click_reviews_dropdown(driver)
 
-    print(f"\n=== Processing product #{n} ===")
-    click_nth_product(driver, n)
-    click_reviews_dropdown(driver)
-
-    summary = extract_product_review_summary(driver)
-    reviews = collect_reviews(driver, max_reviews=max_reviews)
+        summary = extract_product_review_summary(driver)
+        reviews = collect_reviews(driver, max_reviews=max_reviews, state=state)
+        s.add(len(reviews))
 
     rec = {
-        "retailer": "Chemist Warehouse",
+        "retailer": RETAILER,
         "title": "",
         "link": driver.current_url,
         "Review Summary": summary,
@@ -361,48 +294,209 @@ def process_nth_product(driver, n: int, results_url: str, max_reviews=5):
     }
     return rec
 
-def main():
-    driver = create_driver()
-    records = []
+def process_product_url(driver, url: str, max_reviews=MAX_REVIEWS, state=None):
+    """Open a product page directly (no trip back through the results page)."""
+    with span("scrape.product_open", items=1, site="cw"):
+        polite_get(driver, url, DELAY)
+        WebDriverWait(driver, 20).until(EC.url_contains("/buy/"))
+    return _product_record(driver, max_reviews, state)
+
+def category_product_links(driver, category: str, limit=PRODUCTS_PER_CATEGORY):
+    """Search a category and return the links of its first `limit` non-sponsored products."""
+    with span("scrape.search", site="cw", via="browser") as s:
+        if "chemistwarehouse.com.au" not in driver.current_url:
+            polite_get(driver, HOME, DELAY)
+        DELAY.wait()
+        search_and_submit(driver, category)
+        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "ul li")))
+        wait_for(driver, lambda d: nth_non_sponsored_anchor(d, limit), 10)   # whole first page rendered
+        links = []
+        for n in range(1, limit + 1):
+            a = nth_non_sponsored_anchor(driver, n)
+            if not a:
+                break
+            links.append(a.get_attribute("href"))
+        s.add(len(links))
+    print(f"[OK] {category}: {len(links)} products")
+    return links
+
+# ───────────────────────── Browser pool ─────────────────────────
+def _start_driver(headless: bool, wid: int = 0, lean: bool = True):
+    profile = f"cw-{wid}"       # one profile per worker: Chrome locks a profile while it's open
+    driver = create_driver(headless, profile, lean)
+    polite_get(driver, HOME, DELAY)
+    close_cookies_if_present(driver, profile)
+    return driver
+
+def _alive(driver) -> bool:
     try:
-        driver.get(HOME)
-        close_cookies_if_present(driver)
-
-        PRODUCT_TYPES = ["cleanser", "toner", "serum", "moisturizer", "sunscreen"]
+        driver.current_url
+        return True
+    except Exception:
+        return False
 
-        for category in PRODUCT_TYPES:
-            print(f"\n=== Processing category: {category} ===")
-            search_and_submit(driver, category)
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
 
-            WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "ul li")))
-            time.sleep(0.8)
-            results_url = driver.current_url
+class DriverPool:
+    """
+    `size` browsers, each driven by its own thread, pulling jobs from a
+    shared queue. A failed job is retried (on whichever worker is free) up to
+    MAX_ATTEMPTS times; a worker whose browser died or keeps failing restarts
+    it, and stops after MAX_RESTARTS restarts. Browsers are kept between
+    `run` calls and closed by `close`.
+    """
 
-            for i in range(1, 21):  # first 20 products
+    def __init__(self, size: int = WORKERS, headless: bool = True, lean: bool = True):
+        self.size = size
+        self.headless = headless
+        self.lean = lean
+        self._drivers = [None] * size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for i, driver in enumerate(self._drivers):
+            if driver is not None:
+                _quit(driver)
+                self._drivers[i] = None
+
+    def run(self, jobs, handler):
+        """handler(driver, job) for every job → ({job: result}, [failed jobs])."""
+        pending = queue.Queue()
+        for job in jobs:
+            pending.put((job, 0))
+        results, failed = {}, []
+        lock = threading.Lock()
+
+        def worker(wid):
+            restarts, consecutive_failures = 0, 0
+            while True:
                 try:
-                    print(f"\n=== Processing {category} product #{i} ===")
-                    rec = process_nth_product(driver, i, results_url, max_reviews=20)
-                    rec["category"] = category   # ✅ add category label
-                    records.append(rec)
-
-                    # Reset to results page before next product
-                    driver.get(results_url)
-                    WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "ul li")))
-                    time.sleep(0.6)
+                    job, attempts = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    if self._drivers[wid] is None:
+                        self._drivers[wid] = _start_driver(self.headless, wid, self.lean)
+                    result = handler(self._drivers[wid], job)
+                    with lock:
+                        results[job] = result
+                    consecutive_failures = 0
+                    continue
                 except Exception as e:
-                    print(f"[WARN] Skipping {category} product #{i} due to error: {e}")
-                    driver.get(results_url)
-                    time.sleep(0.6)
-
-        save_reviews_to_json(records)
+                    print(f"[WARN] worker {wid}: {job} failed (attempt {attempts + 1}): {e}")
+                    consecutive_failures += 1
+                    if attempts + 1 < MAX_ATTEMPTS:
+                        pending.put((job, attempts + 1))
+                    else:
+                        with lock:
+                            failed.append(job)
+
+                driver = self._drivers[wid]
+                if driver is not None and _alive(driver) and consecutive_failures < 2:
+                    continue
+                # crashed or wedged browser: start over with a fresh one
+                if driver is not None:
+                    _quit(driver)
+                self._drivers[wid] = None
+                restarts += 1
+                if restarts > MAX_RESTARTS:
+                    print(f"[ERROR] worker {wid}: too many browser restarts, stopping")
+                    return
+                print(f"[INFO] worker {wid}: restarting browser ({restarts}/{MAX_RESTARTS})")
+                consecutive_failures = 0
+
+        threads = [threading.Thread(target=worker, args=(wid,), daemon=True) for wid in range(self.size)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # jobs left behind by workers that gave up
+        while not pending.empty():
+            failed.append(pending.get_nowait()[0])
+        return results, failed
+
+# ───────────────────────── Main ─────────────────────────
+def _job_key(category, url):
+    return f"{category}|{url}"
+
+def scrape(checkpoint, categories=PRODUCT_TYPES, per_category=PRODUCTS_PER_CATEGORY,
+           max_reviews=MAX_REVIEWS, workers=WORKERS, headless=True, seen=None, lean=True):
+    """
+    Scrape every category with a pool of browsers, appending each product to
+    `checkpoint` as it finishes (products already there are skipped). With
+    `seen` (a SeenReviews) only reviews newer than the last run are kept.
+    Returns the checkpoint keys in category/product order.
+    """
+    with DriverPool(workers, headless, lean) as pool:
+        links, failed = pool.run(categories, lambda d, c: category_product_links(d, c, per_category))
+        for category in failed:
+            print(f"[WARN] Skipping category {category}: search failed")
+
+        jobs = [(category, n, url)
+                for category in categories
+                for n, url in enumerate(links.get(category, []), 1)]
+        todo = [job for job in jobs if _job_key(job[0], job[2]) not in checkpoint]
+        if len(todo) < len(jobs):
+            print(f"[RESUME] {len(jobs) - len(todo)} products already in {checkpoint.path}")
+        print(f"\n=== {len(todo)} products across {workers} browsers ===")
+
+        def handle(driver, job):
+            category, n, url = job
+            print(f"\n=== Processing {category} product #{n} ===")
+            state = seen.state(RETAILER, url) if seen is not None else None
+            rec = process_product_url(driver, url, max_reviews, state)
+            rec["category"] = category   # ✅ add category label
+            checkpoint.add(_job_key(category, url), rec)
+            if seen is not None:
+                seen.stage(RETAILER, url, list(rec["Reviewer Details"].values()), CW_FIELDS)
+
+        _, failed = pool.run(todo, handle)
+        for category, n, _ in failed:
+            print(f"[WARN] Skipping {category} product #{n}: gave up after {MAX_ATTEMPTS} attempts")
+
+    return [_job_key(category, url) for category, _, url in jobs]
 
+def main():
+    ap = argparse.ArgumentParser(description="Scrape Chemist Warehouse skincare reviews.")
+    ap.add_argument("--workers", type=int, default=WORKERS, help="parallel browsers")
+    ap.add_argument("--per-category", type=int, default=PRODUCTS_PER_CATEGORY)
+    ap.add_argument("--max-reviews", type=int, default=MAX_REVIEWS)
+    ap.add_argument("--show-browser", action="store_true", help="run Chrome with a visible window")
+    ap.add_argument("--no-lean", dest="lean", action="store_false",
+                    help="load pages fully (images, fonts, trackers, animations)")
+    ap.add_argument("--resume", action="store_true",
+                    help=f"continue an interrupted run, skipping products already in {CHECKPOINT}")
+    ap.add_argument("--incremental", action="store_true",
+                    help="only keep reviews newer than previous runs (tracked in seen_reviews.sqlite)")
+    args = ap.parse_args()
+
+    seen = SeenReviews() if args.incremental else None
+    if seen is not None and not args.resume:
+        seen.discard_pending()
+    try:
+        with Checkpoint(CHECKPOINT, resume=args.resume) as checkpoint:
+            order = scrape(checkpoint, per_category=args.per_category, max_reviews=args.max_reviews,
+                           workers=args.workers, headless=not args.show_browser, seen=seen, lean=args.lean)
+            save_reviews_to_json(checkpoint, order)
+        checkpoint.discard()
+        if seen is not None:
+            seen.commit()
+            print(f"[SEEN] {seen.stats()}")
     except Exception as e:
-        print(f"[ERROR] {e}")
+        print(f"[ERROR] {e}  (rerun with --resume to continue)")
     finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
+        if seen is not None:
+            seen.close()
 
 
 if __name__ == "__main__":
@@ -1,69 +1,101 @@
+import os
+
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from review_store import read_reviews, store_exists
+from vader_engine import SITES, summarize
+
 # Input file (generated from cw_vader.py)
 INPUT_CSV = "cw_product_vader_scores1.csv"
 
-# Load summary
-df = pd.read_csv(INPUT_CSV)
-
-# =========================
-# 1. Overall Sentiment Distribution
-# =========================
-sentiment_counts = df["overall_sentiment"].value_counts()
-
-plt.figure(figsize=(6, 6))
-sentiment_counts.plot(kind="pie", autopct="%1.1f%%", colors=["green", "red", "gray"])
-plt.title("Overall Sentiment Distribution (Chemist Warehouse Products)")
-plt.ylabel("")
-plt.savefig("cw_overall_sentiment_pie.png")
-plt.close()
-
-# =========================
-# 2. Review Sentiment by Category
-# =========================
-plt.figure(figsize=(10, 6))
-df.groupby("category")["overall_sentiment"].value_counts(normalize=True).unstack().plot(
-    kind="bar", stacked=True, figsize=(10, 6), color=["green", "red", "gray"]
-)
-plt.title("Sentiment Distribution by Product Category")
-plt.xlabel("Category")
-plt.ylabel("Proportion of Reviews")
-plt.legend(title="Sentiment")
-plt.tight_layout()
-plt.savefig("cw_sentiment_by_category.png")
-plt.close()
-
-# =========================
-# 3. Top Products by Average Compound Score
-# =========================
-top_products = df.sort_values("avg_compound", ascending=False).head(10)
-
-plt.figure(figsize=(10, 6))
-plt.barh(top_products["product"], top_products["avg_compound"], color="green")
-plt.title("Top 10 Products by Sentiment Score")
-plt.xlabel("Average Compound Score")
-plt.gca().invert_yaxis()
-plt.tight_layout()
-plt.savefig("cw_top_products.png")
-plt.close()
-
-# =========================
-# 4. Negative Reviews Analysis
-# =========================
-neg_products = df.sort_values("negative_reviews", ascending=False).head(10)
-
-plt.figure(figsize=(10, 6))
-plt.barh(neg_products["product"], neg_products["negative_reviews"], color="red")
-plt.title("Products with Most Negative Reviews")
-plt.xlabel("Count of Negative Reviews")
-plt.gca().invert_yaxis()
-plt.tight_layout()
-plt.savefig("cw_most_negative_products.png")
-plt.close()
-
-print("✅ Visualizations generated:")
-print(" - cw_overall_sentiment_pie.png")
-print(" - cw_sentiment_by_category.png")
-print(" - cw_top_products.png")
-print(" - cw_most_negative_products.png")
+CHARTS = [
+    "cw_overall_sentiment_pie.png",
+    "cw_sentiment_by_category.png",
+    "cw_top_products.png",
+    "cw_most_negative_products.png",
+]
+
+
+def load_summary() -> pd.DataFrame:
+    # from the columnar store when it has a Chemist Warehouse partition (only
+    # its scored columns are read), else from the CSV
+    if store_exists():
+        cw = SITES["cw"]
+        reviews = read_reviews(
+            ["product", "category", "vader_sentiment", "compound", "pos", "neg", "neu"],
+            retailer=cw.name,
+        )
+        if len(reviews):
+            return summarize(reviews, cw.group_keys, cw.include_total)
+    return pd.read_csv(INPUT_CSV)
+
+
+def make_charts(df: pd.DataFrame, out_dir: str = "."):
+    pie, by_category, top, most_negative = (os.path.join(out_dir, name) for name in CHARTS)
+
+    # =========================
+    # 1. Overall Sentiment Distribution
+    # =========================
+    sentiment_counts = df["overall_sentiment"].value_counts()
+
+    plt.figure(figsize=(6, 6))
+    sentiment_counts.plot(kind="pie", autopct="%1.1f%%", colors=["green", "red", "gray"])
+    plt.title("Overall Sentiment Distribution (Chemist Warehouse Products)")
+    plt.ylabel("")
+    plt.savefig(pie)
+    plt.close()
+
+    # =========================
+    # 2. Review Sentiment by Category
+    # =========================
+    plt.figure(figsize=(10, 6))
+    df.groupby("category")["overall_sentiment"].value_counts(normalize=True).unstack().plot(
+        kind="bar", stacked=True, figsize=(10, 6), color=["green", "red", "gray"]
+    )
+    plt.title("Sentiment Distribution by Product Category")
+    plt.xlabel("Category")
+    plt.ylabel("Proportion of Reviews")
+    plt.legend(title="Sentiment")
+    plt.tight_layout()
+    plt.savefig(by_category)
+    plt.close()
+
+    # =========================
+    # 3. Top Products by Average Compound Score
+    # =========================
+    top_products = df.sort_values("avg_compound", ascending=False).head(10)
+
+    plt.figure(figsize=(10, 6))
+    plt.barh(top_products["product"], top_products["avg_compound"], color="green")
+    plt.title("Top 10 Products by Sentiment Score")
+    plt.xlabel("Average Compound Score")
+    plt.gca().invert_yaxis()
+    plt.tight_layout()
+    plt.savefig(top)
+    plt.close()
+
+    # =========================
+    # 4. Negative Reviews Analysis
+    # =========================
+    neg_products = df.sort_values("negative_reviews", ascending=False).head(10)
+
+    plt.figure(figsize=(10, 6))
+    plt.barh(neg_products["product"], neg_products["negative_reviews"], color="red")
+    plt.title("Products with Most Negative Reviews")
+    plt.xlabel("Count of Negative Reviews")
+    plt.gca().invert_yaxis()
+    plt.tight_layout()
+    plt.savefig(most_negative)
+    plt.close()
+
+
+def main():
+    make_charts(load_summary())
+    print("✅ Visualizations generated:")
+    for name in CHARTS:
+        print(f" - {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,16 @@
 import streamlit as st 
 import pandas as pd
-import json
-from langchain_community.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
 import os
-import re
 from dotenv import load_dotenv
 import plotly.express as px
 import plotly.graph_objects as go
 
+from dashboard_data import CATEGORY_SITES, ProductIndex, build_index, load_site
+from insight_cache import InsightCache
+from insight_schema import is_empty, parse_insight
+from llm_insights import iter_insights, make_chains, make_map_chain, prepare_reviews
+from stage_metrics import span
+
 # Load environment variables for OpenAI
 load_dotenv()
 
@@ -18,85 +19,21 @@ load_dotenv()
 # -------------------------------
 @st.cache_data
 def load_data(site):
-    if site == "Amazon":
-        reviews_file = "amazon_search_results_1.json"   # after sentiment
-        csv_file = "product_vader_scores.csv"
-        with open(reviews_file, "r", encoding="utf-8") as f:
-            reviews = json.load(f)
-        summary_df = pd.read_csv(csv_file, encoding="utf-8")
-        return reviews, summary_df
-
-    elif site == "Myer":
-        reviews_file = "myer_skin_care_reviews_vader.json"
-        csv_file = "myer_skin_care_reviews_vader.csv"
-        with open(reviews_file, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-
-        reviews = []
-        for product in raw.get("products", []):
-            product_name = product.get("name") or product.get("product_url")
-            for r in product.get("reviews", []):
-                reviews.append({
-                    "product": product_name,
-                    "review": r.get("body"),
-                    "vader_sentiment": r.get("vader_sentiment", "Neutral")
-                })
-
-        summary_df = pd.read_csv(csv_file, encoding="utf-8")
-        return reviews, summary_df
-
-    elif site == "Mecca":
-        reviews_file = "mecca_skin_care_reviews_vader.json"
-        csv_file = "mecca_skin_care_reviews_vader.csv"
-        with open(reviews_file, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-
-        reviews = []
-        for product in raw.get("products", []):
-            product_name = product.get("name") or product.get("product_url")
-            for r in product.get("reviews", []):
-                reviews.append({
-                    "product": product_name,
-                    "review": r.get("body"),
-                    "vader_sentiment": r.get("vader_sentiment", "Neutral")
-                })
-
-        summary_df = pd.read_csv(csv_file, encoding="utf-8")
-        return reviews, summary_df
-    
-    elif site == "Chemist Warehouse":
-        reviews_file = "cw_reviews_sentiment1.json"
-        csv_file = "cw_product_vader_scores1.csv"
-
-        with open(reviews_file, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-
-        reviews = []
-
-        if isinstance(raw, dict) and "products" in raw:
-            products = raw["products"]
-        elif isinstance(raw, list):
-            products = raw
-        else:
-            products = []
-
-        for product in products:
-            product_name = product.get("name") or product.get("product_url")
-            for r in product.get("reviews", []):
-                reviews.append({
-                    "product": product_name,
-                    "review": r.get("body"),
-                    "vader_sentiment": r.get("vader_sentiment", "Neutral")
-                })
-
-        summary_df = pd.read_csv(csv_file, encoding="utf-8")
-        if "product" not in summary_df.columns:
-            summary_df = summary_df.rename(columns={summary_df.columns[0]: "product"})
-
-        return reviews, summary_df
-
-    else:
-        raise ValueError("Unknown site")
+    with span("dashboard.load_data", site=site) as s:
+        reviews, summary_df = load_site(site)
+        s.add(len(reviews))
+    return reviews, summary_df
+
+# Per-product index, built once per site and shared across reruns
+@st.cache_resource
+def build_product_index(site) -> ProductIndex:
+    reviews, summary_df = load_data(site)
+    with span("dashboard.build_index", items=len(reviews), site=site):
+        return build_index(site, reviews, summary_df)
+
+@st.cache_resource
+def get_insight_cache() -> InsightCache:
+    return InsightCache()
 
 # -------------------------------
 # Sidebar selections
@@ -106,49 +43,24 @@ st.title("🧴 Product Review Analysis (Amazon, Myer, Mecca & Chemist Warehouse)
 
 site = st.selectbox("🌍 Select a Website", ["Amazon", "Myer", "Mecca", "Chemist Warehouse"])
 
-reviews, summary_df = load_data(site)
-
-# --- Add helper function for categories ---
-def assign_category(product_name: str) -> str:
-    product_name = str(product_name).lower()
-    if "cleanser" in product_name or "cleanse" in product_name:
-        return "cleanser"
-    elif "toner" in product_name:
-        return "toner"
-    elif "serum" in product_name:
-        return "serum"
-    elif "moisturizer" in product_name or "cream" in product_name or "lotion" in product_name:
-        return "moisturizer"
-    elif "sunscreen" in product_name or "spf" in product_name:
-        return "sunscreen"
-    else:
-        return "other"
+index = build_product_index(site)
 
 # --- Myer, Mecca & Chemist Warehouse: use category + product sub-dropdowns ---
-if site in ["Myer", "Mecca", "Chemist Warehouse"]:
-    summary_df["category"] = summary_df["product"].apply(assign_category)
-
-    categories = summary_df["category"].dropna().unique().tolist()
+if site in CATEGORY_SITES:
+    categories = list(index.category_products)
     selected_category = st.selectbox("📂 Select a Category", categories)
 
-    category_products = summary_df[summary_df["category"] == selected_category]["product"].tolist()
+    category_products = index.category_products[selected_category]
     selected_product = st.selectbox("🧴 Select a Product", category_products)
 else:
-    product_list = summary_df["product"].tolist()
+    product_list = index.products
     selected_product = st.selectbox("🛍 Select a Product", product_list)
 
-# 🔎 Filter reviews for selected product
-product_reviews = [r for r in reviews if r.get("product") == selected_product]
-positive_reviews = [r["review"] for r in product_reviews if r.get("vader_sentiment") == "Positive"]
-negative_reviews = [r["review"] for r in product_reviews if r.get("vader_sentiment") == "Negative"]
-
-# Balance positive/negative (max 50 each)
-positive_reviews = positive_reviews[:50]
-negative_reviews = negative_reviews[:50]
-bal_reviews = positive_reviews + negative_reviews
+# 🔎 Look up reviews for selected product
+product_reviews = index.reviews.get(selected_product, {})
 
 # Get summary row
-product_stats = summary_df[summary_df["product"] == selected_product].iloc[0]
+product_stats = index.stats[selected_product]
 
 # -------------------------------
 # Sentiment Overview
@@ -315,129 +227,70 @@ st.plotly_chart(fig, use_container_width=True)
 # LLM Insights
 # -------------------------------
 
-# === 1️⃣ Existing Overall Prompt ===
-review_analysis_prompt = PromptTemplate(
-    input_variables=["reviews"],
-    template="""
-    You are an expert assistant analyzing customer reviews for a skincare product.
-
-    Given the following customer reviews (mixed positive and negative), do the following:
-    1. Identify the **top 5 positive key points** customers appreciated.
-    2. Identify the **top 5 negative key points** customers complained about.
-    3. Extract up to **8 important keywords** (relevant to skincare concerns, ingredients, 
-    skin types, product effects, or common themes) mentioned in the reviews that customers look for. For each keyword, include:
-    - Total number of **positive mentions**
-    - Total number of **negative mentions**
-    - Ensure that similar keywords (like "oily skin" and "greasy") are considered together.
-    
-    Reviews:
-    {reviews}
-
-    Output format:
-    ### Positive Insights:
-    - ...
-    - ...
-
-    ### Negative Insights:
-    - ...
-    - ...
-
-    ### Top Keywords and Mentions:
-    - keyword1: X positive mentions, Y negative mentions  
-    - keyword2: A positive mentions, B negative mentions  
-    ... up to 8
-    """
-)
-
-# === 2️⃣ NEW Skin-Segmented Prompt ===
-skin_segmentation_prompt = PromptTemplate(
-    input_variables=["reviews"],
-    template="""
-    You are an advanced skincare expert analyzing customer reviews.  
-    Classify and summarize feedback **by skin profile segments**.
-
-    Use the following segmentation criteria:
-
-    **Skin Type:**
-    - Dry  
-    - Oily  
-    - Combination  
-    - Normal  
-
-    **Sensitivity:**
-    - Sensitive  
-    - Not Sensitive  
-
-    **Skin Concerns:**
-    - Acne  
-    - Pigmentation & Scarring  
-    - Ageing  
-    - Blackheads  
-    - Large pores  
-    - Dullness  
-    - Redness  
-    - Eczema, Psoriasis, Rosacea  
-    - Dark circles  
-    - Uneven texture  
-
-    Analyze the reviews below and:
-    1. Group feedback by **skin profile segment** (skin type, sensitivity, and concern).  
-      
-
-    Reviews:
-    {reviews}
-
-    Output Format:
-    ### 🧬 Skin Profile–Segmented Insights
-    #### Dry Skin
-    - 1: ...
-    - 2: ...
-
-    #### Oily Skin
-    - 1: ...
-    - 2: ...
-
-    #### Sensitive Skin
-    - 1: ...
-    - 2: ...
-
-    #### Acne-Prone Skin
-    - 1: ...
-    - 2: ...
-
-    (Continue for any relevant segments)
-    """
-)
-
-# === 3️⃣ Run both LLM analyses ===
-llm = ChatOpenAI(temperature=0.5, model="gpt-3.5-turbo")
-
-chain_general = LLMChain(llm=llm, prompt=review_analysis_prompt)
-chain_skin = LLMChain(llm=llm, prompt=skin_segmentation_prompt)
-
-with st.spinner("Analyzing reviews (general insights)..."):
-    response_general = chain_general.run({"reviews": " ".join(bal_reviews)})
-
-with st.spinner("Analyzing reviews (skin profile segmentation)..."):
-    response_skin = chain_skin.run({"reviews": " ".join(bal_reviews)})
-
-# === 4️⃣ Display General Insights ===
-st.subheader("📈 Review Analysis Summary")
-
-positive_section = re.search(r"### Positive Insights:\n(.*?)\n###", response_general, re.DOTALL)
-negative_section = re.search(r"### Negative Insights:\n(.*?)\n###", response_general, re.DOTALL)
-keywords_section = re.search(r"### Top Keywords and Mentions:\n(.*)", response_general, re.DOTALL)
-
-st.subheader("✨ Positive Insights")
-st.success(positive_section.group(1).strip() if positive_section else "Not found.")
-
-st.subheader("⚠️ Negative Insights")
-st.error(negative_section.group(1).strip() if negative_section else "Not found.")
-
-st.subheader("🔑 Top Keywords")
-st.markdown(keywords_section.group(1).strip() if keywords_section else "Not found.")
-
-# === 5️⃣ NEW Subsection: Skin Profile–Segmented Analysis ===
+# Prompts live in llm_insights.py (shared with the offline precompute)
+
+# === 3️⃣ Display helpers for the two analyses (redrawn as tokens stream in) ===
+# Both take the parsed JSON insight (insight_schema.py); a partial stream
+# parses to the entries completed so far.
+def render_general(insight, done):
+    st.subheader("📈 Review Analysis Summary")
+
+    keywords = [f"{k['keyword']}: {k['positive']} positive mentions, {k['negative']} negative mentions"
+                for k in insight["keywords"]]
+    for title, items, box in (("✨ Positive Insights", insight["positive"], st.success),
+                              ("⚠️ Negative Insights", insight["negative"], st.error),
+                              ("🔑 Top Keywords", keywords, st.markdown)):
+        st.subheader(title)
+        if items:
+            box("\n".join(f"- {item}" for item in items))
+        elif done:
+            box("Not found.")
+        else:
+            st.caption("⏳ ...")
+
+def render_skin(insight, done):
+    st.subheader("🧬 Skin Profile–Segmented Insights")
+    for segment in insight["segments"]:
+        st.markdown(f"#### {segment['segment']}\n"
+                    + "\n".join(f"{i}. {text}" for i, text in enumerate(segment["insights"], 1)))
+    if not done:
+        st.caption("⏳ ...")
+    elif not insight["segments"]:
+        st.info("Not found.")
+
+# === 4️⃣ Stream both LLM analyses concurrently (cached per product/review set) ===
+# Sections fill in as tokens arrive; a failed or timed-out call only affects
+# its own section.
+chains = make_chains()
+insight_cache = get_insight_cache()
+
+# De-duplicated reviews within the token budget; large products are condensed
+# chunk by chunk first (map-reduce)
+with st.spinner("Selecting reviews..."):
+    bal_reviews = prepare_reviews(product_reviews, make_map_chain(), insight_cache, site, selected_product)
+
+general_slot = st.empty()
 st.markdown("---")
-#st.subheader("🧬 Skin Profile–Segmented Insights")
-st.markdown(response_skin)
+skin_slot = st.empty()
+
+general_slot.info("⏳ Analyzing reviews (general insights)...")
+skin_slot.info("⏳ Analyzing reviews (skin profile segmentation)...")
+
+slots = {"general": (general_slot, render_general), "skin": (skin_slot, render_skin)}
+texts = {name: "" for name in chains}
+shown = {name: None for name in chains}
+for name, piece, done, error in iter_insights(chains, bal_reviews, insight_cache, site, selected_product):
+    # the JSON so far, closed after its last complete entry
+    texts[name] += piece
+    insight = parse_insight(name, texts[name])
+    slot, render = slots[name]
+
+    if error is not None:
+        with slot.container():
+            if not is_empty(insight):
+                render(insight, done)
+            st.warning(f"Could not generate the {name} analysis: {error}")
+    elif insight != shown[name] or done:
+        shown[name] = insight
+        with slot.container():
+            render(insight, done)
@@ -0,0 +1,97 @@
+# dashboard_data.py
+"""
+Data loading and per-product indexing behind dashboard_cw.py.
+
+Kept out of the Streamlit script so offline jobs (e.g. the LLM insight
+precompute in llm_insights.py) see exactly the products and reviews the
+dashboard shows.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from review_normalize import read_site
+from review_store import read_reviews, store_exists
+
+# -------------------------------
+# Load JSON + CSV per website
+# -------------------------------
+SUMMARY_FILES = {
+    "Amazon": "product_vader_scores.csv",
+    "Myer": "myer_skin_care_reviews_vader.csv",
+    "Mecca": "mecca_skin_care_reviews_vader.csv",
+    "Chemist Warehouse": "cw_product_vader_scores1.csv",
+}
+
+def load_site(site):
+    """(reviews, summary_df) for one website; reviews are {product, review, vader_sentiment} dicts."""
+    # Prefer the columnar store (review_store.py): only the three columns used here are read
+    if site in SUMMARY_FILES and store_exists():
+        reviews = read_reviews(["product", "review", "vader_sentiment"], retailer=site).to_dict("records")
+        if reviews:
+            summary_df = pd.read_csv(SUMMARY_FILES[site], encoding="utf-8")
+            if "product" not in summary_df.columns:
+                summary_df = summary_df.rename(columns={summary_df.columns[0]: "product"})
+            return reviews, summary_df
+    return load_data_json(site)
+
+def load_data_json(site):
+    """Same as load_site, read from the scored JSON through review_normalize (every review the summary counts)."""
+    if site not in SUMMARY_FILES:
+        raise ValueError("Unknown site")
+    reviews = [
+        {"product": r.product, "review": r.text, "vader_sentiment": r.sentiment or "Neutral"}
+        for r in read_site(site)
+    ]
+    summary_df = pd.read_csv(SUMMARY_FILES[site], encoding="utf-8")
+    if "product" not in summary_df.columns:
+        summary_df = summary_df.rename(columns={summary_df.columns[0]: "product"})
+    return reviews, summary_df
+
+# --- Helper function for categories ---
+def assign_category(product_name: str) -> str:
+    product_name = str(product_name).lower()
+    if "cleanser" in product_name or "cleanse" in product_name:
+        return "cleanser"
+    elif "toner" in product_name:
+        return "toner"
+    elif "serum" in product_name:
+        return "serum"
+    elif "moisturizer" in product_name or "cream" in product_name or "lotion" in product_name:
+        return "moisturizer"
+    elif "sunscreen" in product_name or "spf" in product_name:
+        return "sunscreen"
+    else:
+        return "other"
+
+# -------------------------------
+# Per-product index
+# -------------------------------
+CATEGORY_SITES = ["Myer", "Mecca", "Chemist Warehouse"]
+
+@dataclass
+class ProductIndex:
+    products: List[str]                                       # summary order
+    stats: Dict[str, Dict[str, Any]]                          # product → summary row
+    reviews: Dict[str, Dict[str, List[str]]]                  # product → sentiment → review texts
+    category_products: Dict[str, List[str]] = field(default_factory=dict)   # category → products
+
+def build_index(site, reviews, summary_df) -> ProductIndex:
+    by_product = defaultdict(lambda: defaultdict(list))
+    for r in reviews:
+        by_product[r.get("product")][r.get("vader_sentiment")].append(r.get("review"))
+
+    # first row wins when a product appears more than once (e.g. under two categories)
+    first_rows = summary_df.drop_duplicates("product")
+    index = ProductIndex(
+        products=summary_df["product"].tolist(),
+        stats=first_rows.set_index("product").to_dict("index"),
+        reviews={p: dict(groups) for p, groups in by_product.items()},
+    )
+
+    if site in CATEGORY_SITES:
+        for product, category in zip(summary_df["product"], summary_df["product"].map(assign_category)):
+            index.category_products.setdefault(category, []).append(product)
+    return index
@@ -0,0 +1,190 @@
+# fake_llm_server.py
+"""
+Local stand-in for the OpenAI chat-completions API, for running the insight
+jobs and the dashboard offline (and for load-testing insight_batch.py's
+rate limiting and retries):
+
+    python fake_llm_server.py --port 8808 --rpm 600 --fail-rate 0.05 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8808/v1 python insight_batch.py
+
+It answers POST .../chat/completions with a canned reply in the shape each
+prompt asks for (JSON for the general and skin prompts, text notes for the
+map step), streamed as server-sent events when "stream" is set, and reports
+token usage at ~4 characters per token. Over `rpm` requests in the last
+minute it answers 429 with Retry-After, like the real API, `fail_rate` of
+the other requests get a 500, and `truncate_rate` of the replies are cut
+short (finish_reason "length"). GET /stats returns the counts.
+"""
+from __future__ import annotations
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+GENERAL = {
+    "positive": ["Gentle on the skin", "Leaves skin soft and hydrated", "Good value for the size",
+                 "Pleasant, light texture", "Works well under makeup"],
+    "negative": ["Pump breaks easily", "Scent is too strong for some", "Can feel sticky in humid weather",
+                 "Caused breakouts for a few reviewers", "Pricier than alternatives"],
+    "keywords": [
+        {"keyword": "hydration", "positive": 12, "negative": 1},
+        {"keyword": "sensitive skin", "positive": 8, "negative": 2},
+        {"keyword": "texture", "positive": 6, "negative": 3},
+        {"keyword": "breakouts", "positive": 0, "negative": 4},
+    ],
+}
+
+SKIN = {
+    "segments": [
+        {"segment": "Dry Skin", "insights": ["Felt comfortable and hydrated all day",
+                                             "Some wanted a richer finish in winter"]},
+        {"segment": "Oily Skin", "insights": ["Did not feel greasy", "A few saw more shine by midday"]},
+        {"segment": "Sensitive Skin", "insights": ["No stinging or redness reported by most"]},
+    ],
+}
+
+NOTES = """Positive: gentle (5), hydrating (4), good value (2)
+Negative: sticky (2), broke me out (1)
+Keywords: hydration +5/-0, sensitive skin +3/-1
+Skin: dry skin: comfortable (3); oily skin: a little shiny (1)
+"""
+
+
+def canned_reply(prompt: str) -> str:
+    if "condensing one batch" in prompt:
+        return NOTES
+    return json.dumps(SKIN if "skin profile segments" in prompt else GENERAL, indent=2, ensure_ascii=False)
+
+
+def make_handler(rpm: Optional[int], fail_rate: float, latency: float, stats: Counter,
+                 truncate_rate: float = 0.0):
+    recent = deque()                 # arrival times within the last minute
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _json(self, status: int, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                with lock:
+                    self._json(200, dict(stats))
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+
+            now = time.monotonic()
+            with lock:
+                stats["requests"] += 1
+                while recent and now - recent[0] > 60:
+                    recent.popleft()
+                limited = rpm is not None and len(recent) >= rpm
+                if limited:
+                    stats["rate_limited"] += 1
+                    retry_after = max(0.05, 60 - (now - recent[0]))
+                else:
+                    recent.append(now)
+                    failed = random.random() < fail_rate
+                    stats["failed" if failed else "ok"] += 1
+            if limited:
+                self._json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                           {"Retry-After": f"{retry_after:.2f}"})
+                return
+            if failed:
+                self._json(500, {"error": {"message": "The server had an error", "type": "server_error"}})
+                return
+
+            if latency:
+                time.sleep(random.uniform(0.5, 1.5) * latency)
+            prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+            reply, finish = canned_reply(prompt), "stop"
+            if random.random() < truncate_rate:        # ran into the length limit
+                reply, finish = reply[:random.randint(1, len(reply) - 1)], "length"
+                with lock:
+                    stats["truncated"] += 1
+            usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(reply) // 4}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            with lock:
+                stats["tokens"] += usage["total_tokens"]
+            model = body.get("model", "gpt-3.5-turbo")
+            if body.get("stream"):
+                self._stream(reply, model, finish)
+                return
+            self._json(200, {
+                "id": f"chatcmpl-fake-{stats['requests']}", "object": "chat.completion",
+                "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                             "finish_reason": finish}],
+                "usage": usage,
+            })
+
+        def _stream(self, reply: str, model: str, finish: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            pieces = [line + "\n" for line in reply.split("\n")]
+            for piece in pieces + [None]:
+                delta = {"content": piece} if piece is not None else {}
+                chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [{"index": 0, "delta": delta,
+                                                      "finish_reason": None if piece is not None else finish}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, rpm: Optional[int] = None, fail_rate: float = 0.0,
+          latency: float = 0.0, truncate_rate: float = 0.0):
+    """Start the fake API in a background thread → (server, stats); the port is server.server_address[1]."""
+    stats = Counter()
+    server = ThreadingHTTPServer((host, port), make_handler(rpm, fail_rate, latency, stats, truncate_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake OpenAI chat-completions server.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8808)
+    ap.add_argument("--rpm", type=int, default=None, help="answer 429 beyond this many requests per minute")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests that get a 500")
+    ap.add_argument("--latency", type=float, default=0.0, help="mean seconds per response")
+    ap.add_argument("--truncate-rate", type=float, default=0.0,
+                    help="fraction of replies cut short, as if they hit the length limit")
+    args = ap.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(args.rpm, args.fail_rate, args.latency, Counter(), args.truncate_rate))
+    print(f"Fake chat-completions API on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
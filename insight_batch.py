@@ -0,0 +1,335 @@
+# insight_batch.py
+"""
+Offline LLM insight job: runs the general and skin-segmentation prompts for
+every product of every website summary, many requests at a time.
+
+    python insight_batch.py                              # all websites
+    python insight_batch.py --site Myer --concurrency 16 --rpm 3000 --tpm 250000
+    python insight_batch.py --resume                     # continue after a crash or Ctrl-C
+
+Results go into the same InsightCache (and under the same keys, with the
+same map-reduce for large products) as the dashboard's own calls, so the
+dashboard shows them straight away. Requests are paced by two token buckets,
+one for requests and one for tokens per minute (each request is charged its
+estimated tokens up front and settled against the reported usage). 429s,
+5xx and timeouts are retried with jittered exponential backoff, and a 429's
+Retry-After holds back every worker. A reply with no usable JSON insight is
+asked for again; a cut-off one is repaired and kept (insight_schema.py). Finished products are logged to
+PROGRESS_PATH; --resume skips them.
+
+HTTP calls use `requests` on a thread pool, driven from asyncio. To try it
+offline, point it at fake_llm_server.py:
+
+    python fake_llm_server.py --rpm 600 --fail-rate 0.05 &
+    python insight_batch.py --api-base http://127.0.0.1:8808/v1
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+from dashboard_data import SUMMARY_FILES, build_index, load_site
+from insight_cache import InsightCache
+from llm_insights import (JSON_MODE, LLM_TIMEOUT, MODEL, PROMPTS, TEMPERATURE, map_chunks, review_notes_prompt,
+                          review_pool, stored_response)
+from review_sampling import count_tokens
+from scrape_checkpoint import Checkpoint
+from stage_metrics import span
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+PROGRESS_PATH = "llm_insights.progress.jsonl"
+CONCURRENCY = 8              # requests in flight
+RPM = 500                    # keep both limits a little under the account's
+TPM = 80_000
+BURST_SECONDS = 6            # a bucket holds this many seconds of its rate
+COMPLETION_TOKENS = 700      # charged up front for the reply, settled against usage
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 1.0           # seconds; doubles per attempt, full jitter
+BACKOFF_CAP = 60.0
+PROGRESS_SECONDS = 10
+
+
+# ---------- rate limiting ----------
+class TokenBucket:
+    """`per_minute` units, refilled continuously; holds at most BURST_SECONDS' worth."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.level = self.capacity
+        self._stamp = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None     # made in the running loop
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    async def take(self, amount: float):
+        amount = min(amount, self.capacity)      # an oversized request still goes, on a full bucket
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:                   # first come, first served
+            self._refill()
+            while self.level < amount:
+                await asyncio.sleep((amount - self.level) / self.rate)
+                self._refill()
+            self.level -= amount
+
+    def adjust(self, delta: float):
+        """Give back (delta > 0) or charge more (delta < 0) once the real cost is known."""
+        self._refill()
+        self.level = min(self.capacity, self.level + delta)
+
+
+class RateLimiter:
+    def __init__(self, rpm: float = RPM, tpm: float = TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._resume_at = 0.0
+
+    async def acquire(self, tokens: int):
+        while (wait := self._resume_at - time.monotonic()) > 0:
+            await asyncio.sleep(wait)
+        await self.requests.take(1)
+        await self.tokens.take(tokens)
+
+    def settle(self, estimated: int, used: int):
+        self.tokens.adjust(estimated - used)
+
+    def pause(self, seconds: float):
+        """Hold every request back for `seconds` (the server said so)."""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+# ---------- HTTP ----------
+class RetryableError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _retry_after(headers) -> Optional[float]:
+    for name, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        try:
+            return float(headers[name]) / scale
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+class ChatClient:
+    """Blocking chat-completions client; one requests.Session per thread."""
+
+    def __init__(self, api_base: str, api_key: Optional[str] = None, timeout: float = LLM_TIMEOUT):
+        self.url = api_base.rstrip("/") + "/chat/completions"
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def complete(self, prompt: str, model: str, temperature: float, **options) -> Tuple[str, Optional[int]]:
+        """→ (reply text, total tokens the server reports); `options` go into the request body."""
+        payload = {"model": model, "temperature": temperature,
+                   "messages": [{"role": "user", "content": prompt}], **options}
+        try:
+            resp = self._session().post(self.url, json=payload, headers=self.headers, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryableError(f"{type(e).__name__}: {e}") from e
+        if resp.status_code == 429 or resp.status_code >= 500:
+            raise RetryableError(f"HTTP {resp.status_code}: {resp.text[:200]}", resp.status_code,
+                                 _retry_after(resp.headers))
+        resp.raise_for_status()
+        body = resp.json()
+        return body["choices"][0]["message"]["content"], (body.get("usage") or {}).get("total_tokens")
+
+
+def backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+    if retry_after is not None:
+        return retry_after + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+# ---------- batch ----------
+class InsightBatch:
+    def __init__(self, client: ChatClient, cache: InsightCache, limiter: RateLimiter,
+                 concurrency: int = CONCURRENCY):
+        self.client = client
+        self.cache = cache
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.stats = Counter()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency)
+        self._slots: Optional[asyncio.Semaphore] = None     # made in the running loop
+
+    def _post(self, name: str, site: str, n_reviews: int, text: str, temperature: float):
+        options = JSON_MODE if name in PROMPTS else {}
+        with span("llm.call", items=n_reviews, chain=name, site=site):
+            return self.client.complete(text, MODEL, temperature, **options)
+
+    async def call(self, name: str, prompt, reviews: List[str], site: str, product: str) -> str:
+        """One prompt over `reviews`: from the cache, else from the API (rate-limited, retried)."""
+        # same model settings as make_chains / make_map_chain, hence the same cache keys
+        temperature = 0 if name == "map" else TEMPERATURE
+        key = self.cache.key_for(prompt.template, MODEL, temperature, reviews)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats["cached"] += 1
+            return cached
+
+        text = prompt.format(reviews=" ".join(reviews))
+        estimate = count_tokens(text) + COMPLETION_TOKENS
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                async with self._slots:
+                    await self.limiter.acquire(estimate)
+                    response, used = await loop.run_in_executor(
+                        self._pool, self._post, name, site, len(reviews), text, temperature)
+            except RetryableError as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                self.stats["retries"] += 1
+                if e.status == 429 and e.retry_after:
+                    self.limiter.pause(e.retry_after)
+                await asyncio.sleep(backoff(attempt, e.retry_after))
+                continue
+            used = used or estimate
+            self.limiter.settle(estimate, used)
+            self.stats["calls"] += 1
+            self.stats["tokens"] += used
+            stored = stored_response(name, response)
+            if stored is None:
+                if attempt == MAX_ATTEMPTS:
+                    raise ValueError(f"no usable {name} insight in the reply")
+                self.stats["unusable"] += 1
+                continue
+            self.cache.put(key, stored, site=site, product=product, model=MODEL)
+            return stored
+
+    async def product(self, site: str, product: str, product_reviews: Dict[str, List[str]]) -> Dict:
+        """Both prompts for one product, with the map step first when its reviews don't fit."""
+        reviews = review_pool(product_reviews)
+        condensed = reviews is None
+        if condensed:
+            notes = await self._all(self.call("map", review_notes_prompt, chunk, site, product)
+                                    for chunk in map_chunks(product_reviews))
+            reviews = [n.strip() for n in notes]
+        await self._all(self.call(name, prompt, reviews, site, product) for name, prompt in PROMPTS.items())
+        return {"site": site, "product": product, "inputs": len(reviews), "condensed": condensed}
+
+    @staticmethod
+    async def _all(calls) -> List[str]:
+        # let every call finish (and be cached) before reporting the first failure
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        for r in results:
+            if isinstance(r, BaseException):
+                raise r
+        return results
+
+    async def run(self, jobs: List[Tuple[str, str, Dict[str, List[str]]]], progress: Checkpoint):
+        todo: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            if f"{job[0]}|{job[1]}" in progress:
+                self.stats["skipped"] += 1
+            else:
+                todo.put_nowait(job)
+        total = todo.qsize()
+        started = time.monotonic()
+
+        async def worker():
+            while True:
+                try:
+                    site, product, product_reviews = todo.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    record = await self.product(site, product, product_reviews)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    print(f"  ✗ {site} | {product}: {e}")
+                else:
+                    progress.add(f"{site}|{product}", record)
+                    self.stats["done"] += 1
+
+        async def report():
+            while True:
+                await asyncio.sleep(PROGRESS_SECONDS)
+                print(f"[insights] {self.progress_line(total, started)}")
+
+        reporter = asyncio.create_task(report())
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            reporter.cancel()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        print(f"[insights] {self.progress_line(total, started)}")
+
+    def progress_line(self, total: int, started: float) -> str:
+        s = self.stats
+        minutes = max(time.monotonic() - started, 1e-9) / 60
+        return (f"{s['done']}/{total} products, {s['failed']} failed, {s['skipped']} already done | "
+                f"{s['calls']} calls ({s['cached']} cached, {s['retries']} retries, {s['unusable']} unusable), "
+                f"{s['tokens']:,} tokens | "
+                f"{s['calls'] / minutes:.0f} req/min, {s['tokens'] / minutes:,.0f} tokens/min")
+
+
+def iter_jobs(sites: List[str]) -> Iterator[Tuple[str, str, Dict[str, List[str]]]]:
+    for site in sites:
+        index = build_index(site, *load_site(site))
+        products = list(dict.fromkeys(index.products))
+        print(f"=== {site}: {len(products)} products ===")
+        for product in products:
+            yield site, product, index.reviews.get(product, {})
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Precompute LLM insights for every product, concurrently.")
+    ap.add_argument("--site", action="append", choices=list(SUMMARY_FILES),
+                    help="website to process (repeatable, default: all)")
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY, help="requests in flight")
+    ap.add_argument("--rpm", type=float, default=RPM, help="requests per minute")
+    ap.add_argument("--tpm", type=float, default=TPM, help="tokens per minute")
+    ap.add_argument("--resume", action="store_true", help=f"skip products already logged in {PROGRESS_PATH}")
+    ap.add_argument("--api-base", default=None,
+                    help="chat-completions API root (default: $OPENAI_BASE_URL / $OPENAI_API_BASE, else OpenAI)")
+    args = ap.parse_args()
+
+    load_dotenv()
+    api_base = (args.api_base or os.environ.get("OPENAI_BASE_URL") or os.environ.get("OPENAI_API_BASE")
+                or DEFAULT_API_BASE)
+    jobs = list(iter_jobs(args.site or list(SUMMARY_FILES)))
+    client = ChatClient(api_base, os.environ.get("OPENAI_API_KEY"))
+    with InsightCache() as cache, Checkpoint(PROGRESS_PATH, resume=args.resume) as progress:
+        batch = InsightBatch(client, cache, RateLimiter(args.rpm, args.tpm), args.concurrency)
+        try:
+            asyncio.run(batch.run(jobs, progress))
+        except KeyboardInterrupt:
+            print("\nInterrupted; rerun with --resume to continue.")
+            return
+        failed = batch.stats["failed"]
+    if failed:
+        print(f"{failed} products failed; rerun with --resume to retry only those.")
+    else:
+        progress.discard()      # all done: the next run starts over (and is served from the cache)
+
+
+if __name__ == "__main__":
+    main()
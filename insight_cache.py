@@ -0,0 +1,124 @@
+# insight_cache.py
+"""
+Persistent cache for generated LLM insights.
+
+A response is keyed by the prompt template, model, temperature and the
+exact review set sent to the model, so a product whose balanced reviews
+have not changed is never sent to the API twice. Entries expire after
+`ttl_seconds` and the least recently used are dropped beyond `max_entries`.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PATH = "llm_insight_cache.sqlite"
+TTL_SECONDS = 30 * 24 * 3600
+MAX_ENTRIES = 50_000
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class InsightCache:
+    def __init__(self, path: str = DEFAULT_PATH, ttl_seconds: Optional[int] = TTL_SECONDS,
+                 max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # one connection shared by Streamlit's script threads, serialised by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS insights ("
+                " key TEXT PRIMARY KEY, site TEXT, product TEXT, model TEXT,"
+                " response TEXT, created_at INTEGER, last_used INTEGER)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS insights_last_used ON insights(last_used)")
+            self._conn.commit()
+
+    # ----- context manager -----
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._conn is not None:
+            self.evict()
+            self._conn.close()
+            self._conn = None
+
+    # ----- keys -----
+    @staticmethod
+    def key_for(template: str, model: str, temperature: float, reviews: List[str]) -> str:
+        reviews_hash = _sha256(json.dumps(reviews, ensure_ascii=False))
+        return _sha256(json.dumps([_sha256(template), model, float(temperature), reviews_hash]))
+
+    # ----- lookups -----
+    def get(self, key: str) -> Optional[str]:
+        now = int(time.time())
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM insights WHERE key=?", (key,)).fetchone()
+            if row and (self.ttl_seconds is None or row[1] + self.ttl_seconds > now):
+                self._conn.execute("UPDATE insights SET last_used=? WHERE key=?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str, site: Optional[str] = None,
+            product: Optional[str] = None, model: Optional[str] = None):
+        now = int(time.time())
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO insights (key, site, product, model, response, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, site, product, model, response, now, now),
+            )
+            self._conn.commit()
+
+    def entries(self, site: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """(site, product, response) of every entry (of `site`), oldest first."""
+        query = "SELECT site, product, response FROM insights"
+        params: Tuple = ()
+        if site is not None:
+            query, params = query + " WHERE site=?", (site,)
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY created_at", params).fetchall()
+
+    # ----- housekeeping -----
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used beyond max_entries."""
+        removed = 0
+        with self._lock:
+            if self.ttl_seconds is not None:
+                cur = self._conn.execute("DELETE FROM insights WHERE created_at <= ?",
+                                         (int(time.time()) - self.ttl_seconds,))
+                removed += cur.rowcount
+            excess = self._conn.execute("SELECT COUNT(*) FROM insights").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM insights WHERE key IN (SELECT key FROM insights ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                removed += excess
+            self._conn.commit()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": self.count()}
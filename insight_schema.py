@@ -0,0 +1,252 @@
+# insight_schema.py
+"""
+Structured LLM insights: the JSON shapes the general and skin prompts ask
+for, and the one place their replies are parsed.
+
+    general: {"positive": [str], "negative": [str],
+              "keywords": [{"keyword": str, "positive": int, "negative": int}]}
+    skin:    {"segments": [{"segment": str, "insights": [str]}]}
+
+parse_insight() repairs what the model sends before validating it: code
+fences and chatter around the object are dropped, and a reply cut off
+mid-way (a streamed prefix, or one that hit the length limit) is closed
+after its last complete value. Validation coerces where the intent is
+clear ("12" → 12) and drops entries that don't fit. The result is cached as
+compact JSON, so a cached insight is parsed once and never re-queried.
+Keyword counts can then be added up across products straight from the cache:
+
+    python insight_schema.py keywords --site Myer --top 20
+"""
+from __future__ import annotations
+import argparse
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_STRINGS = {"type": "array", "items": {"type": "string", "minLength": 1}, "default": []}
+_COUNT = {"type": "integer", "minimum": 0}
+
+GENERAL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "positive": _STRINGS,
+        "negative": _STRINGS,
+        "keywords": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"keyword": {"type": "string", "minLength": 1}, "positive": _COUNT, "negative": _COUNT},
+                "required": ["keyword", "positive", "negative"],
+            },
+            "default": [],
+        },
+    },
+    "required": ["positive", "negative", "keywords"],
+}
+
+SKIN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "segments": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"segment": {"type": "string", "minLength": 1}, "insights": _STRINGS},
+                "required": ["segment", "insights"],
+            },
+            "default": [],
+        },
+    },
+    "required": ["segments"],
+}
+
+SCHEMAS = {"general": GENERAL_SCHEMA, "skin": SKIN_SCHEMA}
+
+
+# ---------- repair ----------
+def _closers(stack: str) -> str:
+    return "".join("}" if c == "{" else "]" for c in reversed(stack))
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """The JSON object in `text`; a truncated one is closed after its last complete value. None if there is none."""
+    start = text.find("{")
+    if start < 0:
+        return None
+    text = text[start:]
+    try:
+        return json.JSONDecoder().raw_decode(text)[0]      # complete; ignores trailing text and fences
+    except ValueError:
+        pass
+
+    # walk the prefix, remembering where a complete value ends (and what is open there)
+    stack = ""
+    cuts: List[Tuple[int, str]] = []
+    in_string = escaped = string_is_value = False
+    prev = ""                                              # last significant character outside strings
+    for i, c in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+                prev = '"'
+                if string_is_value:
+                    cuts.append((i + 1, stack))
+            continue
+        if c == '"':
+            in_string = True
+            string_is_value = stack[-1:] == "[" or prev == ":"
+        elif c in "{[":
+            stack += c
+        elif c in "}]":
+            if not stack or stack[-1] != ("{" if c == "}" else "["):
+                break                                      # mismatched: keep what came before
+            stack = stack[:-1]
+            cuts.append((i + 1, stack))
+            if not stack:
+                break
+        elif c == ",":
+            if prev not in ",:[{":
+                cuts.append((i, stack))
+        elif c.isspace():
+            continue
+        prev = c if c != '"' else prev
+
+    for end, open_at in reversed(cuts):
+        try:
+            return json.loads(text[:end] + _closers(open_at))
+        except ValueError:
+            continue
+    return {}
+
+
+# ---------- validation ----------
+class _Invalid(ValueError):
+    pass
+
+
+def _coerce(schema: Dict[str, Any], value: Any) -> Any:
+    kind = schema["type"]
+    if kind == "object":
+        if not isinstance(value, dict):
+            raise _Invalid("expected an object")
+        out = {}
+        for name, sub in schema["properties"].items():
+            if name in value:
+                try:
+                    out[name] = _coerce(sub, value[name])
+                    continue
+                except _Invalid:
+                    if name in schema.get("required", ()) and "default" not in sub:
+                        raise
+            if "default" in sub:
+                out[name] = list(sub["default"]) if isinstance(sub["default"], list) else sub["default"]
+            elif name in schema.get("required", ()):
+                raise _Invalid(f"missing {name}")
+        return out
+    if kind == "array":
+        if not isinstance(value, list):
+            raise _Invalid("expected an array")
+        out = []
+        for item in value:
+            try:
+                out.append(_coerce(schema["items"], item))
+            except _Invalid:
+                continue                                   # drop the entry, keep the rest
+        return out
+    if kind == "string":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str) or len(value.strip()) < schema.get("minLength", 0):
+            raise _Invalid("expected a string")
+        return value.strip()
+    if kind == "integer":
+        try:
+            number = float(value) if not isinstance(value, bool) else None
+        except (TypeError, ValueError):
+            number = None
+        if number is None or not number.is_integer() or number < schema.get("minimum", number):
+            raise _Invalid("expected a whole number")
+        return int(number)
+    raise ValueError(f"unsupported schema type {kind!r}")
+
+
+def _segments_from_mapping(value: Dict[str, Any]) -> Dict[str, Any]:
+    # {"Dry Skin": [...], ...}, a shape models often fall back to
+    if "segments" not in value and value and all(isinstance(v, list) for v in value.values()):
+        return {"segments": [{"segment": k, "insights": v} for k, v in value.items()]}
+    return value
+
+
+def validate(kind: str, value: Any) -> Dict[str, Any]:
+    """`value` checked against SCHEMAS[kind]; bad entries dropped, missing sections empty."""
+    if kind == "skin" and isinstance(value, dict):
+        value = _segments_from_mapping(value)
+    try:
+        return _coerce(SCHEMAS[kind], value if isinstance(value, dict) else {})
+    except _Invalid:
+        return _coerce(SCHEMAS[kind], {})
+
+
+def parse_insight(kind: str, text: str) -> Dict[str, Any]:
+    """A "general" or "skin" reply (complete, streamed so far, or cut off) → validated dict."""
+    return validate(kind, repair_json(text or ""))
+
+
+def is_empty(insight: Dict[str, Any]) -> bool:
+    return not any(insight.values())
+
+
+def compact(insight: Dict[str, Any]) -> str:
+    return json.dumps(insight, ensure_ascii=False, separators=(",", ":"))
+
+
+# ---------- across products ----------
+def keyword_totals(insights: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sum keyword mentions over many products' general insights (keywords matched case-insensitively)."""
+    totals: Dict[str, Dict[str, Any]] = {}
+    for insight in insights:
+        for k in insight.get("keywords", []):
+            key = " ".join(k["keyword"].lower().split())
+            t = totals.setdefault(key, {"keyword": k["keyword"], "positive": 0, "negative": 0, "products": 0})
+            t["positive"] += k["positive"]
+            t["negative"] += k["negative"]
+            t["products"] += 1
+    return sorted(totals.values(), key=lambda t: (-(t["positive"] + t["negative"]), t["keyword"]))
+
+
+def cached_general_insights(cache, site: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """The newest cached general insight of each product (of `site`)."""
+    latest: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for entry_site, product, response in cache.entries(site):
+        try:
+            value = json.loads(response)
+        except ValueError:
+            continue                                       # map-step notes
+        if isinstance(value, dict) and "keywords" in value:
+            latest[(entry_site, product)] = validate("general", value)
+    return iter(latest.values())
+
+
+def main():
+    from insight_cache import InsightCache
+
+    ap = argparse.ArgumentParser(description="Aggregate cached structured insights.")
+    ap.add_argument("command", choices=["keywords"])
+    ap.add_argument("--site", default=None, help="one website (default: all)")
+    ap.add_argument("--top", type=int, default=25)
+    args = ap.parse_args()
+
+    with InsightCache() as cache:
+        insights = list(cached_general_insights(cache, args.site))
+    rows = keyword_totals(insights)
+    print(f"{len(insights)} products, {len(rows)} keywords")
+    print(f"{'keyword':32} {'positive':>9} {'negative':>9} {'products':>9}")
+    for t in rows[:args.top]:
+        print(f"{t['keyword'][:32]:32} {t['positive']:9d} {t['negative']:9d} {t['products']:9d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# listing_fetch.py
+"""
+Fast path for the scrapers' search-listing step: fetch the category search
+pages over plain HTTP, all at once, and read product links straight from the
+server-rendered HTML or the JSON embedded in it (JSON-LD ItemList, Next.js
+__NEXT_DATA__). Seconds for every category, and no browser involved; the
+scrapers fall back to the Selenium listing only for pages that come back
+empty or short (client-rendered, blocked).
+
+    with ListingFetcher() as fetcher:
+        pages = fetcher.fetch_all([search_url_for(c) for c in CATEGORIES])
+    listing = parse_listing(pages[url], url)
+    listing.anchors, listing.json_products, listing.next_href
+
+For offline runs and tests, `record_dir` saves every fetched page and
+`fixture_dir` serves pages from such a directory (or hand-saved pages named
+with fixture_name(url)) instead of the network.
+"""
+from __future__ import annotations
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+WORKERS = 8
+TIMEOUT = 15
+HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36"),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-AU,en;q=0.9",
+}
+
+
+def fixture_name(url: str) -> str:
+    """File name for a saved page, e.g. www.mecca.com_en-au_search_searchTerm_cleanser.html."""
+    slug = re.sub(r"[^A-Za-z0-9-]+", "_", url.split("://", 1)[-1]).strip("_")
+    return slug[:180] + ".html"
+
+
+class ListingFetcher:
+    def __init__(self, workers: int = WORKERS, timeout: float = TIMEOUT,
+                 fixture_dir: Optional[str] = None, record_dir: Optional[str] = None):
+        self.workers = workers
+        self.timeout = timeout
+        self.fixture_dir = fixture_dir
+        self.record_dir = record_dir
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+
+        # one keep-alive pool for every listing page; transient errors and 429s are retried with backoff
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # ----- context manager -----
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    # ----- requests -----
+    def fetch(self, url: str) -> Optional[str]:
+        """Page HTML, or None if it could not be fetched (the caller falls back to the browser)."""
+        if self.fixture_dir:
+            path = os.path.join(self.fixture_dir, fixture_name(url))
+            if not os.path.exists(path):
+                return None
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        try:
+            resp = self.session.get(url, timeout=self.timeout)
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            print(f"[listing] HTTP fetch failed for {url}: {e}")
+            return None
+        html = resp.text
+        if self.record_dir:
+            with open(os.path.join(self.record_dir, fixture_name(url)), "w", encoding="utf-8") as f:
+                f.write(html)
+        return html
+
+    def fetch_all(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """{url: html or None}, fetched concurrently."""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(urls))) as pool:
+            return dict(zip(urls, pool.map(self.fetch, urls)))
+
+
+# ---------- parsing ----------
+@dataclass
+class Listing:
+    anchors: List[Tuple[str, str]] = field(default_factory=list)       # (absolute href, link text)
+    tiles: List[Dict[str, Any]] = field(default_factory=list)          # {href, name, brand, price}
+    json_products: List[Dict[str, Any]] = field(default_factory=list)  # {href, name, brand, price}
+    next_href: Optional[str] = None
+
+
+class _ListingParser(HTMLParser):
+    """
+    One pass over the page: every <a href>, rel=next, JSON <script> blocks
+    and, when `tile_testid` is given, product tiles (the element with that
+    data-testid, its title link inside `title_testid`, the <p> just before
+    the title as brand and the shortest "$" text as price, like the
+    browser-side collector).
+    """
+
+    def __init__(self, base: str, tile_testid: Optional[str], title_testid: Optional[str]):
+        super().__init__(convert_charrefs=True)
+        self.base = base
+        self.tile_testid = tile_testid
+        self.title_testid = title_testid
+        self.listing = Listing()
+        self.scripts: List[str] = []
+        self._script: Optional[List[str]] = None
+        self._a: Optional[List[Any]] = None          # [href, text parts, is a "next" link]
+        self._stack: List[Tuple[str, Optional[str]]] = []   # (tag, data-testid) of open elements
+        self._tile: Optional[Dict[str, Any]] = None
+        self._p: Optional[List[str]] = None
+        self._last_p: Optional[str] = None
+
+    # tags that never get an end tag
+    VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        if tag == "link" and (a.get("rel") or "").lower() == "next" and a.get("href"):
+            self.listing.next_href = urljoin(self.base, a["href"])
+        if tag == "script":
+            kind = (a.get("type") or "").lower()
+            if kind in ("application/ld+json", "application/json") or a.get("id") == "__NEXT_DATA__":
+                self._script = []
+            return
+        if tag in self.VOID:
+            return
+
+        testid = a.get("data-testid")
+        self._stack.append((tag, testid))
+        if self.tile_testid and testid == self.tile_testid:
+            self._tile = {"depth": len(self._stack), "href": None, "name": None, "brand_p": None, "prices": []}
+            self._last_p = None
+        if self._tile is not None:
+            if testid == self.title_testid:
+                self._tile["brand_p"] = self._last_p
+            if tag == "p":
+                self._p = []
+        if tag == "a" and a.get("href"):
+            label = (a.get("aria-label") or "").lower()
+            self._a = [urljoin(self.base, a["href"]), [], a.get("rel") == "next" or label.startswith("next")]
+
+    def handle_endtag(self, tag):
+        if tag == "script":
+            if self._script is not None:
+                self.scripts.append("".join(self._script))
+                self._script = None
+            return
+        if tag in self.VOID:
+            return
+        # pop to the matching open tag (tolerates unclosed children)
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                break
+        else:
+            return
+        in_title = any(t[1] == self.title_testid for t in self._stack) if self._tile else False
+
+        if tag == "a" and self._a is not None:
+            href, parts, is_next = self._a
+            text = " ".join("".join(parts).split())
+            self.listing.anchors.append((href, text))
+            if self.listing.next_href is None and (is_next or text == "Next"):
+                self.listing.next_href = href
+            if self._tile is not None and in_title and self._tile["href"] is None:
+                self._tile["href"], self._tile["name"] = href, text
+            self._a = None
+        if tag == "p" and self._p is not None:
+            self._last_p = " ".join("".join(self._p).split()) or None
+            self._p = None
+
+        del self._stack[i:]
+        if self._tile is not None and len(self._stack) < self._tile["depth"]:
+            self._finish_tile()
+
+    def handle_data(self, data):
+        if self._script is not None:
+            self._script.append(data)
+            return
+        if self._a is not None:
+            self._a[1].append(data)
+        if self._p is not None:
+            self._p.append(data)
+        if self._tile is not None:
+            text = data.strip()
+            if "$" in text and len(text) <= 40:
+                self._tile["prices"].append(text)
+
+    def _finish_tile(self):
+        t, self._tile = self._tile, None
+        if t["href"] and t["name"]:
+            prices = sorted(t["prices"], key=len)
+            self.listing.tiles.append({"href": t["href"], "name": t["name"],
+                                       "brand": t["brand_p"], "price": prices[0] if prices else None})
+
+
+_URL_KEYS = ("url", "href", "productUrl", "pdpUrl", "canonicalUrl", "link")
+_NAME_KEYS = ("name", "title", "productName", "displayName")
+
+
+def _text_of(value: Any) -> Optional[str]:
+    if isinstance(value, dict):
+        value = next((value[k] for k in ("name", "price", "value", "formatted") if k in value), None)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    return " ".join(str(value).split()) or None
+
+
+def _walk_products(obj: Any) -> Iterator[Dict[str, Any]]:
+    """Every dict in a JSON document that looks like a product: a URL plus a name."""
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            url = next((node[k] for k in _URL_KEYS if isinstance(node.get(k), str)), None)
+            name = next((node[k] for k in _NAME_KEYS if isinstance(node.get(k), str)), None)
+            if url and name:
+                offers = node.get("offers") or {}
+                price = node.get("price") or (offers.get("price") if isinstance(offers, dict) else None)
+                yield {"href": url, "name": " ".join(name.split()),
+                       "brand": _text_of(node.get("brand")), "price": _text_of(price)}
+            stack.extend(reversed(list(node.values())))
+
+
+def parse_listing(html: str, base: str, tile_testid: Optional[str] = None,
+                  title_testid: Optional[str] = None) -> Listing:
+    parser = _ListingParser(base, tile_testid, title_testid)
+    parser.feed(html)
+    parser.close()
+    listing = parser.listing
+    for raw in parser.scripts:
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        for p in _walk_products(data):
+            p["href"] = urljoin(base, p["href"])
+            listing.json_products.append(p)
+    return listing
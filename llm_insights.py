@@ -0,0 +1,349 @@
+# llm_insights.py
+"""
+LLM review insights shared by dashboard_cw.py and the offline precompute.
+
+Responses go through InsightCache (insight_cache.py), so a product is only
+sent to the model again when its prompt, model settings or selected review
+set change. The review input is chosen by `prepare_reviews`: everything when
+it fits the token budget, otherwise a map-reduce over a bounded sample (see
+review_sampling.py). To fill the cache for every product ahead of time:
+
+    python llm_insights.py precompute                 # all websites
+    python llm_insights.py precompute --site Myer
+
+insight_batch.py does the same for thousands of products at once, with
+rate limiting, retries and resumable progress.
+
+The general and skin prompts answer in JSON (parsed, repaired and validated
+by insight_schema.py), and the cache keeps the validated insight as compact
+JSON.
+"""
+import argparse
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_community.chat_models import ChatOpenAI
+from langchain.prompts import PromptTemplate
+from langchain.chains import LLMChain
+
+from dashboard_data import SUMMARY_FILES, build_index, load_site
+from insight_cache import InsightCache
+from insight_schema import SCHEMAS, compact, is_empty, parse_insight
+from review_sampling import TOKEN_BUDGET, chunk_reviews, dedupe, select_reviews, total_tokens
+from stage_metrics import span
+
+MODEL = "gpt-3.5-turbo"
+TEMPERATURE = 0.5
+LLM_TIMEOUT = 60            # seconds per chain call
+MAP_CHUNKS = 6              # most map calls per product; bounds cost for very large products
+MAP_WORKERS = 4
+
+# === 1️⃣ Existing Overall Prompt ===
+review_analysis_prompt = PromptTemplate(
+    input_variables=["reviews"],
+    template="""
+    You are an expert assistant analyzing customer reviews for a skincare product.
+
+    Given the following customer reviews (mixed positive and negative), do the following:
+    1. Identify the **top 5 positive key points** customers appreciated.
+    2. Identify the **top 5 negative key points** customers complained about.
+    3. Extract up to **8 important keywords** (relevant to skincare concerns, ingredients, 
+    skin types, product effects, or common themes) mentioned in the reviews that customers look for. For each keyword, include:
+    - Total number of **positive mentions**
+    - Total number of **negative mentions**
+    - Ensure that similar keywords (like "oily skin" and "greasy") are considered together.
+    
+    Reviews:
+    {reviews}
+
+    Return only a JSON object in exactly this shape:
+    {{
+      "positive": ["...", "..."],
+      "negative": ["...", "..."],
+      "keywords": [
+        {{"keyword": "keyword1", "positive": X, "negative": Y}},
+        {{"keyword": "keyword2", "positive": A, "negative": B}}
+      ]
+    }}
+    with up to 5 positive and 5 negative insights, up to 8 keywords, and whole-number mention counts.
+    """
+)
+
+# === 2️⃣ NEW Skin-Segmented Prompt ===
+skin_segmentation_prompt = PromptTemplate(
+    input_variables=["reviews"],
+    template="""
+    You are an advanced skincare expert analyzing customer reviews.  
+    Classify and summarize feedback **by skin profile segments**.
+
+    Use the following segmentation criteria:
+
+    **Skin Type:**
+    - Dry  
+    - Oily  
+    - Combination  
+    - Normal  
+
+    **Sensitivity:**
+    - Sensitive  
+    - Not Sensitive  
+
+    **Skin Concerns:**
+    - Acne  
+    - Pigmentation & Scarring  
+    - Ageing  
+    - Blackheads  
+    - Large pores  
+    - Dullness  
+    - Redness  
+    - Eczema, Psoriasis, Rosacea  
+    - Dark circles  
+    - Uneven texture  
+
+    Analyze the reviews below and:
+    1. Group feedback by **skin profile segment** (skin type, sensitivity, and concern).  
+      
+
+    Reviews:
+    {reviews}
+
+    Return only a JSON object in exactly this shape:
+    {{
+      "segments": [
+        {{"segment": "Dry Skin", "insights": ["...", "..."]}},
+        {{"segment": "Oily Skin", "insights": ["...", "..."]}},
+        {{"segment": "Sensitive Skin", "insights": ["...", "..."]}},
+        {{"segment": "Acne-Prone Skin", "insights": ["...", "..."]}}
+      ]
+    }}
+    Continue for any relevant segments, and leave out segments no review speaks to.
+    """
+)
+
+PROMPTS = {"general": review_analysis_prompt, "skin": skin_segmentation_prompt}
+# OpenAI JSON mode for the prompts above, so replies are always one JSON object
+JSON_MODE = {"response_format": {"type": "json_object"}}
+
+# === Map step for products too large for one prompt ===
+# Each chunk of reviews is condensed into notes; the notes then go through the
+# prompts above in place of the raw reviews.
+review_notes_prompt = PromptTemplate(
+    input_variables=["reviews"],
+    template="""
+    You are condensing one batch of customer reviews for a skincare product so
+    that it can be combined with other batches later.
+
+    Reviews:
+    {reviews}
+
+    Write compact notes (at most 200 words) covering:
+    - Positive points, each with the number of reviews mentioning it
+    - Negative points, each with the number of reviews mentioning it
+    - Skincare keywords (concerns, ingredients, skin types, effects) with positive and negative mention counts
+    - Remarks tied to a skin type, sensitivity or skin concern (e.g. "dry skin: felt tight (3)")
+    Merge similar points and keywords. Do not add anything not in the reviews.
+    """
+)
+
+
+def make_chains(model: str = MODEL, temperature: float = TEMPERATURE,
+                timeout: float = LLM_TIMEOUT) -> Dict[str, LLMChain]:
+    llm = ChatOpenAI(temperature=temperature, model=model, request_timeout=timeout, model_kwargs=JSON_MODE)
+    return {name: LLMChain(llm=llm, prompt=prompt) for name, prompt in PROMPTS.items()}
+
+
+def make_map_chain(model: str = MODEL, timeout: float = LLM_TIMEOUT) -> LLMChain:
+    # temperature 0 keeps the notes (and so the reduce step's cache key) stable
+    llm = ChatOpenAI(temperature=0, model=model, request_timeout=timeout)
+    return LLMChain(llm=llm, prompt=review_notes_prompt)
+
+
+def chain_name(chain: LLMChain) -> str:
+    """"general", "skin" or "map" (for spans and logs)."""
+    if chain.prompt is review_notes_prompt:
+        return "map"
+    return next((name for name, prompt in PROMPTS.items() if prompt is chain.prompt), "other")
+
+
+def stored_response(name: str, response: str) -> Optional[str]:
+    """
+    What the cache keeps for a `name` reply: the validated insight as compact
+    JSON for "general"/"skin" (None when nothing usable came back, so the
+    product is asked again next time), anything else as is.
+    """
+    if name not in SCHEMAS:
+        return response
+    insight = parse_insight(name, response)
+    return None if is_empty(insight) else compact(insight)
+
+
+def _cache_key(chain: LLMChain, cache: InsightCache, reviews: List[str]) -> str:
+    model = getattr(chain.llm, "model_name", MODEL)
+    return cache.key_for(chain.prompt.template, model, getattr(chain.llm, "temperature", TEMPERATURE), reviews)
+
+
+def run_insight(chain: LLMChain, reviews: List[str], cache: Optional[InsightCache] = None,
+                site: Optional[str] = None, product: Optional[str] = None) -> str:
+    """chain.run over the joined reviews, served from `cache` when possible."""
+    key = None
+    if cache is not None:
+        key = _cache_key(chain, cache, reviews)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    with span("llm.call", items=len(reviews), chain=chain_name(chain), site=site):
+        response = chain.run({"reviews": " ".join(reviews)})
+    stored = stored_response(chain_name(chain), response)
+    if stored is None:
+        return response
+    if cache is not None:
+        cache.put(key, stored, site=site, product=product, model=getattr(chain.llm, "model_name", MODEL))
+    return stored
+
+
+def stream_insight(chain: LLMChain, reviews: List[str], cache: Optional[InsightCache] = None,
+                   site: Optional[str] = None, product: Optional[str] = None) -> Iterator[str]:
+    """
+    Like run_insight, but yield the response piece by piece as the model
+    generates it. A cached response comes back as one piece; a fresh one is
+    cached (see stored_response) once the stream completes.
+    """
+    key = None
+    if cache is not None:
+        key = _cache_key(chain, cache, reviews)
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    with span("llm.stream", items=len(reviews), chain=chain_name(chain), site=site):
+        for chunk in chain.llm.stream(chain.prompt.format(reviews=" ".join(reviews))):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+    stored = stored_response(chain_name(chain), "".join(parts))
+    if cache is not None and stored is not None:
+        cache.put(key, stored, site=site, product=product, model=getattr(chain.llm, "model_name", MODEL))
+
+
+def review_pool(product_reviews: Dict[str, List[str]], budget: int = TOKEN_BUDGET) -> Optional[List[str]]:
+    """Every de-duplicated positive/negative review, or None if they don't fit in `budget` tokens."""
+    pool = [t for s in ("Positive", "Negative") for t in dedupe(product_reviews.get(s, []))]
+    return pool if total_tokens(pool) + len(pool) <= budget else None
+
+
+def map_chunks(product_reviews: Dict[str, List[str]], budget: int = TOKEN_BUDGET) -> List[List[str]]:
+    """Budget-sized chunks of a representative sample, for the map step."""
+    return chunk_reviews(select_reviews(product_reviews, budget * MAP_CHUNKS), budget)[:MAP_CHUNKS]
+
+
+def prepare_reviews(product_reviews: Dict[str, List[str]], map_chain: Optional[LLMChain] = None,
+                    cache: Optional[InsightCache] = None, site: Optional[str] = None,
+                    product: Optional[str] = None, budget: int = TOKEN_BUDGET) -> List[str]:
+    """
+    Review input for the insight chains, at most `budget` tokens:
+      * all de-duplicated positive/negative reviews when they fit;
+      * otherwise, with `map_chain`, notes from up to MAP_CHUNKS budget-sized
+        chunks of a representative sample (map step, run concurrently);
+      * otherwise a representative sample that fits.
+    """
+    pool = review_pool(product_reviews, budget)
+    if pool is not None:
+        return pool
+    if map_chain is None:
+        return select_reviews(product_reviews, budget)
+
+    chunks = map_chunks(product_reviews, budget)
+    with ThreadPoolExecutor(max_workers=min(MAP_WORKERS, len(chunks))) as pool_ex:
+        notes = list(pool_ex.map(lambda chunk: run_insight(map_chain, chunk, cache, site, product), chunks))
+    return [n.strip() for n in notes]
+
+
+def iter_insights(chains: Dict[str, LLMChain], reviews: List[str], cache: Optional[InsightCache] = None,
+                  site: Optional[str] = None, product: Optional[str] = None, timeout: float = LLM_TIMEOUT
+                  ) -> Iterator[Tuple[str, str, bool, Optional[Exception]]]:
+    """
+    Stream all chains at once and yield (name, new_text, done, error) as
+    output arrives, so the page shows the first tokens instead of waiting for
+    the slowest call. Pieces that queue up while the caller is busy are
+    merged into one event. A chain that raises or misses the deadline yields
+    done with its error; the others are unaffected.
+    """
+    events: "queue.Queue[Tuple[str, Optional[str], Optional[Exception]]]" = queue.Queue()
+
+    def work(name: str, chain: LLMChain):
+        try:
+            for piece in stream_insight(chain, reviews, cache, site, product):
+                events.put((name, piece, None))
+            events.put((name, None, None))
+        except Exception as e:
+            events.put((name, None, e))
+
+    pool = ThreadPoolExecutor(max_workers=len(chains))
+    for name, chain in chains.items():
+        pool.submit(work, name, chain)
+    pending = set(chains)
+    deadline = time.monotonic() + timeout
+    try:
+        while pending:
+            try:
+                batch = [events.get(timeout=max(0.0, deadline - time.monotonic()))]
+            except queue.Empty:
+                for name in pending:
+                    yield name, "", True, TimeoutError(f"no response within {timeout:g}s")
+                return
+            while True:
+                try:
+                    batch.append(events.get_nowait())
+                except queue.Empty:
+                    break
+
+            texts: Dict[str, str] = {}
+            finished: Dict[str, Optional[Exception]] = {}
+            for name, piece, error in batch:
+                if piece is None:
+                    finished[name] = error
+                else:
+                    texts[name] = texts.get(name, "") + piece
+            for name in dict.fromkeys([*texts, *finished]):
+                if name in finished:
+                    pending.discard(name)
+                yield name, texts.get(name, ""), name in finished, finished.get(name)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------- offline precompute ----------
+def precompute(sites: List[str], cache: InsightCache) -> None:
+    chains = make_chains()
+    map_chain = make_map_chain()
+    for site in sites:
+        index = build_index(site, *load_site(site))
+        print(f"\n=== {site}: {len(index.products)} products ===")
+        for i, product in enumerate(index.products, 1):
+            reviews = prepare_reviews(index.reviews.get(product, {}), map_chain, cache, site, product)
+            for chain in chains.values():
+                run_insight(chain, reviews, cache, site=site, product=product)
+            print(f"  [{i}/{len(index.products)}] {product}")
+    print(f"\n[insights] {cache.stats()}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Precompute LLM insights for the dashboard.")
+    ap.add_argument("command", choices=["precompute"])
+    ap.add_argument("--site", action="append", choices=list(SUMMARY_FILES),
+                    help="website to process (repeatable, default: all)")
+    args = ap.parse_args()
+
+    load_dotenv()
+    with InsightCache() as cache:
+        precompute(args.site or list(SUMMARY_FILES), cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,18 @@
 # mecca_skin_care_reviews.py
 from __future__ import annotations
-import re, json, time, datetime as dt
+import argparse, re, json, datetime as dt
 from typing import List, Optional, Tuple
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, JavascriptException
-from webdriver_manager.chrome import ChromeDriverManager
+
+from listing_fetch import ListingFetcher, parse_listing
+from scrape_browser import consent_recorded, make_chrome, record_consent
+from scrape_checkpoint import Checkpoint, checkpoint_path_for
+from scrape_waits import AdaptiveDelay, network_idle, polite_get, scroll_for_more, wait_for
+from stage_metrics import span
 
 # -------- CONFIG --------
 BASE = "https://www.mecca.com"
@@ -17,25 +20,23 @@ CATEGORIES = ["cleanser", "toner", "serum", "moisturizer", "sunscreen"]
 PRODUCTS_PER_CATEGORY = 12
 REVIEWS_PER_PRODUCT = 20
 HEADLESS = False
+PROFILE = "mecca"          # persistent browser profile (keeps cookie consent between runs)
 OUTFILE = "mecca_skin_care_reviews.json"
 SCROLL_ATTEMPTS = 40
-SCROLL_SLEEP = 1.2
+SCROLL_WAIT = 3.0          # max wait for new tiles after each scroll
+DELAY = AdaptiveDelay()    # politeness gap between page loads
 # ------------------------
 
 # ---------- driver ----------
-def make_driver():
-    opts = webdriver.ChromeOptions()
-    if HEADLESS:
-        opts.add_argument("--headless=new")
-    opts.add_argument("--window-size=1366,1024")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--disable-blink-features=AutomationControlled")
-    opts.add_argument(
+def make_driver(lean: bool = True):
+    driver = make_chrome(PROFILE, HEADLESS, [
+        "--window-size=1366,1024",
+        "--no-sandbox",
+        "--disable-dev-shm-usage",
+        "--disable-blink-features=AutomationControlled",
         "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118 Safari/537.36"
-    )
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=opts)
+        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118 Safari/537.36",
+    ], lean=lean)
     try:
         driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
             "source": "Object.defineProperty(navigator,'webdriver',{get:()=>undefined});"
@@ -48,16 +49,23 @@ def wait_body(driver, timeout=20):
     WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
 
 def close_banners(driver):
+    # once the profile holds the consent cookie, only glance for promo pop-ups instead of waiting
+    known = consent_recorded(PROFILE)
+    timeout = 0.3 if known else 3
+    accept = "//button[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'accept')]"
     for xp in [
-        "//button[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'accept')]",
+        accept,
         "//button[contains(.,'Got it')]",
         "//button[contains(.,'Close')]",
     ]:
         try:
-            WebDriverWait(driver, 3).until(EC.element_to_be_clickable((By.XPATH, xp))).click()
-            break
+            WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((By.XPATH, xp))).click()
         except TimeoutException:
-            pass
+            continue
+        # only an accepted consent banner is remembered; promo pop-ups say nothing about it
+        if xp == accept and not known:
+            record_consent(PROFILE)
+        break
 
 # ---------- search page ----------
 def js_collect_tiles(driver) -> List[dict]:
@@ -88,8 +96,29 @@ def js_collect_tiles(driver) -> List[dict]:
     except JavascriptException:
         return []
 
+def search_url(term: str) -> str:
+    return f"{BASE}/en-au/search/?searchTerm={term}"
+
+def tiles_from_html(html: str, url: str, max_tiles: int) -> List[dict]:
+    """Product tiles from a server-rendered search page (tile markup, else embedded JSON)."""
+    listing = parse_listing(html, url, tile_testid="ProductTile", title_testid="ProductTitle")
+    candidates = listing.tiles or [p for p in listing.json_products if "/en-au/" in p["href"]]
+    results, seen = [], set()
+    for t in candidates:
+        if t["href"] not in seen and t["href"] != url and (t.get("name") or "").strip():
+            seen.add(t["href"])
+            results.append(t)
+    return results[:max_tiles]
+
+def prefetch_product_tiles(fetcher: ListingFetcher, terms: List[str], max_tiles: int) -> dict:
+    """{term: tiles} for every search term over plain HTTP, fetched concurrently."""
+    urls = {term: search_url(term) for term in terms}
+    pages = fetcher.fetch_all(urls.values())
+    return {term: tiles_from_html(pages[url], url, max_tiles) if pages[url] else []
+            for term, url in urls.items()}
+
 def collect_product_tiles(driver, term: str, max_tiles: int) -> List[dict]:
-    driver.get(f"{BASE}/en-au/search/?searchTerm={term}")
+    polite_get(driver, search_url(term), DELAY)
     wait_body(driver)
     close_banners(driver)
 
@@ -101,7 +130,7 @@ def collect_product_tiles(driver, term: str, max_tiles: int) -> List[dict]:
         pass
 
     results, seen = [], set()
-    attempts, last_h = 0, 0
+    attempts, stalled = 0, 0
 
     while len(results) < max_tiles and attempts < SCROLL_ATTEMPTS:
         tiles = js_collect_tiles(driver)
@@ -126,13 +155,15 @@ def collect_product_tiles(driver, term: str, max_tiles: int) -> List[dict]:
         if len(results) >= max_tiles:
             break
 
-        driver.execute_script("window.scrollBy(0, Math.max(1200, window.innerHeight*0.95));")
-        time.sleep(SCROLL_SLEEP)
-        new_h = driver.execute_script("return document.body.scrollHeight")
-        if new_h == last_h and attempts % 3 == 2:
-            driver.execute_script("window.scrollBy(0, -350);")
-            time.sleep(0.6)
-        last_h = new_h
+        tile_count = "document.querySelectorAll(\"div[data-testid='ProductTile']\").length"
+        if scroll_for_more(driver, tile_count, "window.scrollBy(0, Math.max(1200, window.innerHeight*0.95));",
+                           timeout=SCROLL_WAIT):
+            stalled = 0
+        else:
+            stalled += 1
+            if stalled % 3 == 2:
+                # nudge the lazy loader's intersection observer
+                scroll_for_more(driver, tile_count, "window.scrollBy(0, -350);", timeout=SCROLL_WAIT / 2)
         attempts += 1
 
     if not results:
@@ -218,14 +249,21 @@ def extract_reviews_inpage(driver, need: int = 20) -> list[dict]:
       const done = arguments[0];
       const NEED = %NEED%;
       const wait = (ms)=>new Promise(r=>setTimeout(r, ms));
+      // resolve as soon as pred() holds (checked every 100 ms), or after `timeout` ms
+      const waitFor = async (pred, timeout) => {
+        const end = Date.now() + timeout;
+        while (Date.now() < end) { if (pred()) return true; await wait(100); }
+        return pred();
+      };
+      const articleCount = () => document.querySelectorAll("#ugc-form section article").length;
 
       const cleanBody = (t) => (t||'').replace(/\\bRead\\s+more\\b/gi,'').replace(/\\bRead\\s+less\\b/gi,'').trim();
 
       const scrollToReviews = async () => {
         const ugc = document.querySelector("#ugc-form");
-        if (ugc) { ugc.scrollIntoView({block:'center'}); await wait(600); }
+        if (ugc) ugc.scrollIntoView({block:'center'});
         window.scrollBy(0, 360);
-        await wait(400);
+        await waitFor(() => articleCount() > 0, 3000);
       };
 
       const clickLoadMore = async () => {
@@ -237,9 +275,9 @@ def extract_reviews_inpage(driver, need: int = 20) -> list[dict]:
         });
         if (!btn || btn.disabled) return false;
         btn.scrollIntoView({block:'center'});
-        await wait(180);
+        const before = articleCount();
         try { btn.click(); } catch(e) { try { btn.dispatchEvent(new MouseEvent('click', {bubbles:true})); } catch(_){} }
-        await wait(1400);
+        await waitFor(() => articleCount() > before, 5000);
         return true;
       };
 
@@ -247,8 +285,9 @@ def extract_reviews_inpage(driver, need: int = 20) -> list[dict]:
         const triggers = Array.from(document.querySelectorAll("#ugc-form button, #ugc-form a"))
           .filter(el => /read\\s+more/i.test(el.textContent||""));
         for (const el of triggers) {
-          try { el.click(); await wait(120); } catch(e){}
+          try { el.click(); } catch(e){}
         }
+        if (triggers.length) await wait(100);   // let the expanded copy re-render
       };
 
       const pickTitle = (node) => {
@@ -311,7 +350,7 @@ def extract_reviews_inpage(driver, need: int = 20) -> list[dict]:
             const clicked = await clickLoadMore();
             await expandAllCards();
             const now = collect().length;
-            if (!clicked && now === seen) break;
+            if (!clicked || now === seen) break;   // no button, or the click loaded nothing
             seen = now; tries += 1;
           }
           await expandAllCards();
@@ -337,8 +376,8 @@ def go_to_reviews_block(driver):
         ugc = WebDriverWait(driver, 12).until(EC.presence_of_element_located((By.XPATH, "//div[@id='ugc-form']")))
         driver.execute_script("arguments[0].scrollIntoView({block:'center'});", ugc)
     except TimeoutException:
-        pass
-    time.sleep(0.8)
+        return
+    wait_for(driver, EC.presence_of_element_located((By.CSS_SELECTOR, "#ugc-form section article")), 5)
 
 # ---------- Orchestration per product ----------
 def combine_product_name(brand: Optional[str], name: Optional[str]) -> Optional[str]:
@@ -349,16 +388,19 @@ def combine_product_name(brand: Optional[str], name: Optional[str]) -> Optional[
 
 def scrape_one_product(driver, tile: dict, product_type: str, need_reviews=20) -> dict:
     url = tile["href"]
-    driver.get(url); wait_body(driver); close_banners(driver)
+    with span("scrape.product_open", items=1, site="mecca"):
+        polite_get(driver, url, DELAY); wait_body(driver); close_banners(driver)
 
-    brand, name, price = get_pdp_meta_via_selenium(driver, tile.get("brand"), tile.get("name"), tile.get("price"), url)
-    product_name = combine_product_name(brand, name)
+        brand, name, price = get_pdp_meta_via_selenium(driver, tile.get("brand"), tile.get("name"), tile.get("price"), url)
+        product_name = combine_product_name(brand, name)
 
-    go_to_reviews_block(driver)
-    reviews = extract_reviews_inpage(driver, need=need_reviews)
-    if not reviews:
-        time.sleep(1.0)
+    with span("scrape.reviews", site="mecca") as s:
+        go_to_reviews_block(driver)
         reviews = extract_reviews_inpage(driver, need=need_reviews)
+        if not reviews:
+            network_idle(driver, timeout=5)
+            reviews = extract_reviews_inpage(driver, need=need_reviews)
+        s.add(len(reviews))
 
     reviews = [{"title": r.get("title"), "body": r.get("body"), "rating": r.get("rating")} for r in reviews]
 
@@ -373,32 +415,61 @@ def scrape_one_product(driver, tile: dict, product_type: str, need_reviews=20) -
 
 # ---------- Main across categories ----------
 def main():
-    driver = make_driver()
-    products = []
+    ap = argparse.ArgumentParser(description="Scrape Mecca skincare reviews.")
+    ap.add_argument("--resume", action="store_true",
+                    help="continue an interrupted run, skipping products already checkpointed")
+    ap.add_argument("--listing", choices=["http", "browser"], default="http",
+                    help="search listing source: plain HTTP first (falls back to the browser) or browser only")
+    ap.add_argument("--listing-fixtures", metavar="DIR", help="read search pages from saved files instead")
+    ap.add_argument("--record-listings", metavar="DIR", help="save fetched search pages as fixtures")
+    ap.add_argument("--no-lean", dest="lean", action="store_false",
+                    help="load pages fully (images, fonts, trackers, animations)")
+    args = ap.parse_args()
+
+    # link discovery for every category at once, without the browser
+    prefetched = {}
+    if args.listing == "http":
+        with span("scrape.search", site="mecca", via="http") as s, \
+                ListingFetcher(fixture_dir=args.listing_fixtures, record_dir=args.record_listings) as fetcher:
+            prefetched = prefetch_product_tiles(fetcher, CATEGORIES, PRODUCTS_PER_CATEGORY)
+            s.add(sum(map(len, prefetched.values())))
+
+    # each product is appended as soon as it's scraped; a crash keeps everything before it
+    checkpoint = Checkpoint(checkpoint_path_for(OUTFILE), resume=args.resume)
+    if len(checkpoint):
+        print(f"[resume] {len(checkpoint)} products already in {checkpoint.path}")
+    driver = make_driver(args.lean)
     try:
         for cat in CATEGORIES:
             print(f"\n=== Category: {cat} ===")
-            tiles = collect_product_tiles(driver, cat, PRODUCTS_PER_CATEGORY)
+            tiles = prefetched.get(cat) or []
+            if len(tiles) < PRODUCTS_PER_CATEGORY:
+                if args.listing == "http":
+                    print(f"[{cat}] HTTP listing found {len(tiles)} tiles; using the browser")
+                with span("scrape.search", site="mecca", via="browser") as s:
+                    tiles = max(collect_product_tiles(driver, cat, PRODUCTS_PER_CATEGORY), tiles, key=len)
+                    s.add(len(tiles))
             if not tiles:
                 print(f"[{cat}] No tiles found.")
                 continue
             for i, t in enumerate(tiles, 1):
+                key = f"{cat}|{t['href']}"
+                if key in checkpoint:
+                    continue
                 print(f"[{cat} {i}/{len(tiles)}] {t['name']} -> {t['href']}")
-                products.append(scrape_one_product(driver, t, cat, REVIEWS_PER_PRODUCT))
-    finally:
-        driver.quit()
+                checkpoint.add(key, scrape_one_product(driver, t, cat, REVIEWS_PER_PRODUCT))
 
-    data = {
-        "search": {
+        search = {
             "categories": CATEGORIES,
             "base": f"{BASE}/en-au/search",
             "scraped_at": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        },
-        "products": products
-    }
-    with open(OUTFILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"\nSaved → {OUTFILE}  | products: {len(products)}")
+        }
+        count = checkpoint.write_json(OUTFILE, key="products", header={"search": search}, indent=2)
+        checkpoint.discard()
+    finally:
+        driver.quit()
+        checkpoint.close()
+    print(f"\nSaved → {OUTFILE}  | products: {count}")
 
 if __name__ == "__main__":
     main()
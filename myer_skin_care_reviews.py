@@ -1,20 +1,24 @@
-import json
+import argparse
+import os
 import time
 import re
 import math
 from dataclasses import dataclass, asdict
-from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from urllib.parse import urlencode
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from listing_fetch import ListingFetcher, parse_listing
+from scrape_browser import make_chrome
+from scrape_checkpoint import Checkpoint, checkpoint_path_for
+from seen_reviews import MYER_FIELDS, ProductState, SeenReviews, split_new
+from bazaarvoice import BV_API, BazaarvoiceClient, discover_bv_config
+from scrape_waits import AdaptiveDelay, network_idle, polite_get, scroll_for_more, wait_for
+from stage_metrics import span
+
 BASE_SEARCH_URL = "https://www.myer.com.au/search"
 CATEGORIES = ["cleanser", "toner", "serum", "moisturizer", "sunscreen"]
 
@@ -27,11 +31,19 @@ REVIEW_TARGET = 20              # stop early if we already have ~20 reviews
 RESULTS_MAX_PAGES = 2           # how many search result pages to attempt per category
 SCROLL_STEPS = 5                # to trigger lazy load on search pages
 
-# --- waits ---
+# --- waits (upper bounds: each wait returns as soon as the page is ready) ---
 WAIT_SHORT = 2.0
 WAIT_LONG = 5.0
+DELAY = AdaptiveDelay()         # politeness gap between page loads, adapts to how Myer responds
 
 OUTFILE = "myer_skin_care_reviews.json"
+NEW_OUTFILE = "myer_skin_care_reviews.new.json"   # --incremental: only the new reviews (score with vader_engine --append)
+RETAILER = "Myer"
+
+# --- review source ---
+# "api": read every review from the Bazaarvoice JSON endpoint the widget uses (falls back to "dom")
+# "dom": parse the widget's shadow DOM, REVIEW_PAGES_MAX pages of it
+REVIEW_SOURCE = "api"
 
 
 # ----------------- utils -----------------
@@ -39,9 +51,6 @@ def clean_text(s: Optional[str]) -> Optional[str]:
     if not s: return None
     return re.sub(r"\s+", " ", s).strip() or None
 
-def polite_sleep(sec: float):
-    time.sleep(sec)
-
 def get_shadow_root(driver, host_el):
     try:
         return host_el.shadow_root
@@ -65,19 +74,53 @@ def safe_text(el) -> Optional[str]:
 def search_url_for(query: str) -> str:
     return f"{BASE_SEARCH_URL}?{urlencode({'query': query})}"
 
+def product_links_from_html(html: str, url: str) -> Tuple[List[str], Optional[str]]:
+    """Product URLs on a server-rendered search page (anchors, then embedded JSON), and its next page."""
+    listing = parse_listing(html, url)
+    urls: List[str] = []
+    for href in [h for h, _ in listing.anchors] + [p["href"] for p in listing.json_products]:
+        if "/p/" in href:
+            href = href.split("?")[0]
+            if href not in urls:
+                urls.append(href)
+    return urls, listing.next_href
+
+def prefetch_product_links(fetcher: ListingFetcher, queries: List[str], max_products: int) -> Dict[str, List[str]]:
+    """
+    {query: product URLs} over plain HTTP: the first results page of every
+    category at once, then next pages for the ones still short.
+    """
+    found: Dict[str, List[str]] = {q: [] for q in queries}
+    pending = {q: search_url_for(q) for q in queries}
+    for _ in range(RESULTS_MAX_PAGES):
+        pages = fetcher.fetch_all(pending.values())
+        next_pending = {}
+        for q, url in pending.items():
+            if not pages[url]:
+                continue
+            links, next_href = product_links_from_html(pages[url], url)
+            found[q].extend(u for u in links if u not in found[q])
+            if len(found[q]) < max_products and next_href and next_href != url:
+                next_pending[q] = next_href
+        if not next_pending:
+            break
+        pending = next_pending
+    return {q: urls[:max_products] for q, urls in found.items()}
+
 def collect_product_links_for_category(driver, query: str, max_products: int) -> List[str]:
     """
     Navigate search results for a category keyword and collect up to `max_products` product URLs.
     """
-    driver.get(search_url_for(query))
+    polite_get(driver, search_url_for(query), DELAY)
     urls: List[str] = []
     pages_done = 0
 
     while pages_done < RESULTS_MAX_PAGES and len(urls) < max_products:
-        # scroll to load cards
+        # scroll to load cards, moving on as soon as new ones render
         for _ in range(SCROLL_STEPS):
-            driver.execute_script("window.scrollBy(0, 1600);")
-            polite_sleep(0.6)
+            if not scroll_for_more(driver, "document.querySelectorAll('a[href*=\"/p/\"]').length",
+                                   timeout=WAIT_SHORT):
+                break
 
         # grab anchors that look like product pages
         for a in driver.find_elements(By.CSS_SELECTOR, 'a[href*="/p/"]'):
@@ -114,8 +157,8 @@ def collect_product_links_for_category(driver, query: str, max_products: int) ->
         if not next_href:
             break
 
-        driver.get(next_href)
-        polite_sleep(WAIT_LONG)
+        polite_get(driver, next_href, DELAY)
+        network_idle(driver, timeout=WAIT_LONG)
         pages_done += 1
 
     return urls[:max_products]
@@ -138,20 +181,24 @@ def click_reviews_tab_if_present(driver):
         try:
             el = WebDriverWait(driver, 3).until(EC.element_to_be_clickable((By.XPATH, xp)))
             driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
-            polite_sleep(0.3)
             el.click()
-            polite_sleep(WAIT_SHORT)
+            wait_for(driver, EC.presence_of_element_located((By.CSS_SELECTOR, BV_HOST)), WAIT_SHORT)
             return
         except Exception:
             pass
 
+BV_HOST = 'div[data-automation="bazaar-voice-reviews"]'
+
 def wait_for_bv_shadow(driver) -> Optional[Any]:
     try:
         host = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-automation="bazaar-voice-reviews"]'))
+            EC.presence_of_element_located((By.CSS_SELECTOR, BV_HOST))
         )
         driver.execute_script("arguments[0].scrollIntoView({block:'center'});", host)
-        polite_sleep(0.4)
+        # Bazaarvoice renders into the shadow root lazily once scrolled into view
+        wait_for(driver, lambda d: d.execute_script(
+            "const r = arguments[0].shadowRoot;"
+            " return !!r && r.querySelectorAll('section[id^=\"bv-review-\"]').length > 0;", host), WAIT_LONG)
         return get_shadow_root(driver, host)
     except Exception:
         return None
@@ -314,44 +361,76 @@ def extract_product_name(driver) -> Optional[str]:
 
     return None
 
-def scrape_product(driver, product_url: str, product_type: str) -> Dict[str, Any]:
-    driver.get(product_url)
-    polite_sleep(WAIT_LONG)
+def fetch_reviews_via_api(driver, client: BazaarvoiceClient, max_reviews: Optional[int] = None,
+                          state: Optional[ProductState] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    All reviews for the product on the current page from the Bazaarvoice API
+    (only the ones newer than `state` when given), or None when the widget's
+    passkey/product id can't be found or the API fails.
+    """
+    passkey, product_id = discover_bv_config(driver)
+    client.passkey = client.passkey or passkey
+    if not (client.passkey and product_id):
+        print("    [i] Bazaarvoice passkey/product id not found, parsing the widget instead")
+        return None
+    try:
+        if state is None:
+            return client.reviews(product_id, max_reviews)
+        reviews = client.reviews(product_id, max_reviews, until=lambda page: split_new(page, state, MYER_FIELDS)[1])
+        return split_new(reviews, state, MYER_FIELDS)[0]
+    except Exception as e:
+        print(f"    [!] Bazaarvoice API failed for {product_id}: {e}")
+        return None
+
+def scrape_product(driver, product_url: str, product_type: str,
+                   bv: Optional[BazaarvoiceClient] = None, state: Optional[ProductState] = None) -> Dict[str, Any]:
+    with span("scrape.product_open", items=1, site="myer"):
+        polite_get(driver, product_url, DELAY)
+        network_idle(driver, timeout=WAIT_LONG)
 
-    # Basic meta
-    name = extract_product_name(driver)
+        # Basic meta
+        name = extract_product_name(driver)
 
-    # Price (JSON-LD first, then DOM)
-    price = extract_price_from_jsonld(driver) or extract_price_from_dom(driver)
+        # Price (JSON-LD first, then DOM)
+        price = extract_price_from_jsonld(driver) or extract_price_from_dom(driver)
 
-    # Reviews (open tab, get shadow root)
-    click_reviews_tab_if_present(driver)
-    shadow_root = wait_for_bv_shadow(driver)
-    if not shadow_root:
-        # scroll bottom & retry once
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        polite_sleep(2)
+    with span("scrape.reviews", site="myer") as s:
+        # Reviews (open tab, get shadow root)
+        click_reviews_tab_if_present(driver)
         shadow_root = wait_for_bv_shadow(driver)
-
-    all_reviews: List[Dict[str, Any]] = []
-    page_no = 1
-    while shadow_root and page_no <= REVIEW_PAGES_MAX and len(all_reviews) < REVIEW_TARGET:
-        for r in parse_reviews_on_current_page(shadow_root):
-            all_reviews.append(asdict(r))
-            if len(all_reviews) >= REVIEW_TARGET:
+        if not shadow_root:
+            # scroll bottom & retry once
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            shadow_root = wait_for_bv_shadow(driver)
+
+        all_reviews: List[Dict[str, Any]] = []
+        if bv is not None:
+            api_reviews = fetch_reviews_via_api(driver, bv, state=state)
+            if api_reviews is not None:
+                all_reviews = api_reviews
+                shadow_root = None          # nothing left to page through
+
+        page_no = 1
+        while shadow_root and page_no <= REVIEW_PAGES_MAX and len(all_reviews) < REVIEW_TARGET:
+            page = [asdict(r) for r in parse_reviews_on_current_page(shadow_root)]
+            fresh, reached_old = split_new(page, state, MYER_FIELDS)
+            for r in fresh:
+                all_reviews.append(r)
+                if len(all_reviews) >= REVIEW_TARGET:
+                    break
+            if len(all_reviews) >= REVIEW_TARGET or reached_old:
                 break
-        if len(all_reviews) >= REVIEW_TARGET:
-            break
 
-        next_href = get_next_reviews_href(shadow_root)
-        if not next_href:
-            break
+            next_href = get_next_reviews_href(shadow_root)
+            if not next_href:
+                break
 
-        driver.get(next_href)
-        polite_sleep(WAIT_LONG)
-        click_reviews_tab_if_present(driver)
-        shadow_root = wait_for_bv_shadow(driver)
-        page_no += 1
+            polite_get(driver, next_href, DELAY)
+            network_idle(driver, timeout=WAIT_LONG)
+            click_reviews_tab_if_present(driver)
+            shadow_root = wait_for_bv_shadow(driver)
+            page_no += 1
+        s.add(len(all_reviews))
 
     return {
         "product_url": product_url,
@@ -364,54 +443,108 @@ def scrape_product(driver, product_url: str, product_type: str) -> Dict[str, Any
 
 
 # ----------------- driver & main -----------------
-def build_driver(headless: bool = False):
-    opts = Options()
-    if headless:
-        opts.add_argument("--headless=new")
-    opts.add_argument("--window-size=1400,1000")
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--lang=en-AU")
-    opts.add_argument(
+def build_driver(headless: bool = False, lean: bool = True):
+    # cached chromedriver, persistent "myer" profile; `lean`: see scrape_browser
+    # (Bazaarvoice requests are never blocked: discover_bv_config reads them)
+    return make_chrome("myer", headless, [
+        "--window-size=1400,1000",
+        "--disable-gpu",
+        "--no-sandbox",
+        "--disable-dev-shm-usage",
+        "--lang=en-AU",
         "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
         "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/127.0.0.0 Safari/537.36"
-    )
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=opts)
-    driver.set_page_load_timeout(50)
-    return driver
+        "Chrome/127.0.0.0 Safari/537.36",
+    ], lean=lean, page_load_timeout=50)
 
 def main():
-    driver = build_driver(headless=False)  # set True once stable
+    ap = argparse.ArgumentParser(description="Scrape Myer skincare reviews.")
+    ap.add_argument("--reviews", choices=["api", "dom"], default=REVIEW_SOURCE, help="review source")
+    ap.add_argument("--bv-passkey", default=os.environ.get("MYER_BV_PASSKEY"),
+                    help="Bazaarvoice passkey (default: read from the widget's requests)")
+    ap.add_argument("--bv-api", default=BV_API, help="reviews endpoint, e.g. a bv_stub_server.py URL")
+    ap.add_argument("--record-bv", metavar="DIR", help="save API responses for bv_stub_server.py")
+    ap.add_argument("--resume", action="store_true",
+                    help="continue an interrupted run, skipping products already checkpointed")
+    ap.add_argument("--incremental", action="store_true",
+                    help="only keep reviews newer than previous runs (tracked in seen_reviews.sqlite)")
+    ap.add_argument("--listing", choices=["http", "browser"], default="http",
+                    help="search listing source: plain HTTP first (falls back to the browser) or browser only")
+    ap.add_argument("--listing-fixtures", metavar="DIR", help="read search pages from saved files instead")
+    ap.add_argument("--record-listings", metavar="DIR", help="save fetched search pages as fixtures")
+    ap.add_argument("--no-lean", dest="lean", action="store_false",
+                    help="load pages fully (images, fonts, trackers, animations)")
+    args = ap.parse_args()
+
+    # link discovery for every category at once, without the browser
+    prefetched: Dict[str, List[str]] = {}
+    if args.listing == "http":
+        with span("scrape.search", site="myer", via="http") as s, \
+                ListingFetcher(fixture_dir=args.listing_fixtures, record_dir=args.record_listings) as fetcher:
+            prefetched = prefetch_product_links(fetcher, CATEGORIES, PRODUCTS_PER_CATEGORY)
+            s.add(sum(map(len, prefetched.values())))
+
+    seen = SeenReviews() if args.incremental else None
+    if seen is not None and not args.resume:
+        seen.discard_pending()
+
+    bv = None
+    if args.reviews == "api":
+        bv = BazaarvoiceClient(args.bv_passkey, api=args.bv_api, record_dir=args.record_bv)
+
+    # an incremental run keeps the full scrape in OUTFILE and writes the new reviews beside it
+    outfile = NEW_OUTFILE if args.incremental else OUTFILE
+
+    # every finished product is appended here, so a crash or Ctrl-C loses at most one
+    checkpoint = Checkpoint(checkpoint_path_for(outfile), resume=args.resume)
+    if len(checkpoint):
+        print(f"[resume] {len(checkpoint)} products already in {checkpoint.path}")
+    driver = build_driver(headless=False, lean=args.lean)  # set headless True once stable
     try:
-        out = {
-            "search": {
-                "categories": CATEGORIES,
-                "base": BASE_SEARCH_URL,
-                "scraped_at": time.strftime("%Y-%m-%d %H:%M:%S")
-            },
-            "products": []
+        search = {
+            "categories": CATEGORIES,
+            "base": BASE_SEARCH_URL,
+            "scraped_at": time.strftime("%Y-%m-%d %H:%M:%S")
         }
 
         for cat in CATEGORIES:
             print(f"\n=== Category: {cat} ===")
-            links = collect_product_links_for_category(driver, cat, PRODUCTS_PER_CATEGORY)
+            links = prefetched.get(cat) or []
+            if len(links) < PRODUCTS_PER_CATEGORY:
+                if args.listing == "http":
+                    print(f"HTTP listing found {len(links)} product URLs for '{cat}'; using the browser")
+                with span("scrape.search", site="myer", via="browser") as s:
+                    links = max(collect_product_links_for_category(driver, cat, PRODUCTS_PER_CATEGORY), links, key=len)
+                    s.add(len(links))
             print(f"Found {len(links)} product URLs for '{cat}'")
 
             for i, url in enumerate(links, 1):
+                key = f"{cat}|{url}"
+                if key in checkpoint:
+                    continue
                 print(f"  [{i}/{len(links)}] {url}")
                 try:
-                    prod = scrape_product(driver, url, product_type=cat)
-                    out["products"].append(prod)
+                    state = seen.state(RETAILER, url) if seen is not None else None
+                    prod = scrape_product(driver, url, product_type=cat, bv=bv, state=state)
+                    checkpoint.add(key, prod)
+                    if seen is not None:
+                        seen.stage(RETAILER, url, prod["reviews"], MYER_FIELDS)
                 except Exception as e:
                     print(f"    [!] Failed {url}: {e}")
 
-        Path(OUTFILE).write_text(json.dumps(out, indent=2, ensure_ascii=False), encoding="utf-8")
-        print(f"\n[saved] {OUTFILE}  products={len(out['products'])}")
+        count = checkpoint.write_json(outfile, key="products", header={"search": search}, indent=2)
+        print(f"\n[saved] {outfile}  products={count}")
+        checkpoint.discard()
+        if seen is not None:
+            seen.commit()
+            print(f"[seen] {seen.stats()}")
     finally:
+        checkpoint.close()
         driver.quit()
+        if bv is not None:
+            bv.close()
+        if seen is not None:
+            seen.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,247 @@
+# review_normalize.py
+"""
+One record shape for every retailer's reviews.
+
+The review files come in three layouts:
+  * "reviewer_details": products with a "Reviewer Details" dict of reviews
+    (`review`, `review_stars` like "5.0 out of 5 stars"): Chemist Warehouse, Amazon
+  * "products_reviews": {"products": [{..., "reviews": [...]}]} with `body`
+    and a numeric `rating`: Myer, Mecca
+  * "sentiment_list": the notebook's flat list (`product`, `review`, `vader_score`)
+
+`read_site` turns any of them into compact `Review` records, with the rating
+and VADER scores parsed to numbers once: one record per review in each
+product listing, exactly what the summary CSVs count. The review store and
+the dashboard read these.
+
+`fold_syndicated` is a separate cross-retailer view: the same review text
+showing up more than once (a product listed under two categories, or a
+brand's reviews syndicated to several retailers) becomes one record that
+remembers every place it appeared. Its counts are distinct texts, so they
+are not comparable with the summary CSVs:
+
+    reviews = fold_syndicated(lambda: (r for site in SOURCES for r in read_site(site)))
+    python review_normalize.py --out reviews_normalized.jsonl
+"""
+from __future__ import annotations
+import argparse
+import ast
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from review_stream import iter_items, iter_products
+
+# scored outputs (what the dashboard and the review store read), per retailer
+SOURCES: Dict[str, Tuple[str, str]] = {
+    "Amazon": ("vader_sentiment_output.json", "sentiment_list"),
+    "Myer": ("myer_skin_care_reviews_vader.json", "products_reviews"),
+    "Mecca": ("mecca_skin_care_reviews_vader.json", "products_reviews"),
+    "Chemist Warehouse": ("cw_reviews_sentiment1.json", "reviewer_details"),
+}
+MIN_SYNDICATED_WORDS = 6     # shorter texts ("Love it!") only fold within one product
+
+Occurrence = Tuple[str, Optional[str], Optional[str]]     # (retailer, product, category)
+
+
+@dataclass(slots=True)
+class Review:
+    retailer: str
+    product: Optional[str]
+    category: Optional[str]
+    text: str
+    title: Optional[str] = None
+    rating: Optional[float] = None            # stars out of 5
+    sentiment: Optional[str] = None
+    compound: Optional[float] = None
+    pos: Optional[float] = None
+    neg: Optional[float] = None
+    neu: Optional[float] = None
+    also_on: List[Occurrence] = field(default_factory=list)   # other places the same text appeared
+
+    def occurrences(self) -> List[Occurrence]:
+        return [(self.retailer, self.product, self.category)] + self.also_on
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact JSON form: empty fields dropped."""
+        out = {k: getattr(self, k) for k in self.__slots__ if k != "also_on"}
+        out = {k: v for k, v in out.items() if v is not None}
+        if self.also_on:
+            out["also_on"] = [list(o) for o in self.also_on]
+        return out
+
+
+# ---------- field parsing ----------
+_OUT_OF = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:out\s*of|/)\s*(\d+(?:[.,]\d+)?)", re.I)
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def parse_rating(value: Any) -> Optional[float]:
+    """5, 4.0, "5.0", "4 out of 5 stars", "8/10" → stars out of 5 (None if unreadable)."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        stars = float(value)
+    else:
+        text = str(value)
+        m = _OUT_OF.search(text)
+        if m:
+            scale = float(m.group(2).replace(",", "."))
+            stars = float(m.group(1).replace(",", ".")) * 5 / scale if scale else math.nan
+        else:
+            m = _NUMBER.search(text)
+            if not m:
+                return None
+            stars = float(m.group(0).replace(",", "."))
+    return stars if 0 <= stars <= 5 else None
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        x = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(x) else x
+
+
+def _vader(rev: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    scores = rev.get("vader_score")
+    if isinstance(scores, str):          # the notebook saved the dict's repr
+        try:
+            scores = ast.literal_eval(scores)
+        except (ValueError, SyntaxError):
+            scores = None
+    if not isinstance(scores, dict):
+        scores = rev
+    return {k: _number(scores.get(k)) for k in ("compound", "pos", "neg", "neu")}
+
+
+def product_name(product: Dict[str, Any]) -> Optional[str]:
+    """Display name of a scraped product (Myer/Mecca `product_name`, CW `title`), else its URL."""
+    return (product.get("product_name") or product.get("title")
+            or product.get("product_url") or product.get("link"))
+
+
+def review_text(rev: Dict[str, Any]) -> str:
+    return rev.get("review") or rev.get("body") or ""
+
+
+def fingerprint(text: str) -> str:
+    """Hash of the review's words, ignoring case, punctuation and spacing."""
+    words = re.findall(r"\w+", (text or "").lower())
+    return hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=12).hexdigest() if words else ""
+
+
+# ---------- layouts ----------
+def _review(retailer: str, product: Optional[str], category: Optional[str], rev: Dict[str, Any],
+            title: Optional[str], rating: Any) -> Review:
+    return Review(retailer, product, category, review_text(rev), title, parse_rating(rating),
+                  rev.get("vader_sentiment"), **_vader(rev))
+
+
+def reviews_reviewer_details(product: Dict[str, Any], retailer: str) -> Iterator[Review]:
+    name = product_name(product)
+    for rev in (product.get("Reviewer Details") or {}).values():
+        yield _review(retailer, name, product.get("category"), rev, rev.get("review_title"), rev.get("review_stars"))
+
+
+def reviews_products_reviews(product: Dict[str, Any], retailer: str) -> Iterator[Review]:
+    name = product_name(product)
+    for rev in product.get("reviews") or []:
+        yield _review(retailer, name, product.get("product_type"), rev, rev.get("title"), rev.get("rating"))
+
+
+def reviews_sentiment_list(record: Dict[str, Any], retailer: str) -> Iterator[Review]:
+    yield _review(retailer, record.get("product"), None, record, None, record.get("rating"))
+
+
+LAYOUTS = {
+    "reviewer_details": reviews_reviewer_details,
+    "products_reviews": reviews_products_reviews,
+    "sentiment_list": reviews_sentiment_list,
+}
+
+
+def read_source(path: str, layout: str, retailer: str) -> Iterator[Review]:
+    items = iter_items(path) if layout == "sentiment_list" else iter_products(path)
+    to_reviews = LAYOUTS[layout]
+    for item in items:
+        yield from to_reviews(item, retailer)
+
+
+def read_site(site: str, path: Optional[str] = None) -> Iterator[Review]:
+    default_path, layout = SOURCES[site]
+    return read_source(path or default_path, layout, site)
+
+
+# ---------- syndicated copies ----------
+def _fold_key(r: Review, min_words: int) -> Any:
+    fp = fingerprint(r.text)
+    if not fp:
+        return None                          # rating-only review: nothing to compare
+    return fp if len(r.text.split()) >= min_words else (r.retailer, r.product, fp)
+
+
+def fold_syndicated(read: Callable[[], Iterable[Review]],
+                    min_words: int = MIN_SYNDICATED_WORDS) -> Iterator[Review]:
+    """
+    One record per distinct review text, in first-seen order, with later
+    copies listed in its `also_on`. Texts shorter than `min_words` only fold
+    within the same retailer and product, since short stock phrases from
+    different people are not the same review.
+
+    `read` is called twice (a first pass finds the copies, the second yields
+    records), so only the fold keys are held in memory, not the reviews.
+    """
+    first: Dict[Any, Tuple[int, Tuple[str, Optional[str]]]] = {}     # key → (index, (retailer, product))
+    also_on: Dict[int, List[Occurrence]] = {}
+    for i, r in enumerate(read()):
+        key = _fold_key(r, min_words)
+        if key is None:
+            continue
+        j, first_at = first.setdefault(key, (i, (r.retailer, r.product)))
+        where = (r.retailer, r.product, r.category)
+        if j == i or where[:2] == first_at:
+            continue
+        seen = also_on.setdefault(j, [])
+        if where[:2] not in {o[:2] for o in seen}:
+            seen.append(where)
+    for i, r in enumerate(read()):
+        key = _fold_key(r, min_words)
+        if key is None or first[key][0] == i:
+            r.also_on = also_on.get(i, [])
+            yield r
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Normalize every retailer's reviews into one JSONL file.")
+    ap.add_argument("--out", default="reviews_normalized.jsonl")
+    args = ap.parse_args()
+
+    sites = []
+    for site, (path, _) in SOURCES.items():
+        if os.path.exists(path):
+            sites.append((site, path))
+        else:
+            print(f"[normalize] {site}: {path} not found, skipped")
+
+    distinct = 0
+    shared = Counter()
+    with open(args.out, "w", encoding="utf-8") as f:
+        for r in fold_syndicated(lambda: (r for site, path in sites for r in read_site(site, path))):
+            f.write(json.dumps(r.to_dict(), ensure_ascii=False) + "\n")
+            distinct += 1
+            if r.also_on:
+                shared[tuple(sorted({o[0] for o in r.occurrences()}))] += 1
+    print(f"[normalize] {distinct} distinct reviews → {args.out}")
+    for retailers, n in shared.most_common():
+        print(f"  {n:6d} shared by {' + '.join(retailers)}")
+
+
+if __name__ == "__main__":
+    main()
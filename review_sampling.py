@@ -0,0 +1,153 @@
+# review_sampling.py
+"""
+Token-aware review selection for the LLM prompts.
+
+Instead of "first 50 positive + first 50 negative", reviews are
+de-duplicated (exact and near-identical texts, which syndicated and
+copy-pasted reviews produce a lot of), then sampled evenly across each
+sentiment until a token budget is filled. `chunk_reviews` splits a large
+review set into budget-sized groups for map-reduce summarisation.
+"""
+from __future__ import annotations
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+TOKEN_BUDGET = 3000          # tokens of review text per prompt
+MAX_REVIEW_TOKENS = 300      # longer reviews are trimmed to this
+NEAR_DUP_BITS = 5            # simhash distance at or below which two reviews count as the same
+SENTIMENTS = ("Positive", "Negative")
+
+_WORD = re.compile(r"[a-z0-9']+")
+_encoder = None
+
+
+# ---------- token accounting ----------
+def count_tokens(text: str) -> int:
+    """tiktoken count when available, else the usual ~4 characters per token estimate."""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")   # gpt-3.5/4 tokenizer
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def trim_to_tokens(text: str, max_tokens: int = MAX_REVIEW_TOKENS) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    # cut on a word boundary at roughly the right length, then tighten
+    words = text.split()
+    keep = max(1, int(len(words) * max_tokens / count_tokens(text)))
+    while keep > 1 and count_tokens(" ".join(words[:keep]) + " …") > max_tokens:
+        keep = int(keep * 0.9)
+    return " ".join(words[:keep]) + " …"
+
+
+# ---------- de-duplication ----------
+def _simhash(features: List[str]) -> int:
+    hashes = np.array([int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little")
+                       for f in features], dtype="<u8")
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0) * 2 > len(features)
+    return int.from_bytes(np.packbits(votes, bitorder="little").tobytes(), "little")
+
+
+def _bands(sig: int) -> List[Tuple[int, int]]:
+    # two signatures within NEAR_DUP_BITS differ in at most that many of these
+    # NEAR_DUP_BITS + 1 bands, so near-duplicates always share one
+    width = 64 // (NEAR_DUP_BITS + 1)
+    return [(b, sig >> (b * width) & ((1 << width) - 1)) for b in range(NEAR_DUP_BITS + 1)]
+
+
+def dedupe(reviews: List[Optional[str]]) -> List[str]:
+    """Drop empty, identical (ignoring case/punctuation) and near-identical reviews, keeping order."""
+    seen_exact = set()
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    kept = []
+    for text in reviews:
+        words = _WORD.findall((text or "").lower())
+        if not words:
+            continue
+        exact = " ".join(words)
+        if exact in seen_exact:
+            continue
+        seen_exact.add(exact)
+        # near-duplicate check on word bigrams so a changed word or two still matches
+        sig = _simhash([f"{a} {b}" for a, b in zip(words, words[1:])] or words)
+        bands = _bands(sig)
+        if any(bin(sig ^ other).count("1") <= NEAR_DUP_BITS
+               for band in bands for other in buckets.get(band, ())):
+            continue
+        for band in bands:
+            buckets.setdefault(band, []).append(sig)
+        kept.append(text.strip())
+    return kept
+
+
+# ---------- sampling ----------
+def _spread(items: List[str]) -> List[str]:
+    """Reorder so any prefix is spread evenly over the list (1st, middle, quarters, ...)."""
+    n = len(items)
+    order, step = [], n
+    taken = set()
+    while step >= 1 and len(order) < n:
+        for i in range(0, n, step):
+            if i not in taken:
+                taken.add(i)
+                order.append(i)
+        step //= 2
+    return [items[i] for i in order]
+
+
+def total_tokens(reviews: List[str]) -> int:
+    return sum(count_tokens(r) for r in reviews)
+
+
+def select_reviews(product_reviews: Dict[str, List[Optional[str]]], budget: int = TOKEN_BUDGET,
+                   max_review_tokens: int = MAX_REVIEW_TOKENS) -> List[str]:
+    """
+    Pick de-duplicated positive and negative reviews that fit `budget`,
+    alternating sentiments so both sides are represented, and spreading the
+    picks across each list instead of taking a prefix.
+    """
+    queues = [_spread(dedupe(product_reviews.get(s, []))) for s in SENTIMENTS]
+    picked, used = [], 0
+    while any(queues):
+        progressed = False
+        for q in queues:
+            if not q:
+                continue
+            text = trim_to_tokens(q.pop(0), max_review_tokens)
+            cost = count_tokens(text) + 1
+            if used + cost > budget:
+                continue
+            picked.append(text)
+            used += cost
+            progressed = True
+        if not progressed and used >= budget - max_review_tokens:
+            break
+    return picked
+
+
+def chunk_reviews(reviews: List[str], budget: int = TOKEN_BUDGET,
+                  max_review_tokens: int = MAX_REVIEW_TOKENS) -> List[List[str]]:
+    """Split reviews into consecutive groups of at most `budget` tokens each."""
+    chunks, current, used = [], [], 0
+    for text in reviews:
+        text = trim_to_tokens(text, max_review_tokens)
+        cost = count_tokens(text) + 1
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
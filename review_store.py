@@ -0,0 +1,158 @@
+# review_store.py
+"""
+Canonical columnar review table (Parquet, one partition per retailer).
+
+Every retailer's scored JSON is flattened (through review_normalize) into
+the same columns so the dashboard and reporting scripts can read just the
+columns they need and filter by retailer/product without parsing JSON:
+
+    python review_store.py build                    # import all scored outputs
+    read_reviews(["product", "review", "vader_sentiment"], retailer="Myer")
+
+Requires pyarrow (optional dependency).
+"""
+from __future__ import annotations
+import argparse
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # optional dependency
+    pa = ds = None
+
+from review_normalize import SOURCES, read_site
+
+STORE_DIR = "review_store"
+BATCH_ROWS = 50_000
+ROWS_PER_GROUP = 64 * 1024
+
+def _schema():
+    return pa.schema([
+        ("retailer", pa.string()),
+        ("category", pa.string()),
+        ("product", pa.string()),
+        ("review", pa.string()),
+        ("rating", pa.float64()),
+        ("vader_sentiment", pa.string()),
+        ("compound", pa.float64()),
+        ("pos", pa.float64()),
+        ("neg", pa.float64()),
+        ("neu", pa.float64()),
+    ])
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("review_store needs pyarrow: pip install pyarrow")
+
+
+def store_exists(store_dir: str = STORE_DIR) -> bool:
+    return pa is not None and os.path.isdir(store_dir)
+
+
+def has_retailer(retailer: str, store_dir: str = STORE_DIR) -> bool:
+    """Whether the store already holds a partition for `retailer`."""
+    if not store_exists(store_dir):
+        return False
+    dataset = ds.dataset(store_dir, format="parquet", partitioning="hive", schema=_schema())
+    return any(True for _ in dataset.get_fragments(filter=ds.field("retailer") == retailer))
+
+
+# ---------- rows from the scored JSON outputs ----------
+def rows_for(retailer: str, path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    One row per review in each (product, category) listing, normalized by
+    review_normalize (ratings parsed once); the same rows the summary CSV counts.
+    """
+    for r in read_site(retailer, path):
+        yield {
+            "retailer": retailer,
+            "category": r.category,
+            "product": r.product,
+            "review": r.text,
+            "rating": r.rating,
+            "vader_sentiment": r.sentiment,
+            "compound": r.compound,
+            "pos": r.pos,
+            "neg": r.neg,
+            "neu": r.neu,
+        }
+
+
+# ---------- write ----------
+def _record_batches(rows: Iterator[Dict[str, Any]]) -> Iterator[Any]:
+    schema = _schema()
+    buf: List[Dict[str, Any]] = []
+    for row in rows:
+        buf.append(row)
+        if len(buf) >= BATCH_ROWS:
+            yield pa.RecordBatch.from_pylist(buf, schema=schema)
+            buf = []
+    if buf:
+        yield pa.RecordBatch.from_pylist(buf, schema=schema)
+
+
+def import_site(retailer: str, path: Optional[str] = None, store_dir: str = STORE_DIR,
+                append: bool = False) -> None:
+    """
+    (Re)write one retailer's partition from its scored JSON output. With
+    append=True the file holds only new reviews: they go into a new part
+    file next to the partition's existing ones.
+    """
+    _require_pyarrow()
+    ds.write_dataset(
+        _record_batches(rows_for(retailer, path)),
+        store_dir,
+        schema=_schema(),
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("retailer", pa.string())]), flavor="hive"),
+        existing_data_behavior="overwrite_or_ignore" if append else "delete_matching",
+        basename_template=f"part-{time.time_ns()}-{{i}}.parquet" if append else "part-{i}.parquet",
+        max_rows_per_group=ROWS_PER_GROUP,
+        min_rows_per_group=min(ROWS_PER_GROUP, BATCH_ROWS),
+    )
+
+
+def build(store_dir: str = STORE_DIR) -> None:
+    for retailer, (path, _) in SOURCES.items():
+        if os.path.exists(path):
+            import_site(retailer, path, store_dir)
+            print(f"[store] {retailer} ← {path}")
+        else:
+            print(f"[store] {retailer}: {path} not found, skipped")
+
+
+# ---------- read ----------
+def read_reviews(columns: Optional[List[str]] = None, retailer: Optional[str] = None,
+                 product: Optional[str] = None, store_dir: str = STORE_DIR):
+    """
+    Load reviews as a DataFrame, reading only `columns`. The retailer filter
+    prunes whole partitions; the product filter is pushed down to the
+    Parquet row groups.
+    """
+    _require_pyarrow()
+    dataset = ds.dataset(store_dir, format="parquet", partitioning="hive", schema=_schema())
+    expr = None
+    if retailer is not None:
+        expr = ds.field("retailer") == retailer
+    if product is not None:
+        cond = ds.field("product") == product
+        expr = cond if expr is None else expr & cond
+    return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build the columnar review store.")
+    ap.add_argument("command", choices=["build"])
+    ap.add_argument("--store", default=STORE_DIR)
+    args = ap.parse_args()
+    if args.command == "build":
+        _require_pyarrow()
+        build(args.store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# review_stream.py
+"""
+Item-at-a-time JSON reading/writing for the retailer review files.
+
+The review files come in two shapes:
+  * a top-level list of products (Chemist Warehouse / Amazon, "Reviewer Details")
+  * an object whose "products" key holds the list (Myer / Mecca, products[].reviews[])
+
+`JsonArrayReader` yields one product at a time from either shape and
+`JsonArrayWriter` writes them back in the same layout (and byte-for-byte
+the same formatting as json.dump(..., indent=4)), so memory stays bounded
+by the largest single product rather than the whole file.
+"""
+from __future__ import annotations
+import json
+import os
+from typing import Any, Dict, Iterator, Optional
+
+CHUNK_SIZE = 1 << 16
+_WS = " \t\n\r"
+_DELIMS = _WS + ",]}:"
+
+
+class JsonArrayReader:
+    """
+    Stream the items of a JSON array.
+
+    key=None  → the document itself is the array.
+    key="..." → the document is an object and the array sits under that key;
+                the object's other keys are kept in `header` (before the array)
+                and `trailer` (after it, available once iteration finishes).
+    """
+
+    def __init__(self, path: str, key: Optional[str] = None, chunk_size: int = CHUNK_SIZE):
+        self.path = path
+        self.key = key
+        self.chunk_size = chunk_size
+        self.header: Dict[str, Any] = {}
+        self.trailer: Dict[str, Any] = {}
+        self._f = None
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    # ----- context manager -----
+    def __enter__(self):
+        self._f = open(self.path, "r", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    # ----- buffer helpers -----
+    def _fill(self, size: Optional[int] = None) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(size or self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # drop consumed text so the buffer never grows past one item + one chunk
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WS:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, ch: str):
+        got = self._peek()
+        if got != ch:
+            raise ValueError(f"{self.path}: expected {ch!r} at offset {self._pos}, got {got!r}")
+        self._pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        size = self.chunk_size
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+                # a scalar cut by the chunk boundary decodes short ("12" of "123", "2" of "2.5"),
+                # so only accept it once the next delimiter is in the buffer
+                if self._eof or (end < len(self._buf) and self._buf[end] in _DELIMS):
+                    self._pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+    def _string(self) -> str:
+        if self._peek() != '"':
+            raise ValueError(f"{self.path}: expected object key at offset {self._pos}")
+        return self._value()
+
+    # ----- iteration -----
+    def _items(self) -> Iterator[Any]:
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            ch = self._peek()
+            self._pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError(f"{self.path}: expected ',' or ']' at offset {self._pos - 1}")
+
+    def _members_after_array(self):
+        while True:
+            ch = self._peek()
+            self._pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError(f"{self.path}: expected ',' or '}}' at offset {self._pos - 1}")
+            k = self._string()
+            self._expect(":")
+            self.trailer[k] = self._value()
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._f is None:
+            self.__enter__()
+
+        if self.key is None:
+            self._expect("[")
+            yield from self._items()
+            return
+
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            k = self._string()
+            self._expect(":")
+            if k == self.key and self._peek() == "[":
+                self._pos += 1
+                yield from self._items()
+                self._members_after_array()
+                return
+            self.header[k] = self._value()
+            ch = self._peek()
+            self._pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError(f"{self.path}: expected ',' or '}}' at offset {self._pos - 1}")
+
+
+def iter_items(path: str, key: Optional[str] = None) -> Iterator[Any]:
+    """Yield the items of the array at the document root (or under `key`)."""
+    with JsonArrayReader(path, key) as reader:
+        yield from reader
+
+
+def iter_products(path: str, key: str = "products") -> Iterator[Any]:
+    """Yield products from either layout, sniffing whether the root is a list or an object."""
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(64).lstrip()
+    yield from iter_items(path, None if head.startswith("[") else key)
+
+
+def _indented(obj: Any, indent: int, level: int, ensure_ascii: bool) -> str:
+    text = json.dumps(obj, indent=indent, ensure_ascii=ensure_ascii)
+    if level == 0:
+        return text
+    pad = " " * (indent * level)
+    return text.replace("\n", "\n" + pad)
+
+
+class JsonArrayWriter:
+    """
+    Counterpart of JsonArrayReader: write items one by one into either a
+    top-level array (key=None) or an object {**header, key: [...], **trailer}.
+    Output matches json.dump(doc, f, indent=indent, ensure_ascii=ensure_ascii).
+
+    Items go to `<path>.tmp`, which replaces `path` only when the writer is
+    closed cleanly; if the block raises, the temp file is deleted and the
+    previous output (which may also be the file being read) is left as it was.
+    """
+
+    def __init__(self, path: str, key: Optional[str] = None, header: Optional[Dict[str, Any]] = None,
+                 indent: int = 4, ensure_ascii: bool = False):
+        self.path = path
+        self.key = key
+        self.header = header or {}
+        self.trailer: Dict[str, Any] = {}
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self.count = 0
+        self._level = 1 if key is None else 2
+        self._tmp = path + ".tmp"
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self._tmp, "w", encoding="utf-8")
+        if self.key is None:
+            self._f.write("[")
+        else:
+            self._f.write("{")
+            pad = "\n" + " " * self.indent
+            for k, v in self.header.items():
+                self._f.write(f"{pad}{json.dumps(k, ensure_ascii=self.ensure_ascii)}: "
+                              f"{_indented(v, self.indent, 1, self.ensure_ascii)},")
+            self._f.write(f"{pad}{json.dumps(self.key, ensure_ascii=self.ensure_ascii)}: [")
+        return self
+
+    def write(self, item: Any):
+        pad = "\n" + " " * (self.indent * self._level)
+        self._f.write(("," if self.count else "") + pad + _indented(item, self.indent, self._level, self.ensure_ascii))
+        self.count += 1
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def abort(self):
+        """Drop everything written so far and keep the previous output."""
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+        os.remove(self._tmp)
+
+    def close(self):
+        if self._f is None:
+            return
+        close_pad = "\n" + " " * (self.indent * (self._level - 1))
+        self._f.write((close_pad if self.count else "") + "]")
+        if self.key is not None:
+            pad = "\n" + " " * self.indent
+            for k, v in self.trailer.items():
+                self._f.write(f",{pad}{json.dumps(k, ensure_ascii=self.ensure_ascii)}: "
+                              f"{_indented(v, self.indent, 1, self.ensure_ascii)}")
+            self._f.write("\n}")
+        self._f.close()
+        self._f = None
+        os.replace(self._tmp, self.path)
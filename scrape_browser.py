@@ -0,0 +1,182 @@
+# scrape_browser.py
+"""
+Shared Chrome factory for the Selenium scrapers.
+
+- The chromedriver path is resolved once and cached on disk, so starting a
+  browser skips webdriver-manager's network lookup (CHROMEDRIVER pins a
+  path outright; a stale driver is re-resolved automatically).
+- Each scraper (and each pool worker) gets a persistent profile, so cookies
+  (including cookie consent) survive between runs and the consent banner
+  only has to be dismissed once.
+- Lean mode (the default; --no-lean in the scrapers turns it off): eager
+  page-load strategy (driver.get returns at DOMContentLoaded, the scrapers'
+  condition waits do the rest), images/fonts/media and third-party trackers
+  blocked, and CSS animations/transitions disabled. Nothing we parse needs
+  any of it; bench_page_load.py measures the difference.
+
+    driver = make_chrome("mecca", headless=True)
+    if not consent_recorded("mecca"):
+        ...dismiss the banner...
+        record_consent("mecca")
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+BROWSER_DIR = os.environ.get("SCRAPER_BROWSER_DIR", ".browser")
+DRIVER_TTL = 7 * 86400          # re-resolve the driver weekly (Chrome auto-updates)
+CONSENT_TTL = 30 * 86400        # consent cookies outlive this; re-check the banner after it
+LEAN = True
+
+# URL patterns (CDP Network.setBlockedURLs wildcards) blocked in lean mode.
+# SVG is left alone (star ratings are drawn with it), and so is Bazaarvoice (the Myer reviews).
+BLOCKED_RESOURCES = [
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.ico*",
+    "*.woff*", "*.ttf*", "*.otf*", "*.eot*",
+    "*.mp4*", "*.webm*", "*.m3u8*",
+]
+BLOCKED_TRACKERS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*facebook.net*", "*connect.facebook.com*", "*hotjar.com*", "*clarity.ms*", "*tiktok.com*",
+    "*pinterest.com*", "*snapchat.com*", "*nr-data.net*", "*newrelic.com*", "*quantummetric.com*",
+    "*demdex.net*", "*omtrdc.net*", "*criteo.*", "*segment.io*", "*segment.com*", "*bing.com/action*",
+    "*adnxs.com*", "*taboola.com*", "*yotpo.com/pixel*", "*cquotient.com*", "*rfksrv.com*",
+]
+BLOCKED_URLS = BLOCKED_RESOURCES + BLOCKED_TRACKERS
+
+# injected before any page script: no animations or transitions to wait out
+NO_ANIMATIONS_JS = """
+(() => {
+  const add = () => {
+    const s = document.createElement('style');
+    s.textContent = '*,*::before,*::after{animation:none!important;transition:none!important;'
+                  + 'scroll-behavior:auto!important}';
+    (document.head || document.documentElement).appendChild(s);
+  };
+  if (document.documentElement) add(); else document.addEventListener('DOMContentLoaded', add);
+})();
+"""
+
+_driver_lock = threading.Lock()
+_driver_path: Optional[str] = None
+
+
+# ---------- chromedriver ----------
+def _cache_file() -> str:
+    return os.path.join(BROWSER_DIR, "chromedriver.json")
+
+
+def driver_path(refresh: bool = False) -> str:
+    """chromedriver path: $CHROMEDRIVER, else cached, else resolved with webdriver-manager."""
+    global _driver_path
+    pinned = os.environ.get("CHROMEDRIVER")
+    if pinned:
+        return pinned
+    with _driver_lock:       # pool workers start together; resolve once
+        if _driver_path and not refresh:
+            return _driver_path
+        if not refresh:
+            try:
+                with open(_cache_file(), encoding="utf-8") as f:
+                    cached = json.load(f)
+                if os.path.exists(cached["path"]) and time.time() - cached["resolved_at"] < DRIVER_TTL:
+                    _driver_path = cached["path"]
+                    return _driver_path
+            except (OSError, ValueError, KeyError):
+                pass
+        from webdriver_manager.chrome import ChromeDriverManager
+        _driver_path = ChromeDriverManager().install()
+        os.makedirs(BROWSER_DIR, exist_ok=True)
+        with open(_cache_file(), "w", encoding="utf-8") as f:
+            json.dump({"path": _driver_path, "resolved_at": time.time()}, f)
+        return _driver_path
+
+
+# ---------- profiles ----------
+def profile_dir(name: str) -> str:
+    return os.path.abspath(os.path.join(BROWSER_DIR, "profiles", name))
+
+
+def _consent_marker(profile: str) -> str:
+    return os.path.join(profile_dir(profile), "consent-ok")
+
+
+def consent_recorded(profile: Optional[str]) -> bool:
+    """True if this profile already holds the site's cookie consent."""
+    if not profile:
+        return False
+    try:
+        return time.time() - os.path.getmtime(_consent_marker(profile)) < CONSENT_TTL
+    except OSError:
+        return False
+
+
+def record_consent(profile: Optional[str]):
+    if profile:
+        os.makedirs(profile_dir(profile), exist_ok=True)
+        with open(_consent_marker(profile), "w") as f:
+            f.write(time.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+# ---------- driver ----------
+def block_resources(driver, patterns: Iterable[str] = BLOCKED_URLS):
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+    except Exception as e:
+        print(f"[browser] resource blocking unavailable: {e}")
+
+
+def make_lean(driver):
+    """Block BLOCKED_URLS and switch off animations for every page this driver loads."""
+    block_resources(driver)
+    try:
+        driver.execute_cdp_cmd("Emulation.setEmulatedMedia",
+                               {"features": [{"name": "prefers-reduced-motion", "value": "reduce"}]})
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": NO_ANIMATIONS_JS})
+    except Exception as e:
+        print(f"[browser] could not disable animations: {e}")
+
+
+def make_chrome(profile: Optional[str] = None, headless: bool = False, args: Iterable[str] = (),
+                experimental: Optional[Dict[str, Any]] = None, lean: bool = LEAN,
+                page_load_timeout: Optional[float] = None, log_network: bool = False):
+    """
+    Chrome with the cached driver and `profile` (a name under BROWSER_DIR/profiles,
+    or None for a throwaway one); see make_lean for `lean`. `log_network`
+    keeps DevTools network events in driver.get_log("performance").
+    A profile can only be open in one browser at a time.
+    """
+    opts = Options()
+    if headless:
+        opts.add_argument("--headless=new")
+    if lean:
+        opts.page_load_strategy = "eager"
+    if log_network:
+        opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    for arg in args:
+        opts.add_argument(arg)
+    for key, value in (experimental or {}).items():
+        opts.add_experimental_option(key, value)
+    if profile:
+        os.makedirs(profile_dir(profile), exist_ok=True)
+        opts.add_argument(f"--user-data-dir={profile_dir(profile)}")
+
+    try:
+        driver = webdriver.Chrome(service=Service(driver_path()), options=opts)
+    except SessionNotCreatedException:
+        # usually a cached driver that no longer matches the installed Chrome
+        driver = webdriver.Chrome(service=Service(driver_path(refresh=True)), options=opts)
+    if page_load_timeout:
+        driver.set_page_load_timeout(page_load_timeout)
+    if lean:
+        make_lean(driver)
+    return driver
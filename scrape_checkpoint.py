@@ -0,0 +1,115 @@
+# scrape_checkpoint.py
+"""
+Append-only checkpoint log for the scrapers.
+
+Each finished product is appended to a JSONL file as soon as it is scraped
+(and fsynced), so a crash loses at most the product in progress. Rerunning
+with --resume skips every product already in the log, and the final JSON is
+streamed from the log, so memory stays flat however long the run is:
+
+    with Checkpoint("myer_skin_care_reviews.checkpoint.jsonl", resume=True) as cp:
+        for url in links:
+            if url in cp:
+                continue
+            cp.add(url, scrape_product(driver, url))
+        cp.write_json("myer_skin_care_reviews.json", key="products", header={...})
+    cp.discard()          # run finished: the next run starts fresh
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from review_stream import JsonArrayWriter
+
+
+def checkpoint_path_for(output: str) -> str:
+    root, _ = os.path.splitext(output)
+    return f"{root}.checkpoint.jsonl"
+
+
+class Checkpoint:
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self._offsets: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        self._load()
+        self._f = open(path, "ab")
+
+    # ----- context manager -----
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def discard(self):
+        """Delete the log (call once the final output is written)."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    # ----- log -----
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in iter(f.readline, b""):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break           # torn last line from a crash mid-write
+                if not line.endswith(b"\n"):
+                    break
+                self._offsets[entry["key"]] = good
+                good += len(line)
+        # drop the torn tail so new entries start on a clean line
+        if good != os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def add(self, key: str, record: Dict[str, Any]):
+        line = (json.dumps({"key": key, "record": record}, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            offset = self._f.tell()
+            self._f.write(line)
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._offsets[key] = offset
+
+    def records(self, keys: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Logged records in log order, or in the order of `keys` (missing keys skipped)."""
+        with self._lock:
+            self._f.flush()
+        with open(self.path, "rb") as f:
+            if keys is None:
+                for line in iter(f.readline, b""):
+                    yield json.loads(line)["record"]
+                return
+            for key in keys:
+                if key in self._offsets:
+                    f.seek(self._offsets[key])
+                    yield json.loads(f.readline())["record"]
+
+    def write_json(self, path: str, key: Optional[str] = None, header: Optional[Dict[str, Any]] = None,
+                   indent: int = 2, order: Optional[Iterable[str]] = None) -> int:
+        """Stream the records into `path` (a list, or header + `key` list), one at a time."""
+        with JsonArrayWriter(path, key, header, indent=indent) as out:
+            for record in self.records(order):
+                out.write(record)
+            return out.count
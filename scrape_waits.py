@@ -0,0 +1,174 @@
+# scrape_waits.py
+"""
+Shared waiting layer for the Selenium scrapers.
+
+Instead of fixed time.sleep() calls, the scrapers wait on DOM conditions
+(elements present, new review cards rendered, spinner gone, network quiet)
+and return as soon as the page is ready. Page loads go through an
+`AdaptiveDelay`, a per-site politeness gap that shrinks while the site
+responds quickly and backs off on errors or block pages:
+
+    DELAY = AdaptiveDelay()
+    polite_get(driver, url, DELAY)
+    wait_for(driver, lambda d: d.find_elements(By.CSS_SELECTOR, "article"), timeout=10)
+"""
+from __future__ import annotations
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+POLL = 0.1                 # seconds between condition checks
+BLOCK_MARKERS = ("access denied", "captcha", "are you a robot", "request blocked", "too many requests")
+
+
+# ---------- condition waits ----------
+def wait_for(driver, condition: Callable[[Any], Any], timeout: float = 10, poll: float = POLL) -> Any:
+    """Return condition(driver)'s first truthy value, or None once `timeout` passes."""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=poll).until(condition)
+    except TimeoutException:
+        return None
+
+
+def document_ready(driver) -> bool:
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def wait_gone(driver, css: str, timeout: float = 10) -> bool:
+    """Wait until no visible element matches `css` (e.g. a loading spinner)."""
+    return bool(wait_for(
+        driver,
+        lambda d: not d.execute_script(
+            "return Array.from(document.querySelectorAll(arguments[0]))"
+            ".some(e => e.offsetParent !== null)", css),
+        timeout,
+    ))
+
+
+def wait_for_change(driver, snapshot: Callable[[Any], Any], before: Any, timeout: float = 10) -> bool:
+    """Wait until snapshot(driver) differs from `before` (new cards rendered, count grew, ...)."""
+    def changed(d):
+        try:
+            return snapshot(d) != before
+        except Exception:   # stale elements mid-render: not ready yet
+            return False
+    return bool(wait_for(driver, changed, timeout))
+
+
+def network_idle(driver, idle: float = 0.5, timeout: float = 10) -> bool:
+    """
+    Wait until the page has finished loading and no new resource has been
+    fetched for `idle` seconds (Resource Timing entries stop growing).
+    """
+    deadline = time.monotonic() + timeout
+    last_count, quiet_since = -1, time.monotonic()
+    while time.monotonic() < deadline:
+        try:
+            count = driver.execute_script(
+                "return document.readyState === 'complete'"
+                " ? performance.getEntriesByType('resource').length : -1")
+        except Exception:
+            count = -1
+        now = time.monotonic()
+        if count != last_count or count < 0:
+            last_count, quiet_since = count, now
+        elif now - quiet_since >= idle:
+            return True
+        time.sleep(POLL)
+    return False
+
+
+def scroll_for_more(driver, count_js: str, step_js: str = "window.scrollBy(0, 1600);",
+                    timeout: float = 3) -> bool:
+    """
+    Scroll once and wait for lazy-loaded content: returns True as soon as the
+    `count_js` expression (e.g. number of product tiles) or the page height
+    grows, False if nothing new arrived within `timeout`.
+    """
+    probe = f"return [({count_js}), document.body.scrollHeight];"
+    before = driver.execute_script(probe)
+    driver.execute_script(step_js)
+
+    def grew(d):
+        count, height = d.execute_script(probe)
+        return count > before[0] or height > before[1]
+    return bool(wait_for(driver, grew, timeout))
+
+
+# ---------- politeness ----------
+class AdaptiveDelay:
+    """
+    Minimum gap between page loads to one site, shared by every driver (and
+    thread) that scrapes it. Fast successful loads shrink the gap towards
+    `min_delay`, slow ones grow it, failures double it and a block page jumps
+    straight to `max_delay`. A little jitter keeps requests from looking
+    machine-timed.
+    """
+
+    def __init__(self, initial: float = 1.0, min_delay: float = 0.25, max_delay: float = 20.0,
+                 fast: float = 1.5, slow: float = 5.0, jitter: float = 0.2):
+        self.delay = initial
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.fast = fast
+        self.slow = slow
+        self.jitter = jitter
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until this caller's turn; callers are spaced `delay` apart."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if start > now:
+            time.sleep(start - now)
+
+    def success(self, elapsed: float):
+        with self._lock:
+            if elapsed < self.fast:
+                self.delay = max(self.min_delay, self.delay * 0.85)
+            elif elapsed > self.slow:
+                self.delay = min(self.max_delay, self.delay * 1.25)
+
+    def failure(self):
+        with self._lock:
+            self.delay = min(self.max_delay, max(1.0, self.delay * 2))
+
+    def blocked(self):
+        with self._lock:
+            self.delay = self.max_delay
+            self._next_at = time.monotonic() + self.max_delay
+
+
+def looks_blocked(driver) -> bool:
+    try:
+        title = (driver.title or "").lower()
+        head = driver.execute_script("return (document.body && document.body.innerText || '').slice(0, 400)")
+    except Exception:
+        return False
+    text = f"{title} {head}".lower()
+    return any(marker in text for marker in BLOCK_MARKERS)
+
+
+def polite_get(driver, url: str, delay: Optional[AdaptiveDelay] = None):
+    """driver.get(url) paced by `delay`, feeding the load time/outcome back into it."""
+    if delay is None:
+        driver.get(url)
+        return
+    delay.wait()
+    started = time.monotonic()
+    try:
+        driver.get(url)
+    except Exception:
+        delay.failure()
+        raise
+    if looks_blocked(driver):
+        delay.blocked()
+        raise RuntimeError(f"blocked by site at {url}")
+    delay.success(time.monotonic() - started)
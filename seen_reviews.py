@@ -0,0 +1,178 @@
+# seen_reviews.py
+"""
+Reviews already scraped, per retailer and product, for incremental runs.
+
+For every product we keep a content hash of each stored review plus a
+high-water mark (hash and date of the newest one). Review lists are newest
+first, so a scraper can stop paginating at the first review it has already
+stored and only emit the new ones (fold them into the summaries with
+`vader_engine.py --append`).
+
+Marks from the current run are staged and only committed once its output
+is saved, so a crashed run never hides reviews that were not written out:
+
+    seen = SeenReviews()
+    seen.discard_pending()                    # fresh run (keep them on --resume)
+    state = seen.state("Myer", url)
+    fresh, reached_old = split_new(page, state, MYER_FIELDS)
+    seen.stage("Myer", url, fresh, MYER_FIELDS)
+    ...write output...
+    seen.commit()
+"""
+from __future__ import annotations
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+DEFAULT_PATH = "seen_reviews.sqlite"
+
+# fields that identify a review, per scraper output; CW dates are relative
+# ("2 years ago") and change as a review ages, so they are left out, and
+# CW runs stop on known reviews only (no high-water date)
+CW_FIELDS = ("reviewer_name", "review_title", "review")
+MYER_FIELDS = ("title", "body")
+DATE_FORMATS = ("%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d", "%d %B %Y", "%d %b %Y", "%B %d, %Y")
+
+
+def review_hash(review: Dict[str, Any], fields: Sequence[str]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for f in fields:
+        h.update(" ".join(str(review.get(f) or "").split()).lower().encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def parse_date(text: Optional[str]) -> Optional[datetime]:
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+@dataclass
+class ProductState:
+    known: Set[str] = field(default_factory=set)
+    last_hash: Optional[str] = None
+    last_date: Optional[str] = None
+
+
+def split_new(page: List[Dict[str, Any]], state: Optional[ProductState], fields: Sequence[str],
+              date_field: Optional[str] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    (reviews on `page` not stored before, whether the page reached stored
+    reviews). Reaching the high-water review, any known review, or one dated
+    before the high-water date means the rest of the list is old.
+    """
+    if state is None:
+        return list(page), False
+    last = parse_date(state.last_date)
+    fresh, reached = [], False
+    for r in page:
+        h = review_hash(r, fields)
+        if h == state.last_hash or h in state.known:
+            reached = True
+            continue
+        when = parse_date(r.get(date_field)) if date_field else None
+        if last is not None and when is not None and when < last:
+            reached = True
+            continue
+        fresh.append(r)
+    return fresh, reached
+
+
+class SeenReviews:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        # shared by the scraper's worker threads, serialised by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen ("
+                " retailer TEXT, product TEXT, hash TEXT, pending INTEGER,"
+                " PRIMARY KEY (retailer, product, hash))"
+            )
+            for table in ("high_water", "pending_high_water"):
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    " retailer TEXT, product TEXT, last_hash TEXT, last_date TEXT, updated_at INTEGER,"
+                    " PRIMARY KEY (retailer, product))"
+                )
+            self._conn.commit()
+
+    # ----- context manager -----
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ----- lookups -----
+    def state(self, retailer: str, product: str) -> ProductState:
+        """Committed reviews and high-water mark for one product."""
+        with self._lock:
+            known = {h for (h,) in self._conn.execute(
+                "SELECT hash FROM seen WHERE retailer=? AND product=? AND pending=0", (retailer, product))}
+            row = self._conn.execute(
+                "SELECT last_hash, last_date FROM high_water WHERE retailer=? AND product=?",
+                (retailer, product)).fetchone()
+        return ProductState(known, *(row or (None, None)))
+
+    # ----- updates -----
+    def stage(self, retailer: str, product: str, reviews: List[Dict[str, Any]], fields: Sequence[str],
+              date_field: Optional[str] = None):
+        """Record this run's new reviews for a product (newest first); visible after commit()."""
+        if not reviews:
+            return
+        hashes = [review_hash(r, fields) for r in reviews]
+        newest_date = reviews[0].get(date_field) if date_field else None
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen (retailer, product, hash, pending) VALUES (?, ?, ?, 1)",
+                [(retailer, product, h) for h in hashes],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pending_high_water VALUES (?, ?, ?, ?, ?)",
+                (retailer, product, hashes[0], newest_date, int(time.time())),
+            )
+            self._conn.commit()
+
+    def commit(self):
+        """The run's output is saved: staged reviews become known."""
+        with self._lock:
+            self._conn.execute("UPDATE seen SET pending=0 WHERE pending=1")
+            self._conn.execute("INSERT OR REPLACE INTO high_water SELECT * FROM pending_high_water")
+            self._conn.execute("DELETE FROM pending_high_water")
+            self._conn.commit()
+
+    def discard_pending(self):
+        """Forget marks staged by an earlier run that never saved its output."""
+        with self._lock:
+            self._conn.execute("DELETE FROM seen WHERE pending=1")
+            self._conn.execute("DELETE FROM pending_high_water")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            products, reviews = self._conn.execute(
+                "SELECT COUNT(DISTINCT retailer || '|' || product), COUNT(*) FROM seen WHERE pending=0").fetchone()
+        return {"products": products, "reviews": reviews}
@@ -0,0 +1,148 @@
+# sentiment_cache.py
+"""
+Persistent VADER score cache.
+
+Scores are stored in SQLite keyed by a hash of the analyzer version and the
+whitespace-normalised review text, so re-running the *_vader.py scripts or
+the notebook only pays for reviews that are new or have changed.
+
+    with SentimentCache() as cache:
+        scores = cache.score_many(texts, lambda ts: [sid.polarity_scores(t) for t in ts])
+        print(cache.stats())
+"""
+from __future__ import annotations
+import hashlib
+import sqlite3
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+DEFAULT_PATH = "vader_cache.sqlite"
+MAX_ENTRIES = 5_000_000
+SQL_CHUNK = 500           # keys per IN (...) query, below SQLite's variable limit
+SCORE_FIELDS = ("neg", "neu", "pos", "compound")   # polarity_scores() key order
+
+
+def analyzer_version() -> str:
+    """Identify the scorer so a VADER upgrade invalidates old entries."""
+    try:
+        import nltk
+        return f"nltk-vader-{nltk.__version__}"
+    except ImportError:
+        return "nltk-vader-unknown"
+
+
+def normalize_text(text: Optional[str]) -> str:
+    # VADER tokenises on whitespace, so collapsing runs of it never changes a score
+    return " ".join((text or "").split())
+
+
+def _chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class SentimentCache:
+    def __init__(self, path: str = DEFAULT_PATH, version: Optional[str] = None,
+                 max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.version = version or analyzer_version()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " key BLOB PRIMARY KEY, neg REAL, neu REAL, pos REAL, compound REAL,"
+            " last_used INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores(last_used)")
+
+    # ----- context manager -----
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._conn is not None:
+            self.evict()
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    # ----- keys -----
+    def key_for(self, text: Optional[str]) -> bytes:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self.version.encode("utf-8"))
+        h.update(b"\0")
+        h.update(normalize_text(text).encode("utf-8"))
+        return h.digest()
+
+    # ----- lookups -----
+    def get_many(self, texts: Sequence[Optional[str]]) -> List[Optional[Dict[str, float]]]:
+        """Return cached scores (or None) for each text, in order."""
+        keys = [self.key_for(t) for t in texts]
+        found: Dict[bytes, Dict[str, float]] = {}
+        for chunk in _chunks(list(set(keys)), SQL_CHUNK):
+            marks = ",".join("?" * len(chunk))
+            for key, *vals in self._conn.execute(
+                f"SELECT key, neg, neu, pos, compound FROM scores WHERE key IN ({marks})", chunk
+            ):
+                found[key] = dict(zip(SCORE_FIELDS, vals))
+
+        now = int(time.time())
+        for chunk in _chunks(list(found), SQL_CHUNK):
+            marks = ",".join("?" * len(chunk))
+            self._conn.execute(f"UPDATE scores SET last_used=? WHERE key IN ({marks})", [now, *chunk])
+
+        out = [dict(found[k]) if k in found else None for k in keys]
+        hit = sum(1 for s in out if s is not None)
+        self.hits += hit
+        self.misses += len(out) - hit
+        return out
+
+    def put_many(self, texts: Sequence[Optional[str]], scores: Sequence[Dict[str, float]]):
+        now = int(time.time())
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO scores (key, neg, neu, pos, compound, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            [(self.key_for(t), *(s[f] for f in SCORE_FIELDS), now) for t, s in zip(texts, scores)],
+        )
+        self._conn.commit()
+
+    def score_many(self, texts: Sequence[Optional[str]],
+                   score_fn: Callable[[List[Optional[str]]], List[Dict[str, float]]]
+                   ) -> List[Dict[str, float]]:
+        """Scores for `texts`, calling `score_fn` only on the ones not in the cache."""
+        cached = self.get_many(texts)
+        missing = [t for t, s in zip(texts, cached) if s is None]
+        if missing:
+            fresh = score_fn(missing)
+            self.put_many(missing, fresh)
+            it = iter(fresh)
+            cached = [s if s is not None else next(it) for s in cached]
+        return cached
+
+    # ----- housekeeping -----
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def evict(self, max_entries: Optional[int] = None) -> int:
+        """Drop least-recently-used entries until at most `max_entries` remain."""
+        limit = self.max_entries if max_entries is None else max_entries
+        excess = len(self) - limit
+        if excess <= 0:
+            return 0
+        self._conn.execute(
+            "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._conn.commit()
+        self.evicted += excess
+        return excess
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evicted": self.evicted, "entries": len(self)}
@@ -0,0 +1,312 @@
+# stage_metrics.py
+"""
+Opt-in stage spans for the batch scripts and the dashboard: wall time, CPU
+time, peak RSS and item counts for each scraper phase, scoring loop,
+summary aggregation, dashboard load and LLM call.
+
+    from stage_metrics import span
+    with span("vader.score", site="Myer") as s:
+        for batch in batches:
+            ...
+            s.add(len(batch))
+
+Everything is off until configured, and a span is then a shared no-op
+object. Configure with environment variables (read on import), or call
+configure() from code:
+
+    PIPELINE_METRICS=metrics.jsonl    append one JSON line per finished span
+    PIPELINE_METRICS_PORT=9108        serve Prometheus text at http://localhost:9108/metrics
+    PIPELINE_PROFILE=run.prof         cProfile the run, dumped at exit (run.html: pyinstrument)
+
+    python stage_metrics.py summary metrics.jsonl    # totals per stage
+    python stage_metrics.py prom metrics.jsonl       # Prometheus text (node_exporter textfile)
+
+CPU time is the whole process's (threads overlap). Peak RSS is the
+process's high-water mark when the span ends, and rss_growth_mb is how much
+the span raised it. Scoring pool workers write their own JSON lines but do
+not show up on the parent's endpoint.
+"""
+from __future__ import annotations
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:          # Windows
+    resource = None
+
+PREFIX = "review_pipeline"
+
+_lock = threading.Lock()
+_local = threading.local()
+_jsonl: Optional[str] = None
+_enabled = False
+_server: Optional[ThreadingHTTPServer] = None
+_profiler = None
+# (stage, labels) → running totals, for the Prometheus endpoint
+_totals: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Dict[str, float]] = defaultdict(
+    lambda: {"runs": 0, "errors": 0, "wall_s": 0.0, "cpu_s": 0.0, "items": 0})
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024     # bytes on macOS, KiB elsewhere
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20
+    except (ImportError, AttributeError):
+        return None
+
+
+# ---------- spans ----------
+class Span:
+    __slots__ = ("name", "labels", "items", "_wall", "_cpu", "_rss", "_parent")
+
+    def __init__(self, name: str, labels: Dict[str, Any], items: int = 0):
+        self.name = name
+        self.labels = {k: str(v) for k, v in labels.items() if v is not None}
+        self.items = items
+
+    def add(self, n: int = 1):
+        self.items += n
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self._parent = stack[-1].name if stack else None
+        stack.append(self)
+        self._rss = peak_rss_mb()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        rss = peak_rss_mb()
+        stack = getattr(_local, "stack", [])
+        if self in stack:           # a generator's span can be closed from another thread
+            stack.remove(self)
+        record = {
+            "ts": round(time.time() - wall, 3), "stage": self.name, **self.labels,
+            "wall_s": round(wall, 4), "cpu_s": round(cpu, 4), "items": self.items,
+            "rss_peak_mb": round(rss, 1) if rss is not None else None,
+            "rss_growth_mb": round(rss - self._rss, 1) if rss is not None and self._rss is not None else None,
+            "parent": self._parent, "pid": os.getpid(),
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        _record(record, self.labels)
+        return False
+
+
+class _NoSpan:
+    """What span() returns while metrics are off."""
+    items = 0
+
+    def add(self, n: int = 1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, items: int = 0, **labels):
+    """Context manager timing one stage; `labels` (site=..., chain=...) tag the record."""
+    if not _enabled:
+        return _NO_SPAN
+    return Span(name, labels, items)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _record(record: Dict[str, Any], labels: Dict[str, str]):
+    with _lock:
+        t = _totals[(record["stage"], tuple(sorted(labels.items())))]
+        t["runs"] += 1
+        t["errors"] += "error" in record
+        t["wall_s"] += record["wall_s"]
+        t["cpu_s"] += record["cpu_s"]
+        t["items"] += record["items"]
+        if _jsonl:
+            with open(_jsonl, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# ---------- Prometheus text ----------
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(stage: str, labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [("stage", stage), *labels]
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+METRICS = [
+    ("wall_s", "stage_seconds_total", "counter", "Wall time spent in the stage."),
+    ("cpu_s", "stage_cpu_seconds_total", "counter", "Process CPU time spent in the stage."),
+    ("items", "stage_items_total", "counter", "Items (reviews, products, pages) the stage handled."),
+    ("runs", "stage_runs_total", "counter", "Times the stage ran."),
+    ("errors", "stage_errors_total", "counter", "Times the stage raised."),
+]
+
+
+def prometheus_text(totals: Optional[Dict] = None, peak_mb: Optional[float] = None) -> str:
+    """
+    This process's running totals and live peak RSS, or, given `totals` (read
+    back from JSON lines), those and the recorded run's `peak_mb`.
+    """
+    if totals is None:
+        with _lock:
+            totals = {k: dict(v) for k, v in _totals.items()}
+        peak_mb = peak_rss_mb()
+    lines = []
+    for field, metric, kind, help_text in METRICS:
+        lines += [f"# HELP {PREFIX}_{metric} {help_text}", f"# TYPE {PREFIX}_{metric} {kind}"]
+        for (stage, labels), t in sorted(totals.items()):
+            value = t[field]
+            lines.append(f"{PREFIX}_{metric}{_labels(stage, labels)} {value if isinstance(value, int) else round(value, 6)}")
+    if peak_mb is not None:
+        lines += [f"# HELP {PREFIX}_peak_rss_bytes Peak resident set size of the process.",
+                  f"# TYPE {PREFIX}_peak_rss_bytes gauge",
+                  f"{PREFIX}_peak_rss_bytes {peak_mb * 2**20:.0f}"]
+    return "\n".join(lines) + "\n"
+
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve prometheus_text() at /metrics from a background thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------- profiling ----------
+def _start_profiler(path: str):
+    global _profiler
+    if path.endswith(".html"):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("[metrics] pyinstrument not installed; use a .prof path for cProfile")
+            return
+        _profiler = Profiler()
+        _profiler.start()
+
+        def dump():
+            _profiler.stop()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(_profiler.output_html())
+    else:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+        def dump():
+            _profiler.disable()
+            _profiler.dump_stats(path)      # python -m pstats run.prof, or snakeviz
+    atexit.register(dump)
+
+
+# ---------- setup ----------
+def configure(jsonl: Optional[str] = None, port: Optional[int] = None, profile: Optional[str] = None):
+    """Turn spans on: JSON lines to `jsonl`, Prometheus text on `port`, a `profile` of the whole run."""
+    global _enabled, _jsonl, _server
+    if jsonl:
+        _jsonl = jsonl
+    if port and _server is None:
+        try:
+            _server = serve(port)
+        except OSError as e:      # e.g. a second process on the same port
+            print(f"[metrics] could not serve on port {port}: {e}")
+    if profile and _profiler is None:
+        # spawned pool workers inherit the variable: only the process that set it profiles
+        if os.environ.setdefault("PIPELINE_PROFILE_PID", str(os.getpid())) == str(os.getpid()):
+            _start_profiler(profile)
+    _enabled = _enabled or bool(jsonl or port or profile)
+
+
+configure(os.environ.get("PIPELINE_METRICS"), int(os.environ.get("PIPELINE_METRICS_PORT") or 0),
+          os.environ.get("PIPELINE_PROFILE"))
+
+
+# ---------- reading JSON lines back ----------
+def load_records(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+_RECORD_FIELDS = {"ts", "stage", "wall_s", "cpu_s", "items", "rss_peak_mb", "rss_growth_mb", "parent", "pid", "error"}
+
+
+def totals_from(records: Iterable[Dict[str, Any]]) -> Dict:
+    totals = defaultdict(lambda: {"runs": 0, "errors": 0, "wall_s": 0.0, "cpu_s": 0.0, "items": 0})
+    for r in records:
+        labels = tuple(sorted((k, str(v)) for k, v in r.items() if k not in _RECORD_FIELDS))
+        t = totals[(r["stage"], labels)]
+        t["runs"] += 1
+        t["errors"] += "error" in r
+        t["wall_s"] += r["wall_s"]
+        t["cpu_s"] += r["cpu_s"]
+        t["items"] += r["items"]
+    return totals
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Summarize stage spans written with PIPELINE_METRICS.")
+    ap.add_argument("command", choices=["summary", "prom"])
+    ap.add_argument("jsonl")
+    args = ap.parse_args()
+
+    records = load_records(args.jsonl)
+    totals = totals_from(records)
+    peak = max((r["rss_peak_mb"] for r in records if r.get("rss_peak_mb") is not None), default=None)
+    if args.command == "prom":
+        sys.stdout.write(prometheus_text(totals, peak))
+        return
+
+    print(f"{'stage':28} {'labels':28} {'runs':>6} {'wall s':>9} {'cpu s':>9} {'items':>9} {'µs/item':>9}")
+    for (stage, labels), t in sorted(totals.items(), key=lambda kv: -kv[1]["wall_s"]):
+        per_item = f"{t['wall_s'] / t['items'] * 1e6:9.1f}" if t["items"] else f"{'':9}"
+        label_text = ",".join(f"{k}={v}" for k, v in labels)
+        print(f"{stage:28} {label_text[:28]:28} {t['runs']:6d} {t['wall_s']:9.3f} {t['cpu_s']:9.3f} "
+              f"{t['items']:9d} {per_item}")
+    if peak is not None:
+        print(f"peak RSS: {peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+# vader_engine.py
+"""
+Shared VADER scoring engine for the retailer review files.
+
+CW_vader.py, myer_vader.py and mecca_vader.py are thin wrappers around
+`run_site`; each retailer only differs in how products/reviews are laid out
+in its JSON and in which columns end up in the summary CSV.
+
+Usage:
+    python vader_engine.py myer --workers 8
+"""
+from __future__ import annotations
+import argparse
+import itertools
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import review_store
+from review_normalize import product_name, review_text
+from review_stream import JsonArrayReader, JsonArrayWriter
+from sentiment_cache import DEFAULT_PATH as DEFAULT_CACHE, SentimentCache
+from stage_metrics import span
+
+BATCH_SIZE = 2000   # reviews per pool task
+
+
+# ---------- labels ----------
+def label_for(compound: float) -> str:
+    if compound >= 0.05:
+        return "Positive"
+    elif compound <= -0.05:
+        return "Negative"
+    else:
+        return "Neutral"
+
+
+# ---------- per-retailer input adapters ----------
+# Each adapter yields (review_dict, review_text, flat_record) for every review
+# of one product. `review_dict` is enriched in place so the product can be
+# written back unchanged apart from the VADER fields; `flat_record` carries
+# the grouping keys for the summary.
+ReviewRow = Tuple[Dict[str, Any], str, Dict[str, Any]]
+
+
+def iter_reviewer_details(product) -> Iterator[ReviewRow]:
+    """Chemist Warehouse layout: top-level list, reviews under "Reviewer Details"."""
+    name = product_name(product)
+    for key, rev in product.get("Reviewer Details", {}).items():
+        yield rev, review_text(rev), {
+            "product": name,
+            "category": product.get("category"),
+        }
+
+
+def iter_products_reviews(product) -> Iterator[ReviewRow]:
+    """Myer/Mecca layout: {"products": [{..., "reviews": [...]}]}."""
+    name = product_name(product)
+    for rev in product.get("reviews", []):
+        yield rev, review_text(rev), {"product": name}
+
+
+@dataclass
+class SiteConfig:
+    name: str
+    array_key: Optional[str]   # None → file is a top-level list of products
+    iter_reviews: Callable[[Any], Iterator[ReviewRow]]
+    group_keys: List[str]
+    include_total: bool
+    input_file: str
+    output_json: str
+    output_csv: str
+
+
+SITES: Dict[str, SiteConfig] = {
+    "cw": SiteConfig(
+        name="Chemist Warehouse",
+        array_key=None,
+        iter_reviews=iter_reviewer_details,
+        group_keys=["product", "category"],
+        include_total=True,
+        input_file="chemist_warehouse_reviews_20250925_194924.json",
+        output_json="cw_reviews_sentiment1.json",
+        output_csv="cw_product_vader_scores1.csv",
+    ),
+    "myer": SiteConfig(
+        name="Myer",
+        array_key="products",
+        iter_reviews=iter_products_reviews,
+        group_keys=["product"],
+        include_total=False,
+        input_file="myer_skin_care_reviews.json",
+        output_json="myer_skin_care_reviews_vader.json",
+        output_csv="myer_skin_care_reviews_vader.csv",
+    ),
+    "mecca": SiteConfig(
+        name="Mecca",
+        array_key="products",
+        iter_reviews=iter_products_reviews,
+        group_keys=["product"],
+        include_total=False,
+        input_file="mecca_skin_care_reviews.json",
+        output_json="mecca_skin_care_reviews_vader.json",
+        output_csv="mecca_skin_care_reviews_vader.csv",
+    ),
+}
+
+
+# ---------- scoring (one analyzer per worker process) ----------
+# vader_fast gives nltk's exact scores, batch-compiled; its vocabulary grows across batches
+_analyzer = None
+
+
+def _init_worker():
+    global _analyzer
+    from vader_fast import CompiledVader
+    _analyzer = CompiledVader()
+
+
+def _score_batch(texts: List[str]) -> List[Dict[str, float]]:
+    if _analyzer is None:
+        _init_worker()
+    with span("vader.score_batch", items=len(texts)):
+        return _analyzer.score_records(texts)
+
+
+def score_products(products: Iterable[Any], iter_reviews: Callable[[Any], Iterator[ReviewRow]],
+                   workers: Optional[int] = None, batch_size: int = BATCH_SIZE,
+                   cache: Optional[SentimentCache] = None
+                   ) -> Iterator[Tuple[Any, List[Tuple[ReviewRow, Dict[str, float]]]]]:
+    """
+    Stream (product, [(row, scores), ...]) in input order.
+
+    Products are grouped until a batch holds `batch_size` reviews; at most
+    two batches per worker are in flight, so memory is bounded by the batch
+    window rather than the input size. With a `cache`, only reviews missing
+    from it are sent to the scorer. A text repeated within a batch (the same
+    product under two categories, syndicated reviews) is scored once.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    def batches():
+        group, rows = [], []
+        for product in products:
+            product_rows = list(iter_reviews(product))
+            group.append((product, product_rows))
+            rows.extend(product_rows)
+            if len(rows) >= batch_size:
+                yield group, rows
+                group, rows = [], []
+        if group:
+            yield group, rows
+
+    def lookup(rows):
+        texts = [text for _, text, _ in rows]
+        cached = cache.get_many(texts) if cache is not None else [None] * len(texts)
+        missing = list(dict.fromkeys(t for t, c in zip(texts, cached) if c is None))
+        return cached, missing
+
+    def unpack(group, cached, missing, fresh):
+        if cache is not None and missing:
+            cache.put_many(missing, fresh)
+        fresh_by_text = dict(zip(missing, fresh))
+        scores = iter(cached)
+        for product, product_rows in group:
+            out = []
+            for row in product_rows:
+                c = next(scores)
+                out.append((row, c if c is not None else fresh_by_text[row[1]]))
+            yield product, out
+
+    if workers <= 1:
+        for group, rows in batches():
+            cached, missing = lookup(rows)
+            yield from unpack(group, cached, missing, _score_batch(missing) if missing else [])
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        in_flight = deque()
+        for group, rows in batches():
+            cached, missing = lookup(rows)
+            fut = pool.submit(_score_batch, missing) if missing else None
+            in_flight.append((group, cached, missing, fut))
+            if len(in_flight) >= 2 * workers:
+                done_group, done_cached, done_missing, done = in_flight.popleft()
+                yield from unpack(done_group, done_cached, done_missing, done.result() if done else [])
+        while in_flight:
+            done_group, done_cached, done_missing, done = in_flight.popleft()
+            yield from unpack(done_group, done_cached, done_missing, done.result() if done else [])
+
+
+# ---------- summary ----------
+# The summary is kept as running sums/counts per product so a batch of new
+# reviews can be folded into an existing summary without the old reviews.
+SUM_COLUMNS = ["sum_compound", "sum_pos", "sum_neg", "sum_neu",
+               "positive_reviews", "negative_reviews", "neutral_reviews", "total_reviews"]
+COUNT_COLUMNS = SUM_COLUMNS[4:]
+
+
+def aggregate(df: pd.DataFrame, group_keys: List[str]) -> pd.DataFrame:
+    """Per-product running sums (indexed by `group_keys`) for a frame of scored reviews."""
+    with span("summary.aggregate", items=len(df)):
+        sentiment = df["vader_sentiment"].to_numpy()
+        parts = pd.DataFrame({
+            "sum_compound": df["compound"].to_numpy(),
+            "sum_pos": df["pos"].to_numpy(),
+            "sum_neg": df["neg"].to_numpy(),
+            "sum_neu": df["neu"].to_numpy(),
+            "positive_reviews": (sentiment == "Positive").astype("int64"),
+            "negative_reviews": (sentiment == "Negative").astype("int64"),
+            "neutral_reviews": (sentiment == "Neutral").astype("int64"),
+            "total_reviews": df["vader_sentiment"].notna().to_numpy().astype("int64"),
+        })
+        keys = [df[k].to_numpy() for k in group_keys]
+        sums = parts.groupby(keys).sum()
+        sums.index.names = group_keys
+    return sums
+
+
+def merge_sums(*frames: pd.DataFrame) -> pd.DataFrame:
+    frames = [f for f in frames if f is not None and len(f)]
+    if not frames:
+        return pd.DataFrame(columns=SUM_COLUMNS)
+    if len(frames) == 1:
+        return frames[0]
+    names = frames[0].index.names
+    merged = pd.concat(frames).groupby(level=list(range(len(names)))).sum()
+    merged.index.names = names
+    merged[COUNT_COLUMNS] = merged[COUNT_COLUMNS].astype("int64")
+    return merged
+
+
+def finalize(sums: pd.DataFrame, include_total: bool) -> pd.DataFrame:
+    """Turn running sums into the summary CSV columns."""
+    n = sums["total_reviews"]
+    summary_df = pd.DataFrame({
+        "avg_compound": sums["sum_compound"] / n,
+        "avg_pos": sums["sum_pos"] / n,
+        "avg_neg": sums["sum_neg"] / n,
+        "avg_neu": sums["sum_neu"] / n,
+        "positive_reviews": sums["positive_reviews"],
+        "negative_reviews": sums["negative_reviews"],
+        "neutral_reviews": sums["neutral_reviews"],
+    }, index=sums.index)
+    if include_total:
+        summary_df["total_reviews"] = n
+    avg = summary_df["avg_compound"].to_numpy()
+    summary_df["overall_sentiment"] = np.select([avg >= 0.05, avg <= -0.05], ["Positive", "Negative"], "Neutral")
+    return summary_df.sort_index().reset_index()
+
+
+def summarize(df: pd.DataFrame, group_keys: List[str], include_total: bool) -> pd.DataFrame:
+    return finalize(aggregate(df, group_keys), include_total)
+
+
+def state_path_for(output_csv: str) -> str:
+    root, _ = os.path.splitext(output_csv)
+    return f"{root}.state.csv"
+
+
+def load_sums(path: str, group_keys: List[str]) -> Optional[pd.DataFrame]:
+    if not os.path.exists(path):
+        return None
+    # round_trip keeps the float sums bit-exact across runs
+    return pd.read_csv(path, encoding="utf-8", float_precision="round_trip").set_index(group_keys)
+
+
+def save_sums(sums: pd.DataFrame, path: str):
+    sums.reset_index().to_csv(path, index=False, encoding="utf-8")
+
+
+def sums_from_json(cfg: SiteConfig, path: str) -> Optional[pd.DataFrame]:
+    """Running sums rebuilt from an enriched JSON written earlier (its reviews already carry their scores)."""
+    if not os.path.exists(path):
+        return None
+    partial_sums, rows = [], []
+    with JsonArrayReader(path, cfg.array_key) as reader:
+        for product in reader:
+            for rev, _, flat in cfg.iter_reviews(product):
+                flat.update({k: rev.get(k) for k in ("vader_sentiment", "compound", "pos", "neg", "neu")})
+                rows.append(flat)
+            if len(rows) >= BATCH_SIZE:
+                partial_sums.append(aggregate(pd.DataFrame(rows), cfg.group_keys))
+                rows = []
+    if rows:
+        partial_sums.append(aggregate(pd.DataFrame(rows), cfg.group_keys))
+    return merge_sums(*partial_sums)
+
+
+# ---------- pipeline ----------
+def _products(reader: JsonArrayReader) -> Iterator[Any]:
+    # pull the first product so the reader has consumed the header keys
+    products = iter(reader)
+    first = next(products, None)
+    return itertools.chain([first], products) if first is not None else iter(())
+
+
+def append_json(output_json: str, delta_json: str, key: Optional[str]):
+    """Stream the products of `delta_json` onto the end of the enriched `output_json`."""
+    if not os.path.exists(output_json):
+        shutil.copyfile(delta_json, output_json)
+        return
+    with JsonArrayReader(output_json, key) as old, JsonArrayReader(delta_json, key) as new:
+        products = _products(old)
+        with JsonArrayWriter(output_json, key, header=old.header) as writer:
+            for product in itertools.chain(products, new):
+                writer.write(product)
+            writer.trailer = old.trailer
+            old.close()         # the merged file replaces it (Windows)
+
+
+def run_site(site: str, input_file: Optional[str] = None, output_json: Optional[str] = None,
+             output_csv: Optional[str] = None, workers: Optional[int] = None,
+             cache_path: Optional[str] = DEFAULT_CACHE, store_dir: Optional[str] = None,
+             append: bool = False) -> pd.DataFrame:
+    """
+    Score one retailer file and write its enriched JSON and summary CSV.
+
+    With append=True the input is treated as new reviews only: their sums are
+    merged into the summary state kept next to the CSV (rebuilt from the
+    existing enriched JSON when there is none yet) instead of rebuilding
+    the summary from this file alone, the scored products are added to the end
+    of the existing enriched JSON, and only their rows are added to the store.
+    """
+    cfg = SITES[site]
+    input_file = input_file or cfg.input_file
+    output_json = output_json or cfg.output_json
+    output_csv = output_csv or cfg.output_csv
+    # in append mode the new products are scored into a delta file first
+    root, ext = os.path.splitext(output_json)
+    scored_json = f"{root}.new{ext}" if append else output_json
+
+    import nltk
+    nltk.download("vader_lexicon", quiet=True)
+
+    # cache_path=None scores everything from scratch
+    cache = SentimentCache(cache_path) if cache_path else None
+
+    # flat records are folded into per-product sums every BATCH_SIZE reviews
+    processed_reviews, partial_sums, n_reviews = [], [], 0
+    with span("vader.score", site=cfg.name) as scoring, JsonArrayReader(input_file, cfg.array_key) as reader:
+        products = _products(reader)
+
+        # Enriched JSON is written product by product as scores come back
+        with JsonArrayWriter(scored_json, cfg.array_key, header=reader.header) as writer:
+            for product, scored in score_products(products, cfg.iter_reviews, workers=workers, cache=cache):
+                for (rev, _, flat), s in scored:
+                    sentiment = label_for(s["compound"])
+
+                    # Enrich review with VADER scores
+                    rev["vader_sentiment"] = sentiment
+                    rev["compound"] = s["compound"]
+                    rev["pos"] = s["pos"]
+                    rev["neg"] = s["neg"]
+                    rev["neu"] = s["neu"]
+
+                    flat.update(vader_sentiment=sentiment, compound=s["compound"],
+                                pos=s["pos"], neg=s["neg"], neu=s["neu"])
+                    processed_reviews.append(flat)
+                writer.write(product)
+                scoring.add(len(scored))
+                if len(processed_reviews) >= BATCH_SIZE:
+                    partial_sums.append(aggregate(pd.DataFrame(processed_reviews), cfg.group_keys))
+                    n_reviews += len(processed_reviews)
+                    processed_reviews = []
+            writer.trailer = reader.trailer
+            reader.close()      # the output replaces the input file when both are the same path (Windows)
+
+    if cache is not None:
+        cache.evict()
+        print(f"[cache] {cache.stats()}")
+        cache.close()
+
+    if processed_reviews:
+        partial_sums.append(aggregate(pd.DataFrame(processed_reviews), cfg.group_keys))
+        n_reviews += len(processed_reviews)
+
+    state_path = state_path_for(output_csv)
+    with span("summary.finalize", site=cfg.name) as summarizing:
+        previous = None
+        if append:
+            previous = load_sums(state_path, cfg.group_keys)
+            if previous is None:        # no state kept yet: start from the reviews already scored
+                previous = sums_from_json(cfg, output_json)
+        sums = merge_sums(previous, *partial_sums)
+        save_sums(sums, state_path)
+
+        summary_df = finalize(sums, cfg.include_total)
+        summary_df.to_csv(output_csv, index=False, encoding="utf-8")
+        summarizing.add(len(summary_df))
+
+    if append:
+        append_json(output_json, scored_json, cfg.array_key)
+        print(f"✅ VADER-processed JSON appended: {output_json}  ({n_reviews} new reviews)")
+    else:
+        print(f"✅ VADER-processed JSON saved: {output_json}  ({n_reviews} reviews)")
+    print(f"✅ Summary CSV saved: {output_csv}")
+
+    try:
+        # keep the columnar store in sync once it has been built (or when asked to)
+        store_dir = store_dir or review_store.STORE_DIR
+        if store_dir != review_store.STORE_DIR or review_store.store_exists(store_dir):
+            if append and review_store.has_retailer(cfg.name, store_dir):
+                review_store.import_site(cfg.name, scored_json, store_dir, append=True)
+            else:
+                review_store.import_site(cfg.name, output_json, store_dir)
+            print(f"✅ Review store updated: {store_dir} (retailer={cfg.name})")
+    finally:
+        if append:
+            os.remove(scored_json)
+    return summary_df
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Score retailer reviews with VADER.")
+    ap.add_argument("site", choices=sorted(SITES))
+    ap.add_argument("--input")
+    ap.add_argument("--output-json")
+    ap.add_argument("--output-csv")
+    ap.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    ap.add_argument("--cache", default=DEFAULT_CACHE, help="score cache file (default: %(default)s)")
+    ap.add_argument("--no-cache", action="store_true", help="rescore every review")
+    ap.add_argument("--store", default=None, help="also write the columnar review store here")
+    ap.add_argument("--append", action="store_true",
+                    help="input holds only new reviews; merge them into the existing summary")
+    args = ap.parse_args()
+    run_site(args.site, args.input, args.output_json, args.output_csv, workers=args.workers,
+             cache_path=None if args.no_cache else args.cache, store_dir=args.store, append=args.append)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+# vader_fast.py
+"""
+Batch VADER scorer, numerically identical to nltk's SentimentIntensityAnalyzer.
+
+nltk's polarity_scores() rebuilds a {punctuation+word: word} dict for every
+text, lower-cases and looks up every token several times and runs the
+booster/negation/idiom checks in pure Python for each one. Here every
+distinct token is compiled once into an interned id with its properties
+(lexicon valence, booster scalar, negation, ALL CAPS, ...) held in
+NumPy-backed arrays, lexicon hits for a whole batch are found with one
+vectorised lookup, and the per-word rules only run for those hits. The rules
+themselves are nltk's, in the same order and with the same float
+operations, so every score matches to the last bit.
+
+    vader = CompiledVader()
+    scores = vader.score_many(texts)        # {"neg": array, "neu": ..., "pos": ..., "compound": ...}
+    vader.polarity_scores("Great serum!")    # same dict as nltk
+
+    python vader_fast.py verify cw_reviews_sentiment1.json   # compare with nltk on a review file
+    python vader_fast.py bench                               # speed vs nltk on the stored reviews
+"""
+from __future__ import annotations
+import argparse
+import itertools
+import math
+import string
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+SCORE_FIELDS = ("neg", "neu", "pos", "compound")     # polarity_scores() key order
+DROP = -1                                            # id of single-character tokens (VADER ignores them)
+_PUNCT = set(string.punctuation)
+
+
+class CompiledVader:
+    def __init__(self, analyzer=None):
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer, VaderConstants
+        analyzer = analyzer or SentimentIntensityAnalyzer()
+        c = VaderConstants
+        self.lexicon: Dict[str, float] = analyzer.lexicon
+        self.boosters: Dict[str, float] = c.BOOSTER_DICT
+        self.idioms: Dict[str, float] = c.SPECIAL_CASE_IDIOMS
+        self.negate = c.NEGATE
+        self.punc_list = set(c.PUNC_LIST)
+        self.B_DECR, self.C_INCR, self.N_SCALAR = c.B_DECR, c.C_INCR, c.N_SCALAR
+
+        # interned tokens: raw whitespace token → id of the word VADER sees after punctuation stripping
+        self._raw: Dict[str, int] = {}
+        self._ids: Dict[str, int] = {}
+        # per-id properties (plain lists for the scalar rule code, NumPy for the batch lookup)
+        self.word: List[str] = []         # token as VADER sees it (case kept)
+        self.lower: List[str] = []
+        self.valence: List[float] = []    # lexicon valence (0.0 if not in the lexicon)
+        self.in_lex: List[bool] = []
+        self.booster: List[float] = []    # BOOSTER_DICT scalar
+        self.is_booster: List[bool] = []
+        self.negated: List[bool] = []
+        self.upper: List[int] = []
+        self._hit = np.zeros(1024, dtype=bool)   # in the lexicon and not a booster
+        self._but: set = set()                   # ids whose lower case is "but"
+
+    # ---------- vocabulary ----------
+    def _strip(self, token: str) -> str:
+        """
+        nltk's SentiText mapping: a token that is one PUNC_LIST entry glued to
+        a punctuation-free word of 2+ characters (",cat", "cat!!") becomes the word.
+        """
+        head = 0
+        while head < len(token) and token[head] in _PUNCT:
+            head += 1
+        tail = len(token)
+        while tail > head and token[tail - 1] in _PUNCT:
+            tail -= 1
+        core = token[head:tail]
+        if len(core) < 2 or any(ch in _PUNCT for ch in core):
+            return token
+        if head and tail == len(token) and token[:head] in self.punc_list:
+            return core
+        if not head and tail < len(token) and token[tail:] in self.punc_list:
+            return core
+        return token
+
+    def _intern(self, raw: str) -> int:
+        if len(raw) < 2:
+            tid = DROP
+        else:
+            word = self._strip(raw)
+            tid = self._ids.get(word)
+            if tid is None:
+                tid = self._add_word(word)
+        self._raw[raw] = tid
+        return tid
+
+    def _add_word(self, word: str) -> int:
+        tid = len(self.word)
+        low = word.lower()
+        in_lex = low in self.lexicon
+        is_booster = low in self.boosters
+        self.word.append(word)
+        self.lower.append(low)
+        self.valence.append(self.lexicon.get(low, 0.0))
+        self.in_lex.append(in_lex)
+        self.booster.append(self.boosters.get(low, 0.0))
+        self.is_booster.append(is_booster)
+        self.negated.append(low in self.negate or "n't" in low)
+        self.upper.append(int(word.isupper()))
+        if tid >= len(self._hit):
+            self._hit = np.concatenate([self._hit, np.zeros(len(self._hit), dtype=bool)])
+        self._hit[tid] = in_lex and not is_booster
+        if low == "but":
+            self._but.add(tid)
+        self._ids[word] = tid
+        return tid
+
+    def token_ids(self, text: str) -> List[int]:
+        raw = text.split()
+        ids = list(map(self._raw.get, raw))
+        if None in ids:
+            ids = [self._intern(t) if i is None else i for i, t in zip(ids, raw)]
+        if DROP in ids:
+            ids = [i for i in ids if i != DROP]
+        return ids
+
+    # ---------- nltk's per-word rules, on ids ----------
+    def _scalar_inc_dec(self, tid: int, valence: float, cap_diff: bool) -> float:
+        scalar = 0.0
+        if self.is_booster[tid]:
+            scalar = self.booster[tid]
+            if valence < 0:
+                scalar *= -1
+            if self.upper[tid] and cap_diff:
+                if valence > 0:
+                    scalar += self.C_INCR
+                else:
+                    scalar -= self.C_INCR
+        return scalar
+
+    def _never_check(self, valence: float, ids: List[int], start_i: int, i: int) -> float:
+        word = self.word
+        if start_i == 0:
+            if self.negated[ids[i - 1]]:
+                valence = valence * self.N_SCALAR
+        if start_i == 1:
+            if word[ids[i - 2]] == "never" and (word[ids[i - 1]] == "so" or word[ids[i - 1]] == "this"):
+                valence = valence * 1.5
+            elif self.negated[ids[i - (start_i + 1)]]:
+                valence = valence * self.N_SCALAR
+        if start_i == 2:
+            if (word[ids[i - 3]] == "never" and (word[ids[i - 2]] == "so" or word[ids[i - 2]] == "this")
+                    or (word[ids[i - 1]] == "so" or word[ids[i - 1]] == "this")):
+                valence = valence * 1.25
+            elif self.negated[ids[i - (start_i + 1)]]:
+                valence = valence * self.N_SCALAR
+        return valence
+
+    def _idioms_check(self, valence: float, ids: List[int], i: int) -> float:
+        w = self.word
+        onezero = f"{w[ids[i - 1]]} {w[ids[i]]}"
+        twoonezero = f"{w[ids[i - 2]]} {w[ids[i - 1]]} {w[ids[i]]}"
+        twoone = f"{w[ids[i - 2]]} {w[ids[i - 1]]}"
+        threetwoone = f"{w[ids[i - 3]]} {w[ids[i - 2]]} {w[ids[i - 1]]}"
+        threetwo = f"{w[ids[i - 3]]} {w[ids[i - 2]]}"
+        for seq in (onezero, twoonezero, twoone, threetwoone, threetwo):
+            if seq in self.idioms:
+                valence = self.idioms[seq]
+                break
+        if len(ids) - 1 > i:
+            zeroone = f"{w[ids[i]]} {w[ids[i + 1]]}"
+            if zeroone in self.idioms:
+                valence = self.idioms[zeroone]
+        if len(ids) - 1 > i + 1:
+            zeroonetwo = f"{w[ids[i]]} {w[ids[i + 1]]} {w[ids[i + 2]]}"
+            if zeroonetwo in self.idioms:
+                valence = self.idioms[zeroonetwo]
+        if threetwo in self.boosters or twoone in self.boosters:
+            valence = valence + self.B_DECR
+        return valence
+
+    def _least_check(self, valence: float, ids: List[int], i: int) -> float:
+        if i > 1 and not self.in_lex[ids[i - 1]] and self.lower[ids[i - 1]] == "least":
+            if self.lower[ids[i - 2]] != "at" and self.lower[ids[i - 2]] != "very":
+                valence = valence * self.N_SCALAR
+        elif i > 0 and not self.in_lex[ids[i - 1]] and self.lower[ids[i - 1]] == "least":
+            valence = valence * self.N_SCALAR
+        return valence
+
+    def _word_valence(self, ids: List[int], i: int, cap_diff: bool) -> float:
+        """Valence of the lexicon word at position i (nltk's sentiment_valence)."""
+        tid = ids[i]
+        if (self.lower[tid] == "kind" and i < len(ids) - 1 and self.lower[ids[i + 1]] == "of"):
+            return 0
+        valence = self.valence[tid]
+        if self.upper[tid] and cap_diff:
+            if valence > 0:
+                valence += self.C_INCR
+            else:
+                valence -= self.C_INCR
+        for start_i in range(0, 3):
+            if i > start_i and not self.in_lex[ids[i - (start_i + 1)]]:
+                s = self._scalar_inc_dec(ids[i - (start_i + 1)], valence, cap_diff)
+                if start_i == 1 and s != 0:
+                    s = s * 0.95
+                if start_i == 2 and s != 0:
+                    s = s * 0.9
+                valence = valence + s
+                valence = self._never_check(valence, ids, start_i, i)
+                if start_i == 2:
+                    valence = self._idioms_check(valence, ids, i)
+        return self._least_check(valence, ids, i)
+
+    # ---------- scoring ----------
+    def _sums(self, ids: List[int], hits: Sequence[int]):
+        """(sum of sentiments, pos_sum, neg_sum, neu_count) for one text's tokens."""
+        n = len(ids)
+        n_upper = sum(map(self.upper.__getitem__, ids))
+        cap_diff = 0 < n - n_upper < n
+
+        but_at = None
+        if not self._but.isdisjoint(ids):
+            but_at = next(k for k, t in enumerate(ids) if t in self._but)
+
+        # nltk scores every repeat of a word at its first position
+        first: Dict[int, float] = {}
+        total, pos_sum, neg_sum, nonzero = 0, 0.0, 0.0, 0
+        for k in hits:
+            tid = ids[k]
+            v = first.get(tid)
+            if v is None:
+                v = first[tid] = self._word_valence(ids, ids.index(tid), cap_diff)
+            if but_at is not None:
+                if k < but_at:
+                    v = v * 0.5
+                elif k > but_at:
+                    v = v * 1.5
+            total += v
+            if v > 0:
+                pos_sum += float(v) + 1
+                nonzero += 1
+            elif v < 0:
+                neg_sum += float(v) - 1
+                nonzero += 1
+        return float(total), pos_sum, neg_sum, n - nonzero
+
+    def score_many(self, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Scores for every text as arrays: {"neg", "neu", "pos", "compound"}."""
+        texts = [t if isinstance(t, str) else str(t.encode("utf-8")) for t in texts]
+        all_ids = [self.token_ids(t) for t in texts]
+        lengths = np.fromiter(map(len, all_ids), dtype=np.int64, count=len(all_ids))
+        flat = np.fromiter(itertools.chain.from_iterable(all_ids), dtype=np.int64, count=int(lengths.sum()))
+
+        # lexicon hits for the whole batch in one lookup, then grouped back per text
+        hit_pos = np.flatnonzero(self._hit[flat])
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(texts) else lengths
+        owner = np.searchsorted(starts, hit_pos, side="right") - 1
+        bounds = np.searchsorted(owner, np.arange(len(texts) + 1))
+        local = (hit_pos - starts[owner]).tolist() if len(hit_pos) else []
+
+        sum_s = np.zeros(len(texts))
+        pos_sum = np.zeros(len(texts))
+        neg_sum = np.zeros(len(texts))
+        neu_count = np.zeros(len(texts))
+        bounds = bounds.tolist()
+        for j, ids in enumerate(all_ids):
+            if ids:
+                sum_s[j], pos_sum[j], neg_sum[j], neu_count[j] = self._sums(ids, local[bounds[j]:bounds[j + 1]])
+
+        # punctuation emphasis
+        ep = np.minimum([t.count("!") for t in texts], 4) * 0.292
+        qm = np.array([t.count("?") for t in texts], dtype=np.float64)
+        qm = np.where(qm > 1, np.where(qm <= 3, qm * 0.18, 0.96), 0.0)
+        amp = ep + qm
+
+        sum_s = np.where(sum_s > 0, sum_s + amp, np.where(sum_s < 0, sum_s - amp, sum_s))
+        compound = sum_s / np.sqrt((sum_s * sum_s) + 15)
+        abs_neg = np.fabs(neg_sum)
+        more_pos, more_neg = pos_sum > abs_neg, pos_sum < abs_neg
+        pos_sum = np.where(more_pos, pos_sum + amp, pos_sum)
+        neg_sum = np.where(more_neg, neg_sum - amp, neg_sum)
+        total = pos_sum + np.fabs(neg_sum) + neu_count
+
+        empty = lengths == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = {
+                "neg": np.fabs(neg_sum / total),
+                "neu": np.fabs(neu_count / total),
+                "pos": np.fabs(pos_sum / total),
+                "compound": compound,
+            }
+        # Python's round() (correctly rounded) rather than np.round, as nltk does
+        for key, digits in (("neg", 3), ("neu", 3), ("pos", 3), ("compound", 4)):
+            values = np.where(empty, 0.0, out[key]).tolist()
+            out[key] = np.array([round(v, digits) for v in values])
+        return out
+
+    def score_records(self, texts: Sequence[str]) -> List[Dict[str, float]]:
+        """score_many as one polarity_scores()-style dict per text."""
+        scores = self.score_many(texts)
+        columns = [scores[k].tolist() for k in SCORE_FIELDS]
+        return [dict(zip(SCORE_FIELDS, row)) for row in zip(*columns)]
+
+    def polarity_scores(self, text: str) -> Dict[str, float]:
+        return self.score_records([text])[0]
+
+
+# ---------- checks ----------
+def _review_texts(paths: Sequence[str]) -> List[str]:
+    from review_normalize import SOURCES, read_site, read_source
+    if not paths:
+        return [r.text for site in SOURCES for r in read_site(site)]
+    layouts = {path: layout for path, layout in SOURCES.values()}
+    return [r.text for p in paths for r in read_source(p, layouts.get(p, "reviewer_details"), "")]
+
+
+def compare(texts: Sequence[str], vader: Optional[CompiledVader] = None) -> int:
+    """Number of texts whose scores differ from nltk's (printing the first few)."""
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+    sia = SentimentIntensityAnalyzer()
+    fast = (vader or CompiledVader(sia)).score_records(texts)
+    bad = 0
+    for text, got in zip(texts, fast):
+        want = sia.polarity_scores(text)
+        if got != want:
+            bad += 1
+            if bad <= 5:
+                print(f"[mismatch] {text[:80]!r}\n  nltk: {want}\n  fast: {got}")
+    return bad
+
+
+def bench(texts: Sequence[str], repeat: int = 3) -> Dict[str, float]:
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+    sia = SentimentIntensityAnalyzer()
+    best_nltk = best_fast = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for t in texts:
+            sia.polarity_scores(t)
+        best_nltk = min(best_nltk, time.perf_counter() - started)
+        vader = CompiledVader(sia)                 # cold vocabulary every round
+        started = time.perf_counter()
+        vader.score_many(texts)
+        best_fast = min(best_fast, time.perf_counter() - started)
+    n = len(texts)
+    return {"reviews": n, "nltk_us_per_review": best_nltk / n * 1e6,
+            "fast_us_per_review": best_fast / n * 1e6, "speedup": best_nltk / best_fast}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compiled VADER: check against nltk and benchmark.")
+    ap.add_argument("command", choices=["verify", "bench"])
+    ap.add_argument("files", nargs="*", help="review files (default: every scored output)")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    import nltk
+    nltk.download("vader_lexicon", quiet=True)
+    texts = _review_texts(args.files)
+    if args.command == "verify":
+        bad = compare(texts)
+        print(f"[verify] {len(texts)} reviews, {bad} differ from nltk")
+        raise SystemExit(1 if bad else 0)
+    r = bench(texts, args.repeat)
+    print(f"[bench] {r['reviews']} reviews: nltk {r['nltk_us_per_review']:.1f} µs/review, "
+          f"compiled {r['fast_us_per_review']:.1f} µs/review ({r['speedup']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()